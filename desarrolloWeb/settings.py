@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'inicio',
 ]
 
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inicio.middleware.EmpresaActualMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -113,6 +115,78 @@ else:
 
 
 
+#  CACHÉ
+
+# En Render usamos REDIS_URL para que la caché (ej: resumen del dashboard)
+# sea compartida por todos los workers y la invalidación llegue a todos.
+# En local, caché en memoria del proceso.
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "rutek",
+        }
+    }
+
+
+
+#  FUEC (PDF)
+
+# URL pública del sitio: la usa el QR de verificación impreso en el FUEC
+SITIO_URL = os.environ.get(
+    "SITIO_URL",
+    f"https://{RENDER_HOSTNAME}" if RENDER_HOSTNAME else "http://localhost:8000",
+)
+
+# Cómo se genera el PDF del FUEC: 'xhtml2pdf' (plantilla HTML) o
+# 'reportlab' (dibujado directo, mucho más rápido)
+FUEC_BACKEND = os.environ.get("FUEC_BACKEND", "xhtml2pdf")
+
+# Caché en disco de los FUEC generados (LRU, tamaño máximo en MB). Cada
+# proceso la recorre de vez en cuando; un cron con
+# 'python manage.py limpiar_cache_fuec' la ajusta y borra los .lock viejos.
+FUEC_CACHE_DIR = os.environ.get("FUEC_CACHE_DIR", str(BASE_DIR / "cache" / "fuec"))
+FUEC_CACHE_MAX_MB = int(os.environ.get("FUEC_CACHE_MAX_MB", "512"))
+
+# Si es True, el botón del FUEC encola el PDF y lo genera el worker
+# (python manage.py procesar_fuec) en vez de renderizarlo en la petición.
+FUEC_ASINCRONO = os.environ.get("FUEC_ASINCRONO", "False") == "True"
+
+# Exportación masiva (ZIP): PDF que se renderizan a la vez por ZIP (con
+# el pool de renderizadores del worker, sin procesos nuevos) y máximo de
+# servicios por ZIP.
+FUEC_ZIP_PROCESOS = int(os.environ.get("FUEC_ZIP_PROCESOS", "2"))
+FUEC_ZIP_MAX_SERVICIOS = int(os.environ.get("FUEC_ZIP_MAX_SERVICIOS", "2000"))
+
+# Máximo de servicios en un manifiesto (lista + un FUEC por página)
+MANIFIESTO_MAX_SERVICIOS = int(os.environ.get("MANIFIESTO_MAX_SERVICIOS", "1000"))
+
+# Pool de procesos renderizadores de PDF (inicio/renderizador.py).
+# Opcional: con PDF_PROCESOS=N cada worker de gunicorn lanza N procesos
+# más con xhtml2pdf cargado (~100 MB cada uno), así que la memoria es
+# workers x (1 + N) procesos. Por defecto (0) se renderiza dentro del
+# proceso web, sin pool.
+PDF_PROCESOS = int(os.environ.get("PDF_PROCESOS", "0"))
+PDF_RENDERS_POR_PROCESO = int(os.environ.get("PDF_RENDERS_POR_PROCESO", "200"))
+PDF_RSS_MAXIMO_MB = int(os.environ.get("PDF_RSS_MAXIMO_MB", "300"))
+# Segundos que espera una petición por un renderizador libre antes del 503
+PDF_ESPERA_MAXIMA = float(os.environ.get("PDF_ESPERA_MAXIMA", "2"))
+# Segundos que se espera un PDF antes de matar al renderizador (debe ser
+# menor que el timeout de gunicorn)
+PDF_TIMEOUT = float(os.environ.get("PDF_TIMEOUT", "20"))
+
+
+
 #  PASSWORD VALIDATION
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -162,10 +236,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Por defecto usamos Gmail (para desarrollo/local),
 # pero si la variable EMAIL_BACKEND == "sendgrid",
 # usaremos la integración con SendGrid.
+# Para pruebas: "consola" (imprime los correos) o "archivo" (los guarda
+# en EMAIL_FILE_PATH).
 
 EMAIL_BACKEND_ENV = os.environ.get("EMAIL_BACKEND", "").lower()
 
-if EMAIL_BACKEND_ENV == "sendgrid":
+if EMAIL_BACKEND_ENV in ("consola", "archivo"):
+    # ------ PRUEBAS: no se envía nada ------
+    if EMAIL_BACKEND_ENV == "consola":
+        EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+    else:
+        EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+        EMAIL_FILE_PATH = os.environ.get("EMAIL_FILE_PATH", str(BASE_DIR / "cache" / "correos"))
+
+    EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "no-reply@rutek.com")
+    DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER)
+
+elif EMAIL_BACKEND_ENV == "sendgrid":
     # ------ PRODUCCIÓN (Render) con SendGrid ------
     EMAIL_BACKEND = "sendgrid_backend.SendgridBackend"
     SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY", "")
@@ -190,3 +277,9 @@ else:
 
     DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER)
 
+
+# Si es True, los correos (códigos de verificación y de recuperación) los
+# envía el worker (python manage.py despachar_correos). Si es False se
+# envían en un hilo aparte del mismo proceso al confirmar la transacción
+# (la petición no espera al proveedor de correo).
+CORREO_ASINCRONO = os.environ.get("CORREO_ASINCRONO", "False") == "True"
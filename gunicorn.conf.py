@@ -0,0 +1,13 @@
+# Configuración de gunicorn (la carga sola desde la raíz del proyecto).
+
+
+def post_worker_init(worker):
+    # Con PDF_PROCESOS > 0 (opcional, ver settings.py) arranca y
+    # precalienta los renderizadores de PDF de este worker al iniciar,
+    # para que el primer FUEC no pague la carga de xhtml2pdf. Ojo con la
+    # memoria: son PDF_PROCESOS procesos más por cada worker.
+    from django.conf import settings
+
+    if settings.PDF_PROCESOS:
+        from inicio.renderizador import obtener_pool
+        obtener_pool().arrancar()
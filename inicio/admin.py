@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Empresa, EmpresaUsuario, CodigoVerificacion, Conductor, Vehiculo, Servicio
+from .models import Empresa, EmpresaUsuario, CodigoVerificacion, Conductor, Vehiculo, Servicio, VencimientoDocumento, TrabajoFuec, CorreoSaliente, AvisoVencimiento
+from .forms import ServicioForm
 
 
 
@@ -38,8 +39,19 @@ class ConductorAdmin(admin.ModelAdmin):
     list_filter = ("activo", "licencia_categoria", "licencia_vencimiento", "empresa")
 
 
+@admin.register(VencimientoDocumento)
+class VencimientoDocumentoAdmin(admin.ModelAdmin):
+    list_display = ("tipo", "titulo", "fecha", "origen", "empresa")
+    list_filter = ("origen", "tipo", "empresa")
+    search_fields = ("titulo", "detalle")
+
+
 @admin.register(Servicio)
 class ServicioAdmin(admin.ModelAdmin):
+    # Mismas reglas que las vistas (capacidad y cruces de horario); el
+    # admin valida y guarda en una transacción, así que también bloquea
+    form = ServicioForm
+    fields = ("empresa", *ServicioForm.Meta.fields)
     list_display = (
         "fecha_servicio",
         "origen",
@@ -53,3 +65,25 @@ class ServicioAdmin(admin.ModelAdmin):
     list_filter = ("empresa", "estado", "fecha_servicio")
     search_fields = ("origen", "destino", "cliente_nombre", "conductor__nombre_completo", "vehiculo__placa")
 
+
+
+@admin.register(TrabajoFuec)
+class TrabajoFuecAdmin(admin.ModelAdmin):
+    list_display = ("servicio", "estado", "intentos", "creado", "actualizado", "empresa")
+    list_filter = ("estado", "empresa")
+    exclude = ("pdf",)
+
+
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    list_display = ("asunto", "para", "estado", "intentos", "proximo_intento", "creado")
+    list_filter = ("estado",)
+    search_fields = ("para", "asunto")
+    exclude = ("html",)
+
+
+@admin.register(AvisoVencimiento)
+class AvisoVencimientoAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "para", "alertas", "empresa", "creado")
+    list_filter = ("fecha",)
+    search_fields = ("para", "empresa__nombre")
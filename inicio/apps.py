@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InicioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inicio'
+
+    def ready(self):
+        # Registra los receivers de señales (vencimientos, ...)
+        from . import signals  # noqa: F401
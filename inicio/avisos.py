@@ -0,0 +1,180 @@
+"""
+Aviso diario de vencimientos por correo.
+
+El comando 'enviar_avisos_vencimiento' corre una vez al día y manda al
+administrador de cada empresa un resumen con los documentos vencidos o
+por vencer y, opcionalmente, a cada conductor el aviso de su licencia.
+
+- Las alertas de todas las empresas salen de una sola consulta sobre
+  VencimientoDocumento, recorrida en orden de empresa: no se llama
+  obtener_alertas_vencimiento() por cada empresa.
+- Las empresas se procesan por lotes: destinatarios, avisos ya enviados
+  e inserciones cuestan unas pocas consultas por lote, no por empresa.
+- Cada aviso queda en AvisoVencimiento (fecha, empresa, destinatario)
+  en la misma transacción que su correo en la bandeja de salida: correr
+  el comando otra vez el mismo día no repite correos. Si dos ejecuciones
+  se cruzan, solo se omiten los avisos que ya encoló la otra (no el lote
+  entero) y se cuentan como omitidos.
+"""
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .correos import nuevo_correo
+from .models import AvisoVencimiento, Conductor, CorreoSaliente, Empresa
+from .vencimientos import alertas_todas_las_empresas_qs, fila_a_alerta
+
+
+EMPRESAS_POR_LOTE = 500
+
+PLANTILLA_AVISO = 'email_vencimientos.html'
+
+
+def _lotes_por_empresa(filas, tamano):
+    """Agrupa las filas (ordenadas por empresa) en {empresa_id: [filas]}."""
+    lote = {}
+    for empresa_id, grupo in groupby(filas, key=itemgetter('empresa_id')):
+        lote[empresa_id] = list(grupo)
+        if len(lote) >= tamano:
+            yield lote
+            lote = {}
+    if lote:
+        yield lote
+
+
+def _destinatarios(empresa, filas, correos_conductor):
+    """
+    {correo: (nombre, filas, es_conductor)} de una empresa: el
+    administrador (o el correo de la empresa) con todas las alertas, y
+    cada conductor con correo solo con las suyas.
+    """
+    destinatarios = {}
+    admin = (empresa['administrador__email'] or empresa['email'] or '').lower()
+    if admin:
+        nombre = empresa['administrador__first_name'] or empresa['nombre']
+        destinatarios[admin] = (nombre, filas, False)
+
+    for fila in filas:
+        if fila['origen'] != 'CONDUCTOR':
+            continue
+        correo = correos_conductor.get(fila['objeto_id'])
+        if correo and correo != admin:
+            destinatarios.setdefault(correo, (fila['titulo'], [], True))[1].append(fila)
+    return destinatarios
+
+
+def _guardar_avisos(avisos, correos):
+    """
+    Guarda cada aviso con su correo (listas paralelas). Devuelve
+    (encolados, omitidos): los omitidos ya los encoló otra ejecución.
+    """
+    try:
+        with transaction.atomic():
+            AvisoVencimiento.objects.bulk_create(avisos)
+            CorreoSaliente.objects.bulk_create(correos)
+        return len(avisos), 0
+    except IntegrityError:
+        pass
+
+    # Otra ejecución del comando encoló parte del lote mientras tanto: se
+    # guardan uno por uno y solo se omiten los repetidos
+    encolados = 0
+    for aviso, correo in zip(avisos, correos):
+        aviso.pk = correo.pk = None
+        try:
+            with transaction.atomic():
+                aviso.save()
+                correo.save()
+        except IntegrityError:
+            continue
+        encolados += 1
+    return encolados, len(avisos) - encolados
+
+
+def _avisos_lote(alertas, fecha, dias_alerta, conductores, url):
+    """Encola los avisos de un lote de empresas. Devuelve (encolados, omitidos)."""
+    empresas = Empresa.objects.filter(pk__in=alertas).values(
+        'id', 'nombre', 'email', 'administrador__email', 'administrador__first_name',
+    )
+
+    correos_conductor = {}
+    if conductores:
+        ids = [
+            f['objeto_id']
+            for filas in alertas.values()
+            for f in filas
+            if f['origen'] == 'CONDUCTOR'
+        ]
+        correos_conductor = {
+            pk: correo.lower()
+            for pk, correo in Conductor.objects.filter(
+                pk__in=ids,
+            ).exclude(correo='').values_list('id', 'correo')
+        }
+
+    ya_enviados = set(AvisoVencimiento.objects.filter(
+        fecha=fecha,
+        empresa_id__in=alertas,
+    ).values_list('empresa_id', 'para'))
+
+    correos = []
+    avisos = []
+    year = datetime.now().year
+    for empresa in empresas:
+        destinatarios = _destinatarios(empresa, alertas[empresa['id']], correos_conductor)
+        for para, (nombre, filas, es_conductor) in destinatarios.items():
+            if (empresa['id'], para) in ya_enviados:
+                continue
+
+            lista = [fila_a_alerta(f) for f in filas]
+            vencidos = sum(1 for a in lista if a['estado_alerta'] == 'VENCIDO')
+            correos.append(nuevo_correo(
+                para,
+                f"Vencimientos de documentos - {empresa['nombre']}",
+                PLANTILLA_AVISO,
+                {
+                    'nombre': nombre,
+                    'empresa': empresa['nombre'],
+                    'alertas': lista,
+                    'vencidos': vencidos,
+                    'por_vencer': len(lista) - vencidos,
+                    'dias_alerta': dias_alerta,
+                    'conductor': es_conductor,
+                    'url': '' if es_conductor else url,
+                    'year': year,
+                },
+            ))
+            avisos.append(AvisoVencimiento(
+                fecha=fecha,
+                empresa_id=empresa['id'],
+                para=para,
+                alertas=len(lista),
+            ))
+
+    if not avisos:
+        return 0, 0
+    return _guardar_avisos(avisos, correos)
+
+
+def encolar_avisos_vencimiento(dias_alerta=30, conductores=False, hoy=None,
+                               empresas_por_lote=EMPRESAS_POR_LOTE):
+    """
+    Encola el resumen de vencimientos del día para todas las empresas
+    con alertas. Devuelve (correos encolados, omitidos porque otra
+    ejecución ya los había encolado).
+    """
+    hoy = hoy or timezone.localdate()
+    url = f'{settings.SITIO_URL.rstrip("/")}{reverse("vencimientos_lista")}'
+
+    filas = alertas_todas_las_empresas_qs(dias_alerta, hoy).iterator(chunk_size=2000)
+    total = omitidos = 0
+    for alertas in _lotes_por_empresa(filas, empresas_por_lote):
+        encolados, repetidos = _avisos_lote(alertas, hoy, dias_alerta, conductores, url)
+        total += encolados
+        omitidos += repetidos
+    return total, omitidos
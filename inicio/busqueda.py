@@ -0,0 +1,70 @@
+"""
+Búsqueda de texto (?q=) para servicios, conductores y vehículos.
+
+En Postgres cada tabla tiene un índice GIN de trigramas (pg_trgm) sobre
+un "documento" con sus columnas de texto sin tildes y en minúsculas
+(ver migración 0011). La búsqueda:
+- encuentra el texto en cualquier parte (LIKE '%q%') o palabras
+  parecidas (operador %> de pg_trgm, tolera errores de tipeo),
+- no distingue tildes: "Bogota" encuentra "Bogotá",
+- ordena por relevancia (word_similarity).
+
+En otros motores (ej: SQLite en pruebas) se usa un OR de icontains.
+"""
+import unicodedata
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import CharField, F, FloatField, Func, Q, Value
+
+
+# Columnas de texto que se buscan en cada modelo. El orden importa:
+# debe coincidir con la expresión de los índices de la migración 0011.
+CAMPOS_BUSQUEDA = {
+    'servicio': ('origen', 'destino', 'cliente_nombre'),
+    'conductor': ('nombre_completo', 'numero_documento'),
+    'vehiculo': ('placa', 'marca', 'linea'),
+}
+
+
+class DocumentoBusqueda(Func):
+    """
+    inicio_unaccent(lower(col1 || ' ' || col2 ...)), la misma expresión
+    de los índices GIN, para que Postgres los pueda usar.
+    """
+    template = "inicio_unaccent(lower(%(expressions)s))"
+    arg_joiner = " || ' ' || "
+    output_field = CharField()
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Bogotá' -> 'bogota'."""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def buscar(queryset, q):
+    """
+    Filtra el queryset por el texto 'q' y lo anota con 'relevancia'
+    (0 a 1, mayor es mejor). No cambia el orden del queryset: quien
+    llama decide si ordena por relevancia.
+    """
+    campos = CAMPOS_BUSQUEDA[queryset.model._meta.model_name]
+
+    if connections[queryset.db].vendor != 'postgresql':
+        condicion = Q()
+        for campo in campos:
+            condicion |= Q(**{f'{campo}__icontains': q})
+        return queryset.filter(condicion).annotate(
+            relevancia=Value(1.0, output_field=FloatField())
+        )
+
+    termino = normalizar(q)
+    return queryset.alias(
+        documento_busqueda=DocumentoBusqueda(*[F(c) for c in campos]),
+    ).filter(
+        Q(documento_busqueda__contains=termino) |
+        Q(documento_busqueda__trigram_word_similar=termino)
+    ).annotate(
+        relevancia=TrigramWordSimilarity(Value(termino), 'documento_busqueda'),
+    )
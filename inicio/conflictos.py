@@ -0,0 +1,230 @@
+"""
+Cruces de horario: un conductor o un vehículo en dos servicios a la vez.
+
+Cada servicio ocupa su conductor y su vehículo de fecha_servicio +
+hora_inicio a hora_fin:
+
+- sin hora_inicio empieza a las 00:00; sin hora_fin, ocupa hasta el
+  final del día;
+- si hora_fin <= hora_inicio termina al día siguiente (servicio
+  nocturno);
+- los servicios CANCELADOS no ocupan a nadie.
+
+Revisar un servicio (conflictos_servicio) es una consulta sobre los
+índices (conductor, fecha_servicio) y (vehiculo, fecha_servicio), que
+solo lee los servicios de ese conductor o vehículo en un par de días:
+no depende de cuántos servicios tenga la tabla. El cruce se evalúa en
+la base de datos (servicios_que_ocupan).
+
+La revisión de toda la empresa (conflictos_empresa) es una sola
+consulta ordenada por inicio, recorrida una vez con los servicios
+"abiertos" de cada conductor y vehículo en un heap.
+
+La disponibilidad (conductores_disponibles / vehiculos_disponibles) es
+una consulta por tipo de recurso: los activos con documentos vigentes
+para los que NO EXISTE un servicio que se cruce con la ventana.
+"""
+import heapq
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+
+from .models import DOCUMENTOS_CONDUCTOR, DOCUMENTOS_VEHICULO, Conductor, Servicio, Vehiculo
+
+
+ESTADOS_SIN_OCUPAR = ['CANCELADO']
+
+# Cruces que se guardan para mostrar (el total se cuenta igual)
+MAX_CONFLICTOS = 1000
+
+_UN_DIA = timedelta(days=1)
+
+_CAMPOS = (
+    'id', 'fecha_servicio', 'hora_inicio', 'hora_fin', 'origen', 'destino',
+    'conductor_id', 'conductor__nombre_completo', 'vehiculo_id', 'vehiculo__placa',
+)
+
+
+def periodo(fecha, hora_inicio, hora_fin):
+    """(inicio, fin) del servicio como datetimes; fin no incluido."""
+    inicio = datetime.combine(fecha, hora_inicio or time.min)
+    if hora_fin is None:
+        return inicio, datetime.combine(fecha + _UN_DIA, time.min)
+    fin = datetime.combine(fecha, hora_fin)
+    if fin <= inicio:
+        fin += _UN_DIA
+    return inicio, fin
+
+
+def _periodo_fila(fila):
+    return periodo(fila['fecha_servicio'], fila['hora_inicio'], fila['hora_fin'])
+
+
+def servicios_que_ocupan(servicios, inicio, fin):
+    """
+    Filtra 'servicios' a los que se cruzan con [inicio, fin) (una
+    ventana de 24 h o menos), con las reglas de periodo() evaluadas en
+    la base de datos. Solo compara fechas y horas, así que sirve igual
+    en Postgres y en SQLite.
+    """
+    dia = inicio.date()
+    servicios = servicios.alias(hora_desde=Coalesce('hora_inicio', Value(time.min)))
+
+    empieza_antes = Q(fecha_servicio__lt=fin.date()) | Q(
+        fecha_servicio=fin.date(),
+        hora_desde__lt=fin.time(),
+    )
+    # Termina al día siguiente (hora_fin NULL no cumple la comparación)
+    nocturno = Q(hora_fin__lte=F('hora_desde'))
+    termina_despues = (
+        Q(fecha_servicio__gt=dia)
+        | Q(fecha_servicio=dia) & (Q(hora_fin__isnull=True) | nocturno | Q(hora_fin__gt=inicio.time()))
+        | Q(fecha_servicio=dia - _UN_DIA) & nocturno & Q(hora_fin__gt=inicio.time())
+    )
+    # Un servicio termina a más tardar el día siguiente al suyo: solo
+    # pueden cruzarse los que empiezan desde el día anterior (y el rango
+    # de fechas es el que usan los índices)
+    return servicios.filter(
+        empieza_antes,
+        termina_despues,
+        fecha_servicio__gte=dia - _UN_DIA,
+        fecha_servicio__lte=fin.date(),
+    ).exclude(estado__in=ESTADOS_SIN_OCUPAR)
+
+
+def conflictos_servicio(conductor_id, vehiculo_id, fecha, hora_inicio=None, hora_fin=None,
+                        excluir=None, bloquear=False):
+    """
+    Servicios que se cruzan con uno (nuevo o editado, 'excluir' = su pk)
+    en el conductor o el vehículo. Devuelve dos listas de filas (dicts
+    con _CAMPOS): (cruces del conductor, cruces del vehículo).
+
+    Con 'bloquear' (dentro de una transacción) se bloquean antes las
+    filas del conductor y del vehículo: dos reservas simultáneas del
+    mismo conductor o vehículo se revisan una después de la otra.
+    """
+    if bloquear:
+        list(Conductor.objects.select_for_update().filter(pk=conductor_id).values_list('pk'))
+        list(Vehiculo.objects.select_for_update().filter(pk=vehiculo_id).values_list('pk'))
+
+    inicio, fin = periodo(fecha, hora_inicio, hora_fin)
+    cruces = servicios_que_ocupan(
+        Servicio.objects.filter(Q(conductor_id=conductor_id) | Q(vehiculo_id=vehiculo_id)),
+        inicio,
+        fin,
+    )
+    if excluir is not None:
+        cruces = cruces.exclude(pk=excluir)
+
+    del_conductor = []
+    del_vehiculo = []
+    for fila in cruces.order_by('fecha_servicio', 'hora_inicio').values(*_CAMPOS):
+        if fila['conductor_id'] == conductor_id:
+            del_conductor.append(fila)
+        if fila['vehiculo_id'] == vehiculo_id:
+            del_vehiculo.append(fila)
+    return del_conductor, del_vehiculo
+
+
+def _ocupado(campo, inicio, fin, excluir):
+    """Exists() de un servicio del recurso externo (campo='conductor'...) en la ventana."""
+    servicios = servicios_que_ocupan(Servicio.objects.filter(**{campo: OuterRef('pk')}), inicio, fin)
+    if excluir is not None:
+        servicios = servicios.exclude(pk=excluir)
+    return Exists(servicios)
+
+
+def documentos_vigentes(documentos, fecha):
+    """Q: todas las fechas de 'documentos' registradas y no vencidas en 'fecha'."""
+    return Q(**{f'{campo}__gte': fecha for campo, _ in documentos})
+
+
+def conductores_disponibles(empresa, fecha, hora_inicio=None, hora_fin=None, excluir=None):
+    """
+    Conductores activos de la empresa con la licencia vigente en 'fecha'
+    y sin servicios que se crucen con la ventana ('excluir': el servicio
+    que se está editando). Una sola consulta (anti-join).
+    """
+    inicio, fin = periodo(fecha, hora_inicio, hora_fin)
+    return Conductor.objects.filter(
+        documentos_vigentes(DOCUMENTOS_CONDUCTOR, fecha),
+        ~_ocupado('conductor', inicio, fin, excluir),
+        empresa=empresa,
+        activo=True,
+    )
+
+
+def vehiculos_disponibles(empresa, fecha, hora_inicio=None, hora_fin=None, capacidad=0,
+                          excluir=None):
+    """
+    Como conductores_disponibles: vehículos activos con al menos
+    'capacidad' pasajeros y SOAT, tecnomecánica y pólizas vigentes.
+    """
+    inicio, fin = periodo(fecha, hora_inicio, hora_fin)
+    return Vehiculo.objects.filter(
+        documentos_vigentes(DOCUMENTOS_VEHICULO, fecha),
+        ~_ocupado('vehiculo', inicio, fin, excluir),
+        empresa=empresa,
+        activo=True,
+        capacidad_pasajeros__gte=capacidad,
+    )
+
+
+def describir_servicio(fila):
+    """'#12 del 2026-03-15 08:00–10:00 (Bogotá → Tunja)' para mensajes."""
+    horas = ''
+    if fila['hora_inicio'] or fila['hora_fin']:
+        desde = fila['hora_inicio'].strftime('%H:%M') if fila['hora_inicio'] else ''
+        hasta = fila['hora_fin'].strftime('%H:%M') if fila['hora_fin'] else ''
+        horas = f' {desde}–{hasta}'
+    return (
+        f"#{fila['id']} del {fila['fecha_servicio']:%Y-%m-%d}{horas} "
+        f"({fila['origen']} → {fila['destino']})"
+    )
+
+
+def conflictos_empresa(empresa, desde=None, hasta=None):
+    """
+    Todos los cruces de la empresa (opcionalmente de servicios entre
+    'desde' y 'hasta'). Devuelve (lista, total): la lista trae hasta
+    MAX_CONFLICTOS dicts {'recurso', 'nombre', 'a', 'b'}, con a y b las
+    filas de los dos servicios (a empezó antes).
+    """
+    servicios = Servicio.objects.filter(empresa=empresa).exclude(estado__in=ESTADOS_SIN_OCUPAR)
+    if desde:
+        # Los del día anterior pueden seguir en curso
+        servicios = servicios.filter(fecha_servicio__gte=desde - _UN_DIA)
+    if hasta:
+        servicios = servicios.filter(fecha_servicio__lte=hasta)
+
+    # En orden de inicio (sin hora_inicio = 00:00, antes que el resto del día)
+    filas = servicios.order_by(
+        'fecha_servicio', F('hora_inicio').asc(nulls_first=True), 'id',
+    ).values(*_CAMPOS).iterator(chunk_size=2000)
+
+    # (recurso, id) -> heap de (fin, id, fila) de los servicios que
+    # empezaron y aún no terminan
+    abiertos = {}
+    conflictos = []
+    total = 0
+    for fila in filas:
+        inicio, fin = _periodo_fila(fila)
+        recursos = (
+            ('Conductor', fila['conductor_id'], fila['conductor__nombre_completo']),
+            ('Vehículo', fila['vehiculo_id'], fila['vehiculo__placa']),
+        )
+        for recurso, recurso_id, nombre in recursos:
+            heap = abiertos.setdefault((recurso, recurso_id), [])
+            while heap and heap[0][0] <= inicio:
+                heapq.heappop(heap)
+            for _, _, otra in heap:
+                # Con 'desde', los del día anterior solo cuentan si se
+                # cruzan con uno del rango
+                if desde and fila['fecha_servicio'] < desde:
+                    continue
+                total += 1
+                if len(conflictos) < MAX_CONFLICTOS:
+                    conflictos.append({'recurso': recurso, 'nombre': nombre, 'a': otra, 'b': fila})
+            heapq.heappush(heap, (fin, fila['id'], fila))
+    return conflictos, total
@@ -0,0 +1,211 @@
+"""
+Bandeja de salida de correos (outbox).
+
+Las vistas no envían el correo: encolar_correo() lo guarda en
+CorreoSaliente dentro de la misma transacción que el usuario o el código
+de verificación, y el comando 'despachar_correos' lo envía después. Así
+el registro y la recuperación de contraseña no esperan al proveedor de
+correo, y si el envío falla no se pierde nada.
+
+- Los correos se envían por lotes usando una sola conexión (SMTP o
+  SendGrid) por lote, en vez de abrir una por mensaje.
+- Si un envío falla se reintenta con espera exponencial (30 s, 1 min,
+  2 min... hasta 1 h); después de MAX_INTENTOS queda DESCARTADO.
+- Sin worker (CORREO_ASINCRONO=False) el correo se envía en un hilo
+  aparte al confirmar la transacción (on_commit): la petición no espera
+  al proveedor. Si falla, queda en la cola para el comando.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import CorreoSaliente
+
+
+MAX_INTENTOS = 5
+ESPERA_BASE = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=1)
+TAMANO_LOTE = 50
+
+# Un correo ENVIANDO por más tiempo es de un worker que se cayó
+TIEMPO_MAXIMO_ENVIANDO = timedelta(minutes=10)
+
+
+def nuevo_correo(para, asunto, plantilla, contexto):
+    """Arma (sin guardar) el correo con el HTML de 'plantilla' y su texto."""
+    html = render_to_string(plantilla, contexto)
+    return CorreoSaliente(
+        para=para,
+        asunto=asunto,
+        texto=strip_tags(html),
+        html=html,
+    )
+
+
+def encolar_correo(para, asunto, plantilla, contexto):
+    """
+    Guarda el correo en la bandeja de salida. Se envía cuando la
+    transacción actual se confirma.
+    """
+    correo = nuevo_correo(para, asunto, plantilla, contexto)
+    correo.save()
+    if not settings.CORREO_ASINCRONO:
+        transaction.on_commit(lambda: despachar_en_segundo_plano([correo.pk]))
+    return correo
+
+
+def despachar_en_segundo_plano(ids):
+    """Envía esos correos en un hilo aparte, sin bloquear la petición."""
+    def enviar():
+        try:
+            despachar_correos(ids=ids)
+        finally:
+            # El hilo abrió su propia conexión a la BD
+            connection.close()
+
+    threading.Thread(target=enviar, daemon=True).start()
+
+
+def espera_reintento(intentos):
+    """Tiempo antes del siguiente intento: se duplica en cada fallo."""
+    return min(ESPERA_BASE * 2 ** (intentos - 1), ESPERA_MAXIMA)
+
+
+def tomar_lote(limite=TAMANO_LOTE, ids=None):
+    """
+    Reserva hasta 'limite' correos pendientes (ya vencida su espera) y
+    los pasa a ENVIANDO. Con SKIP LOCKED varios workers no se pisan.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        pendientes = CorreoSaliente.objects.select_for_update(
+            skip_locked=True,
+        ).filter(estado='PENDIENTE', proximo_intento__lte=ahora)
+        if ids is not None:
+            pendientes = pendientes.filter(pk__in=ids)
+        correos = list(pendientes.order_by('proximo_intento')[:limite])
+
+        if correos:
+            CorreoSaliente.objects.filter(pk__in=[c.pk for c in correos]).update(
+                estado='ENVIANDO',
+                intentos=F('intentos') + 1,
+                actualizado=ahora,
+            )
+            for correo in correos:
+                correo.estado = 'ENVIANDO'
+                correo.intentos += 1
+    return correos
+
+
+def _mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.texto,
+        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER),
+        to=[correo.para],
+        connection=conexion,
+    )
+    if correo.html:
+        mensaje.attach_alternative(correo.html, 'text/html')
+    return mensaje
+
+
+def _abrir(conexion):
+    """Abre la conexión; devuelve el error o None."""
+    try:
+        conexion.open()
+    except Exception as e:
+        return e
+    return None
+
+
+def enviar_lote(correos, conexion=None):
+    """
+    Envía los correos reservados por una sola conexión y guarda el
+    resultado de cada uno. Devuelve (enviados, fallidos).
+
+    Con 'conexion' se usa esa (y queda abierta para el siguiente lote);
+    si no, se abre una para este lote.
+    """
+    propia = conexion is None
+    if propia:
+        conexion = get_connection(fail_silently=False)
+    enviados = []
+    fallidos = []
+
+    error_conexion = _abrir(conexion)
+    try:
+        for correo in correos:
+            if error_conexion is not None:
+                fallidos.append((correo, error_conexion))
+                continue
+            try:
+                conexion.send_messages([_mensaje(correo, conexion)])
+                enviados.append(correo)
+            except Exception as e:
+                fallidos.append((correo, e))
+                # La conexión puede haber quedado rota: se abre otra
+                conexion.close()
+                error_conexion = _abrir(conexion)
+    finally:
+        if propia:
+            conexion.close()
+
+    ahora = timezone.now()
+    if enviados:
+        CorreoSaliente.objects.filter(pk__in=[c.pk for c in enviados]).update(
+            estado='ENVIADO',
+            enviado=ahora,
+            error='',
+            actualizado=ahora,
+        )
+
+    for correo, error in fallidos:
+        if correo.intentos >= MAX_INTENTOS:
+            correo.estado = 'DESCARTADO'
+        else:
+            correo.estado = 'PENDIENTE'
+            correo.proximo_intento = ahora + espera_reintento(correo.intentos)
+        correo.error = f'{type(error).__name__}: {error}'
+        correo.actualizado = ahora
+    if fallidos:
+        CorreoSaliente.objects.bulk_update(
+            [correo for correo, _ in fallidos],
+            ['estado', 'proximo_intento', 'error', 'actualizado'],
+        )
+
+    return len(enviados), len(fallidos)
+
+
+def despachar_correos(limite=TAMANO_LOTE, ids=None, conexion=None):
+    """Toma un lote de la cola y lo envía. Devuelve (enviados, fallidos)."""
+    correos = tomar_lote(limite, ids)
+    if not correos:
+        return 0, 0
+    return enviar_lote(correos, conexion)
+
+
+def liberar_correos_abandonados():
+    """Devuelve a la cola los correos ENVIANDO de workers caídos."""
+    limite = timezone.now() - TIEMPO_MAXIMO_ENVIANDO
+    return CorreoSaliente.objects.filter(
+        estado='ENVIANDO',
+        actualizado__lt=limite,
+    ).update(estado='PENDIENTE', actualizado=timezone.now())
+
+
+def purgar_correos(dias):
+    """Borra los correos enviados hace más de 'dias' días (llevan códigos)."""
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = CorreoSaliente.objects.filter(
+        estado='ENVIADO',
+        enviado__lt=limite,
+    ).delete()
+    return borrados
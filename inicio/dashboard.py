@@ -0,0 +1,157 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import (
+    Count,
+    DecimalField,
+    FilteredRelation,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Empresa, Conductor, Vehiculo, ESTADOS_SERVICIO
+from .vencimientos import obtener_alertas_vencimiento
+
+
+ALERTAS_DASHBOARD = 5
+
+
+def clave_resumen(empresa_id, hoy=None):
+    """Llave de caché del resumen del dashboard de una empresa (por día)."""
+    hoy = hoy or timezone.localdate()
+    return f'dashboard:{empresa_id}:{hoy.isoformat()}'
+
+
+def segundos_hasta_medianoche():
+    """
+    Segundos que faltan para la medianoche local (America/Bogota).
+    A esa hora cambian "hoy" y los días restantes de las alertas.
+    """
+    ahora = timezone.localtime()
+    manana = datetime.combine(ahora.date() + timedelta(days=1), time.min)
+    manana = timezone.make_aware(manana, ahora.tzinfo)
+    return max(int((manana - ahora).total_seconds()), 1)
+
+
+def texto_alerta(a):
+    """Frase corta de una alerta para el dashboard."""
+    if a['dias_restantes'] < 0:
+        msg_dias = f"vencido hace {abs(a['dias_restantes'])} días"
+    elif a['dias_restantes'] == 0:
+        msg_dias = "vence hoy"
+    else:
+        msg_dias = f"vence en {a['dias_restantes']} días"
+
+    if a['origen'] == 'CONDUCTOR':
+        return (
+            f"Licencia de {a['nombre']} (doc. {a['identificacion']}) "
+            f"{msg_dias}."
+        )
+    return (
+        f"{a['tipo']} del vehículo {a['placa']} "
+        f"{msg_dias}."
+    )
+
+
+def _conteo(queryset):
+    """Subconsulta escalar con el COUNT(*) de un queryset por empresa."""
+    return Subquery(
+        queryset.order_by().values('empresa').annotate(n=Count('pk')).values('n'),
+        output_field=IntegerField(),
+    )
+
+
+def calcular_resumen(empresa):
+    """
+    Calcula (sin caché) los KPIs y las alertas del dashboard.
+
+    Todos los contadores salen de UNA sola consulta: los servicios del
+    mes / semana se unen con un LEFT JOIN filtrado y se agregan con
+    condiciones; conductores y vehículos activos van como subconsultas.
+    """
+    hoy = timezone.localdate()
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    fin_semana = inicio_semana + timedelta(days=6)
+    inicio_mes = hoy.replace(day=1)
+    fin_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    desde = min(inicio_semana, inicio_mes)
+    hasta = max(fin_semana, fin_mes)
+
+    activos = ~Q(recientes__estado='CANCELADO')
+    en_semana = Q(recientes__fecha_servicio__range=(inicio_semana, fin_semana))
+    en_mes = Q(recientes__fecha_servicio__range=(inicio_mes, fin_mes))
+    cero = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    por_estado = {
+        f'estado_{codigo}': Count('recientes', filter=en_mes & Q(recientes__estado=codigo))
+        for codigo, _ in ESTADOS_SERVICIO
+    }
+
+    fila = Empresa.objects.filter(pk=empresa.pk).annotate(
+        recientes=FilteredRelation(
+            'servicios',
+            condition=Q(servicios__fecha_servicio__range=(desde, hasta)),
+        ),
+    ).values('pk').annotate(
+        # Conductores / vehículos activos
+        conductores_activos=_conteo(Conductor.objects.filter(empresa=OuterRef('pk'), activo=True)),
+        vehiculos_activos=_conteo(Vehiculo.objects.filter(empresa=OuterRef('pk'), activo=True)),
+
+        # Servicios programados para HOY (excepto cancelados)
+        servicios_hoy=Count('recientes', filter=Q(recientes__fecha_servicio=hoy) & activos),
+
+        # Ingresos de la semana / mes (excepto cancelados)
+        ingresos_semana=Coalesce(Sum('recientes__valor', filter=en_semana & activos), cero),
+        ingresos_mes=Coalesce(Sum('recientes__valor', filter=en_mes & activos), cero),
+
+        **por_estado,
+    ).get()
+
+    # Alertas de vencimiento (solo las más próximas, cortadas en la BD)
+    alertas = obtener_alertas_vencimiento(
+        empresa,
+        dias_alerta=30,
+        limite=ALERTAS_DASHBOARD,
+    )
+
+    return {
+        'conductores_activos': fila['conductores_activos'] or 0,
+        'vehiculos_activos': fila['vehiculos_activos'] or 0,
+        'servicios_hoy': fila['servicios_hoy'],
+        'ingresos_semana': fila['ingresos_semana'],
+        'ingresos_mes': fila['ingresos_mes'],
+        'servicios_mes_por_estado': [
+            (nombre, fila[f'estado_{codigo}'])
+            for codigo, nombre in ESTADOS_SERVICIO
+        ],
+        'alertas_vencimiento': [texto_alerta(a) for a in alertas],
+    }
+
+
+def obtener_resumen(empresa, refrescar=False):
+    """
+    Devuelve el resumen del dashboard de la empresa desde la caché.
+    Si no está (o refrescar=True) lo calcula y lo guarda hasta la
+    medianoche local. Se invalida al cambiar conductores, vehículos
+    o servicios de la empresa (ver inicio/signals.py).
+    """
+    clave = clave_resumen(empresa.pk)
+
+    resumen = None if refrescar else cache.get(clave)
+    if resumen is None:
+        resumen = calcular_resumen(empresa)
+        cache.set(clave, resumen, timeout=segundos_hasta_medianoche())
+    return resumen
+
+
+def invalidar_resumen(*empresa_ids):
+    """Borra el resumen cacheado de las empresas indicadas."""
+    cache.delete_many([clave_resumen(e) for e in set(empresa_ids) if e])
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+
+from .models import Empresa
+
+
+# Tiempo (segundos) que se recuerda la empresa de un usuario
+TTL_EMPRESA = 300
+
+EMPRESA_POR_DEFECTO = {
+    'nombre': 'Rutek Tours',
+    'defaults': {
+        'nit': '901000000-0',
+        'direccion': 'Bogotá, Colombia',
+        'telefono': '3000000000',
+        'email': 'contacto@rutek.tours',
+    },
+}
+
+
+def clave_empresa(empresa_id):
+    return f'empresa:{empresa_id}'
+
+
+def clave_empresa_usuario(user_id):
+    return f'empresa_usuario:{user_id}'
+
+
+def empresa_por_defecto():
+    """
+    Devuelve la empresa por defecto 'Rutek Tours'.
+    Solo se intenta crear si de verdad no existe (evita el
+    get_or_create en cada request de los superusuarios).
+    """
+    empresa = Empresa.objects.filter(nombre=EMPRESA_POR_DEFECTO['nombre']).first()
+    if empresa is None:
+        empresa, _ = Empresa.objects.get_or_create(**EMPRESA_POR_DEFECTO)
+    return empresa
+
+
+def obtener_empresa_actual(user):
+    """
+    Devuelve la empresa asociada al usuario.
+    Si el usuario no tiene EmpresaUsuario (ej: superuser admin),
+    devuelve/crea la empresa por defecto 'Rutek Tours'.
+
+    El id de la empresa del usuario y la empresa misma se guardan en
+    caché por TTL_EMPRESA segundos; los cambios en Empresa o
+    EmpresaUsuario los invalidan (ver inicio/signals.py).
+    """
+    clave = clave_empresa_usuario(user.pk)
+
+    empresa_id = cache.get(clave)
+    if empresa_id is not None:
+        empresa = cache.get(clave_empresa(empresa_id))
+        if empresa is not None:
+            return empresa
+
+    # Una sola consulta: empresa JOIN empresausuario
+    empresa = Empresa.objects.filter(miembros__user_id=user.pk).first()
+    if empresa is None:
+        empresa = empresa_por_defecto()
+
+    cache.set_many({
+        clave: empresa.pk,
+        clave_empresa(empresa.pk): empresa,
+    }, timeout=TTL_EMPRESA)
+    return empresa
+
+
+def invalidar_empresa(empresa_id):
+    cache.delete(clave_empresa(empresa_id))
+
+
+def invalidar_empresa_usuario(user_id):
+    cache.delete(clave_empresa_usuario(user_id))
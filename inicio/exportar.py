@@ -0,0 +1,232 @@
+"""
+Exportación de servicios a CSV y XLSX (ej: contabilidad, un mes entero).
+
+Las filas salen de la base de datos con un cursor del lado del servidor
+(.iterator() sobre values_list, con conductor y vehículo en el mismo
+JOIN) y se van entregando a un StreamingHttpResponse: la memoria no
+depende de cuántos servicios se exporten y el primer byte sale de una.
+
+El XLSX se escribe a mano (es un ZIP con unos XML): la hoja se comprime
+a medida que se generan las filas, con el mismo SalidaZip del ZIP de
+FUEC, sin armar el libro completo en memoria ni en disco.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, time
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from .fuec import SalidaZip
+from .models import ESTADOS_SERVICIO
+
+
+# (campo de values_list, encabezado)
+COLUMNAS_EXPORTACION = (
+    ('id', 'ID'),
+    ('fuec_numero', 'Número FUEC'),
+    ('fecha_servicio', 'Fecha'),
+    ('hora_inicio', 'Hora inicio'),
+    ('hora_fin', 'Hora fin'),
+    ('origen', 'Origen'),
+    ('destino', 'Destino'),
+    ('tipo_servicio', 'Tipo de servicio'),
+    ('cliente_nombre', 'Cliente'),
+    ('cliente_contacto', 'Contacto'),
+    ('valor', 'Valor'),
+    ('estado', 'Estado'),
+    ('conductor__nombre_completo', 'Conductor'),
+    ('conductor__numero_documento', 'Documento conductor'),
+    ('vehiculo__placa', 'Placa'),
+)
+
+FILAS_POR_BLOQUE = 500
+
+# Límite de filas de una hoja de Excel (contando el encabezado)
+MAX_FILAS_XLSX = 1048576 - 1
+
+_ESTADOS = dict(ESTADOS_SERVICIO)
+_POSICION_ESTADO = [c for c, _ in COLUMNAS_EXPORTACION].index('estado')
+
+
+def filas_servicios(servicios):
+    """
+    Tuplas con las columnas de COLUMNAS_EXPORTACION (el estado ya con su
+    nombre visible), leídas por bloques con un cursor del servidor.
+    """
+    campos = [c for c, _ in COLUMNAS_EXPORTACION]
+    filas = servicios.order_by('fecha_servicio', 'hora_inicio', 'id').values_list(
+        *campos,
+    ).iterator(chunk_size=2000)
+
+    for fila in filas:
+        fila = list(fila)
+        fila[_POSICION_ESTADO] = _ESTADOS.get(fila[_POSICION_ESTADO], fila[_POSICION_ESTADO])
+        yield fila
+
+
+#  CSV
+class _Eco:
+    """'Archivo' para csv.writer que devuelve lo escrito en vez de guardarlo."""
+    def write(self, valor):
+        return valor
+
+
+def csv_servicios(filas):
+    """Generador con el CSV (UTF-8 con BOM, para que Excel lea las tildes)."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow([t for _, t in COLUMNAS_EXPORTACION])
+
+    bloque = []
+    for fila in filas:
+        bloque.append(escritor.writerow(['' if v is None else v for v in fila]))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+#  XLSX
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Servicios" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilos: 0 normal, 1 fecha, 2 hora, 3 encabezado (negrita)
+_ESTILO_FECHA = 1
+_ESTILO_HORA = 2
+_ESTILO_ENCABEZADO = 3
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+    '</fonts>'
+    '<fills count="2">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '</fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="20" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+# Encabezado fijo al desplazarse
+_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews>'
+    '<sheetData>'
+)
+
+_FIN_HOJA = '</sheetData></worksheet>'
+
+_EPOCA_EXCEL = date(1899, 12, 30)
+
+# Caracteres de control que no se permiten en XML
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _celda(valor, estilo=0):
+    s = f' s="{estilo}"' if estilo else ''
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, (int, Decimal)):
+        return f'<c{s}><v>{valor}</v></c>'
+    if isinstance(valor, date):
+        return f'<c s="{_ESTILO_FECHA}"><v>{(valor - _EPOCA_EXCEL).days}</v></c>'
+    if isinstance(valor, time):
+        fraccion = (valor.hour * 3600 + valor.minute * 60 + valor.second) / 86400
+        return f'<c s="{_ESTILO_HORA}"><v>{fraccion}</v></c>'
+    texto = escape(_NO_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"{s}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xlsx(numero, valores, estilo=0):
+    celdas = ''.join(_celda(v, estilo) for v in valores)
+    return f'<row r="{numero}">{celdas}</row>'
+
+
+def xlsx_servicios(filas):
+    """
+    Generador con los bytes de un .xlsx de una hoja. Recibe a lo sumo
+    MAX_FILAS_XLSX filas (quien llama lo controla).
+    """
+    salida = SalidaZip()
+
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archivo.writestr('_rels/.rels', _RELS)
+        archivo.writestr('xl/workbook.xml', _WORKBOOK)
+        archivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archivo.writestr('xl/styles.xml', _STYLES)
+        yield salida.vaciar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w') as hoja:
+            encabezados = [t for _, t in COLUMNAS_EXPORTACION]
+            hoja.write((_INICIO_HOJA + _fila_xlsx(1, encabezados, _ESTILO_ENCABEZADO)).encode())
+
+            bloque = []
+            for numero, fila in enumerate(filas, start=2):
+                bloque.append(_fila_xlsx(numero, fila))
+                if len(bloque) >= FILAS_POR_BLOQUE:
+                    hoja.write(''.join(bloque).encode())
+                    bloque = []
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+
+            hoja.write((''.join(bloque) + _FIN_HOJA).encode())
+
+    yield salida.vaciar()
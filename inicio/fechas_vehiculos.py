@@ -0,0 +1,114 @@
+"""
+Actualización masiva de las fechas de vencimiento de los vehículos.
+
+Las renovaciones de SOAT, tecnomecánica y pólizas suelen llegar para toda
+la flota a la vez: en vez de editar vehículo por vehículo, se marcan en
+la lista (misma fecha para todos) o se sube un CSV placa -> fecha.
+
+- Todo se aplica en una sola transacción, con un bulk_update por lote de
+  TAMANO_LOTE vehículos. Si alguna placa no existe o alguna fecha no es
+  válida no se cambia nada.
+- 'actualizado' se fija a mano (bulk_update no pasa por auto_now): de él
+  dependen el PDF del FUEC cacheado y su Last-Modified.
+- VencimientoDocumento y el dashboard se mantienen por
+  VencimientosQuerySet.update(), que es lo que usa bulk_update.
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .importar import MAX_ERRORES, leer_csv
+from .models import DOCUMENTOS_VEHICULO, Vehiculo
+
+
+TAMANO_LOTE = 500
+
+CAMPOS_FECHA = [campo for campo, _ in DOCUMENTOS_VEHICULO]
+
+_fecha = forms.DateField()
+
+
+def leer_fecha(valor):
+    """La fecha en los formatos del formulario (2026-03-15, 15/03/2026...) o None."""
+    try:
+        return _fecha.clean(valor)
+    except ValidationError:
+        return None
+
+
+def leer_fechas_csv(archivo, campo):
+    """
+    Lee un CSV con la columna 'placa' y la columna 'fecha' (para 'campo')
+    o una columna por documento (soat_vencimiento, ...; vacía = sin
+    cambio). Devuelve ({placa: {campo: fecha}}, [(línea, error)]).
+    """
+    cambios = {}
+    errores = []
+    for numero, fila in leer_csv(archivo):
+        placa = fila.get('placa', '')
+        if not placa:
+            errores.append((numero, 'Falta la placa.'))
+            continue
+        if placa in cambios:
+            errores.append((numero, f'La placa {placa} está repetida en el archivo.'))
+            continue
+
+        columnas = {c: fila[c] for c in CAMPOS_FECHA if fila.get(c)}
+        if fila.get('fecha'):
+            columnas[campo] = fila['fecha']
+        if not columnas:
+            errores.append((numero, 'No trae ninguna fecha.'))
+            continue
+
+        fechas = {}
+        for nombre, valor in columnas.items():
+            fechas[nombre] = leer_fecha(valor)
+            if fechas[nombre] is None:
+                errores.append((numero, f'{nombre}: "{valor}" no es una fecha válida.'))
+        cambios[placa] = fechas
+
+        if len(errores) >= MAX_ERRORES:
+            break
+    return cambios, errores
+
+
+def actualizar_fechas(empresa, cambios, clave='pk'):
+    """
+    Aplica 'cambios' ({pk o placa: {campo: fecha}}) a los vehículos de la
+    empresa. Devuelve (actualizados, claves no encontradas); si falta
+    alguna, la transacción se revierte y no se actualiza ninguno.
+    """
+    claves = list(cambios)
+    campos = sorted({c for fechas in cambios.values() for c in fechas})
+    if not claves:
+        return 0, []
+
+    ahora = timezone.now()
+    pendientes = set(claves)
+    actualizados = 0
+    with transaction.atomic():
+        for i in range(0, len(claves), TAMANO_LOTE):
+            lote = claves[i:i + TAMANO_LOTE]
+            # Bloqueados hasta el final: bulk_update reescribe todos los
+            # 'campos' de cada vehículo con lo que se leyó aquí
+            vehiculos = list(
+                Vehiculo.objects.select_for_update().filter(
+                    empresa=empresa,
+                    **{f'{clave}__in': lote},
+                ).only('id', 'empresa_id', 'placa', *campos)
+            )
+            for vehiculo in vehiculos:
+                valor = getattr(vehiculo, clave)
+                pendientes.discard(valor)
+                for campo, fecha in cambios[valor].items():
+                    setattr(vehiculo, campo, fecha)
+                vehiculo.actualizado = ahora
+
+            Vehiculo.objects.bulk_update(vehiculos, campos + ['actualizado'])
+            actualizados += len(vehiculos)
+
+        if pendientes:
+            transaction.set_rollback(True)
+            return 0, sorted(pendientes, key=str)
+    return actualizados, []
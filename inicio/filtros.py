@@ -0,0 +1,48 @@
+"""
+Filtros de la lista de servicios (?q=, ?estado=, ?desde=, ...).
+
+Los usa servicios_lista y todo lo que exporta "lo que se ve en la
+lista" (ZIP de FUEC, ...), para que siempre filtren igual.
+"""
+from .busqueda import buscar
+from .models import Servicio
+
+
+CAMPOS_FILTRO_SERVICIOS = ('q', 'estado', 'desde', 'hasta', 'conductor', 'vehiculo')
+
+
+def leer_filtros_servicios(params):
+    """Lee los filtros de un QueryDict (request.GET) como dict de textos."""
+    return {campo: params.get(campo, '').strip() for campo in CAMPOS_FILTRO_SERVICIOS}
+
+
+def filtrar_servicios(empresa, filtros):
+    """
+    Devuelve los servicios de la empresa que cumplen los filtros:
+    - q: texto (origen/destino/cliente), sin importar tildes
+    - estado
+    - desde / hasta: rango de fechas
+    - conductor / vehiculo: por id
+    No ordena ni proyecta: eso lo decide quien llama.
+    """
+    servicios = Servicio.objects.filter(empresa=empresa)
+
+    if filtros.get('q'):
+        servicios = buscar(servicios, filtros['q'])
+
+    if filtros.get('estado'):
+        servicios = servicios.filter(estado=filtros['estado'])
+
+    if filtros.get('desde'):
+        servicios = servicios.filter(fecha_servicio__gte=filtros['desde'])
+
+    if filtros.get('hasta'):
+        servicios = servicios.filter(fecha_servicio__lte=filtros['hasta'])
+
+    if filtros.get('conductor'):
+        servicios = servicios.filter(conductor_id=filtros['conductor'])
+
+    if filtros.get('vehiculo'):
+        servicios = servicios.filter(vehiculo_id=filtros['vehiculo'])
+
+    return servicios
@@ -1,4 +1,7 @@
 from django import forms
+from django.db import transaction
+
+from .conflictos import ESTADOS_SIN_OCUPAR, conflictos_servicio, describir_servicio
 from .models import Conductor, Vehiculo, Servicio
 
 
@@ -59,6 +62,7 @@ class ServicioForm(forms.ModelForm):
             'cliente_nombre',
             'cliente_contacto',
             'valor',
+            'pasajeros',
             'estado',
         ]
         widgets = {
@@ -67,3 +71,65 @@ class ServicioForm(forms.ModelForm):
             'hora_fin': forms.TimeInput(attrs={'type': 'time'}),
         }
 
+    def clean(self):
+        """
+        El vehículo debe tener capacidad para los pasajeros, y el conductor
+        y el vehículo no pueden estar en otro servicio que se cruce en
+        horario (ver inicio/conflictos.py).
+        """
+        datos = super().clean()
+        conductor = datos.get('conductor')
+        vehiculo = datos.get('vehiculo')
+        fecha = datos.get('fecha_servicio')
+        pasajeros = datos.get('pasajeros') or 0
+        if vehiculo and pasajeros > vehiculo.capacidad_pasajeros:
+            self.add_error(
+                'vehiculo',
+                f'El vehículo {vehiculo.placa} tiene capacidad para {vehiculo.capacidad_pasajeros} pasajeros.'
+            )
+        if not (conductor and vehiculo and fecha) or datos.get('estado') in ESTADOS_SIN_OCUPAR:
+            return datos
+
+        del_conductor, del_vehiculo = conflictos_servicio(
+            conductor.pk,
+            vehiculo.pk,
+            fecha,
+            datos.get('hora_inicio'),
+            datos.get('hora_fin'),
+            excluir=self.instance.pk,
+            # Dentro de una transacción (guardar(), el admin) se bloquean
+            # el conductor y el vehículo hasta el commit: otra reserva
+            # simultánea de los mismos espera
+            bloquear=transaction.get_connection().in_atomic_block,
+        )
+        for campo, nombre, cruces in (
+            ('conductor', f'El conductor {conductor}', del_conductor),
+            ('vehiculo', f'El vehículo {vehiculo.placa}', del_vehiculo),
+        ):
+            if cruces:
+                otros = f' y {len(cruces) - 1} más' if len(cruces) > 1 else ''
+                self.add_error(
+                    campo,
+                    f'{nombre} ya está en el servicio {describir_servicio(cruces[0])}{otros}.'
+                )
+        return datos
+
+    def guardar(self, empresa=None):
+        """
+        Valida y guarda el servicio en una sola transacción, con el
+        conductor y el vehículo bloqueados desde la revisión de cruces
+        hasta el commit: dos reservas simultáneas no se pueden cruzar.
+        Toda vista o script que guarde un servicio debe usar esto.
+        Devuelve el servicio, o None si el formulario tiene errores.
+        """
+        with transaction.atomic():
+            # Si ya se validó fuera de la transacción (sin bloquear), se
+            # valida otra vez
+            self._errors = None
+            if not self.is_valid():
+                return None
+            servicio = self.save(commit=False)
+            if empresa is not None:
+                servicio.empresa = empresa
+            servicio.save()
+        return servicio
@@ -0,0 +1,600 @@
+"""
+FUEC (Formato Único de Extracto del Contrato) en PDF.
+
+Los PDF generados se guardan en disco con una llave que depende del
+contenido (content-addressed): si no cambió el servicio, el conductor,
+el vehículo, los datos de la empresa ni la plantilla, la llave es la
+misma y se reutiliza el archivo sin volver a renderizar. Por eso la
+fecha impresa ("Generado el") es la del último cambio de esos datos y
+no la del día: un PDF cacheado nunca sale con una fecha que no es.
+"""
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import ConsecutivoFuec, Servicio, TrabajoFuec
+from .pdf import render_to_pdf
+from .renderizador import RenderizadorOcupado
+from .verificacion import url_verificacion
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo): sin bloqueo entre procesos
+    fcntl = None
+
+
+PLANTILLA_FUEC = 'servicios/fuec_pdf.html'
+
+# Subir este número si cambia el contexto que recibe la plantilla o el
+# dibujo de fuec_reportlab.py. Los cambios del HTML de la plantilla ya
+# cambian la llave solos.
+VERSION_FUEC = 3
+
+
+def _version_plantilla():
+    fuente = get_template(PLANTILLA_FUEC).template.source
+    return hashlib.sha256(fuente.encode('utf-8')).hexdigest()[:16]
+
+
+def clave_fuec(servicio, empresa):
+    """
+    Llave (sha256) del PDF: cambia si cambia cualquier dato que sale
+    impreso en el FUEC.
+    """
+    partes = [
+        str(VERSION_FUEC),
+        settings.FUEC_BACKEND,
+        _version_plantilla(),
+        str(servicio.pk),
+        str(servicio.fuec_numero or ''),
+        url_verificacion(servicio.pk),
+        servicio.actualizado.isoformat(),
+        servicio.conductor.actualizado.isoformat(),
+        servicio.vehiculo.actualizado.isoformat(),
+        empresa.nombre,
+        empresa.nit,
+        empresa.direccion,
+        empresa.telefono or '',
+        empresa.email or '',
+    ]
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+def ultima_modificacion(servicio):
+    """Fecha (Last-Modified) del dato más reciente del FUEC."""
+    return max(
+        servicio.actualizado,
+        servicio.conductor.actualizado,
+        servicio.vehiculo.actualizado,
+    )
+
+
+def nombre_archivo_fuec(servicio):
+    return f"FUEC_{servicio.id}_{servicio.fecha_servicio}.pdf"
+
+
+def contexto_fuec(servicio, empresa):
+    return {
+        'empresa': empresa,
+        'servicio': servicio,
+        'fuec_codigo': codigo_fuec(servicio.fuec_numero),
+        'url_verificacion': url_verificacion(servicio.pk),
+        # La fecha del último cambio de los datos, no la de hoy: así el
+        # mismo PDF (y su ETag) sirve igual cualquier día
+        'generado': timezone.localdate(ultima_modificacion(servicio)),
+    }
+
+
+#  NUMERACIÓN CONSECUTIVA (por empresa)
+def codigo_fuec(numero):
+    """Código impreso en el FUEC ('' si el servicio aún no tiene número)."""
+    if numero is None:
+        return ''
+    return f'FUEC-{numero:06d}'
+
+
+def _contador_bloqueado(empresa_id):
+    """Fila ConsecutivoFuec de la empresa, bloqueada hasta el commit."""
+    contador = ConsecutivoFuec.objects.select_for_update().filter(empresa_id=empresa_id).first()
+    if contador is None:
+        # Primera vez: si dos peticiones la crean a la vez, una no hace nada
+        ConsecutivoFuec.objects.bulk_create(
+            [ConsecutivoFuec(empresa_id=empresa_id)],
+            ignore_conflicts=True,
+        )
+        contador = ConsecutivoFuec.objects.select_for_update().get(empresa_id=empresa_id)
+    return contador
+
+
+def asignar_numeros_fuec(servicios):
+    """
+    Asigna el consecutivo del FUEC a los servicios (de una misma empresa)
+    que aún no lo tienen y lo deja en cada objeto. Es idempotente: un
+    servicio que ya tiene número lo conserva. Los CANCELADOS no tienen
+    FUEC y no gastan número.
+
+    En una transacción se bloquean las filas de esos servicios y la fila
+    del contador de la empresa (nunca la tabla), se reservan tantos
+    números como servicios y se guardan. Si algo falla se revierte todo:
+    no quedan huecos ni números repetidos.
+    """
+    sin_numero = {
+        s.pk: s for s in servicios
+        if s.fuec_numero is None and s.estado != 'CANCELADO'
+    }
+    if not sin_numero:
+        return
+
+    empresa_id = next(iter(sin_numero.values())).empresa_id
+    numeros = {}
+
+    with transaction.atomic():
+        # Orden fijo (pk) para que dos peticiones no se bloqueen en cruz.
+        # Los que otra petición numeró (o canceló) mientras esperábamos
+        # quedan fuera.
+        pendientes = list(
+            Servicio.objects.select_for_update().filter(
+                pk__in=list(sin_numero),
+                fuec_numero__isnull=True,
+            ).exclude(estado='CANCELADO').order_by('pk').values_list('pk', flat=True)
+        )
+
+        if pendientes:
+            contador = _contador_bloqueado(empresa_id)
+            for pk in pendientes:
+                contador.ultimo += 1
+                numeros[pk] = contador.ultimo
+            contador.save(update_fields=['ultimo'])
+
+            Servicio.objects.bulk_update(
+                [Servicio(pk=pk, fuec_numero=n) for pk, n in numeros.items()],
+                ['fuec_numero'],
+            )
+
+    # Los que numeró otra petición: se lee el número que les quedó
+    # (None si mientras tanto se cancelaron)
+    otros = [pk for pk in sin_numero if pk not in numeros]
+    if otros:
+        numeros.update(
+            Servicio.objects.filter(pk__in=otros).values_list('pk', 'fuec_numero')
+        )
+
+    for pk, servicio in sin_numero.items():
+        servicio.fuec_numero = numeros[pk]
+
+
+def con_numero_fuec(servicios, lote=200):
+    """
+    Recorre 'servicios' (ej: un .iterator()) asignando los números por
+    lotes de 'lote' servicios, para exportaciones masivas.
+    """
+    bloque = []
+    for servicio in servicios:
+        bloque.append(servicio)
+        if len(bloque) >= lote:
+            asignar_numeros_fuec(bloque)
+            yield from bloque
+            bloque = []
+    asignar_numeros_fuec(bloque)
+    yield from bloque
+
+
+def generar_pdf_fuec(servicio, empresa):
+    """
+    Renderiza el FUEC (sin caché) con el backend de FUEC_BACKEND:
+    - 'xhtml2pdf': la plantilla HTML, en el pool de renderizadores
+    - 'reportlab': dibujado directo con el canvas (inicio/fuec_reportlab.py),
+      en el mismo proceso
+    """
+    contexto = contexto_fuec(servicio, empresa)
+    if settings.FUEC_BACKEND == 'reportlab':
+        from .fuec_reportlab import render_fuec_reportlab
+        return render_fuec_reportlab(contexto)
+    return render_to_pdf(PLANTILLA_FUEC, contexto)
+
+
+#  CACHÉ EN DISCO (LRU por tamaño)
+REVISAR_CACHE_CADA = 100
+
+# Por proceso: tamaño de la caché en el último recorrido (más lo escrito
+# desde entonces) y escrituras desde ese recorrido
+_estimacion = {'total': None, 'escrituras': 0}
+
+
+def _directorio():
+    return Path(settings.FUEC_CACHE_DIR)
+
+
+def _ruta(clave):
+    return _directorio() / clave[:2] / f'{clave}.pdf'
+
+
+def leer_cache(clave):
+    """Devuelve los bytes del PDF cacheado o None."""
+    ruta = _ruta(clave)
+    try:
+        contenido = ruta.read_bytes()
+    except FileNotFoundError:
+        return None
+    # Marca el archivo como usado recientemente (para el LRU)
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        pass
+    return contenido
+
+
+def guardar_cache(clave, contenido):
+    """Guarda el PDF de forma atómica y libera espacio si hace falta."""
+    ruta = _ruta(clave)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+    # Recorrer toda la caché cuesta O(archivos): solo se hace si la
+    # estimación pasa del límite o cada REVISAR_CACHE_CADA escrituras
+    # (lo que escriben los otros procesos solo se ve al recorrerla)
+    _estimacion['escrituras'] += 1
+    if _estimacion['total'] is not None:
+        _estimacion['total'] += len(contenido)
+    if (
+        _estimacion['total'] is None
+        or _estimacion['total'] > settings.FUEC_CACHE_MAX_MB * 1024 * 1024
+        or _estimacion['escrituras'] >= REVISAR_CACHE_CADA
+    ):
+        desalojar_cache()
+
+
+def desalojar_cache(max_bytes=None):
+    """
+    Borra los PDF menos usados (mtime más viejo) hasta que el total
+    quede por debajo de FUEC_CACHE_MAX_MB. Los .lock no se tocan (otro
+    proceso puede tenerlos tomados; ver limpiar_bloqueos).
+    """
+    if max_bytes is None:
+        max_bytes = settings.FUEC_CACHE_MAX_MB * 1024 * 1024
+
+    archivos = []
+    total = 0
+    for ruta in _directorio().glob('*/*.pdf'):
+        try:
+            info = ruta.stat()
+        except FileNotFoundError:
+            continue
+        archivos.append((info.st_mtime, info.st_size, ruta))
+        total += info.st_size
+
+    if total > max_bytes:
+        for _, tamano, ruta in sorted(archivos):
+            try:
+                ruta.unlink()
+            except FileNotFoundError:
+                continue
+            total -= tamano
+            if total <= max_bytes:
+                break
+
+    _estimacion['total'] = total
+    _estimacion['escrituras'] = 0
+
+
+def limpiar_bloqueos(antiguedad=timedelta(hours=1)):
+    """
+    Borra los .lock sin PDF que nadie usa hace 'antiguedad'. Cada uno se
+    borra con su flock tomado (sin esperar: si está ocupado se deja), y
+    _bloqueo comprueba que el archivo que bloqueó siga en su ruta, así
+    que borrarlo no deja a dos procesos renderizando la misma llave.
+    Devuelve cuántos borró.
+    """
+    if fcntl is None:
+        return 0
+    limite = timezone.now().timestamp() - antiguedad.total_seconds()
+    borrados = 0
+    for ruta in _directorio().glob('*/*.lock'):
+        try:
+            if ruta.stat().st_mtime > limite or ruta.with_suffix('.pdf').exists():
+                continue
+            with open(ruta, 'a') as archivo:
+                try:
+                    fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                ruta.unlink()
+                borrados += 1
+        except FileNotFoundError:
+            continue
+    return borrados
+
+
+@contextmanager
+def _bloqueo(clave):
+    """
+    Bloqueo exclusivo por llave (archivo .lock + flock), válido entre
+    hilos y entre procesos de gunicorn de la misma máquina.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    ruta = _ruta(clave).with_suffix('.lock')
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        archivo = open(ruta, 'a')
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            mismo = os.fstat(archivo.fileno()).st_ino == os.stat(ruta).st_ino
+        except FileNotFoundError:
+            mismo = False
+        if mismo:
+            break
+        # limpiar_bloqueos lo borró mientras esperábamos: otro proceso
+        # puede estar usando ya un .lock nuevo en la misma ruta
+        archivo.close()
+    try:
+        yield
+    finally:
+        fcntl.flock(archivo, fcntl.LOCK_UN)
+        archivo.close()
+
+
+def obtener_pdf_fuec(servicio, empresa, clave=None):
+    """
+    Devuelve los bytes del FUEC (o None si no se pudo generar).
+
+    Si ya está en la caché se devuelve sin renderizar. Si no, solo una
+    petición por llave renderiza (single-flight): las demás esperan el
+    bloqueo y luego leen el archivo que dejó la primera.
+    """
+    clave = clave or clave_fuec(servicio, empresa)
+
+    contenido = leer_cache(clave)
+    if contenido is not None:
+        return contenido
+
+    with _bloqueo(clave):
+        contenido = leer_cache(clave)
+        if contenido is not None:
+            return contenido
+
+        contenido = generar_pdf_fuec(servicio, empresa)
+        if contenido is not None:
+            guardar_cache(clave, contenido)
+        return contenido
+
+
+#  TRABAJOS EN SEGUNDO PLANO (modo asíncrono)
+MAX_INTENTOS = 3
+
+# Un trabajo en PROCESANDO por más de esto se considera abandonado
+# (el worker se cayó) y vuelve a la cola.
+TIEMPO_MAXIMO_PROCESANDO = timedelta(minutes=10)
+
+
+def solicitar_fuec(servicio, empresa, user=None):
+    """
+    Encola la generación del FUEC. Si ya hay un trabajo para el mismo
+    contenido (misma llave) pendiente o listo, lo reutiliza.
+    """
+    asignar_numeros_fuec([servicio])
+    clave = clave_fuec(servicio, empresa)
+
+    trabajo = TrabajoFuec.objects.filter(
+        servicio=servicio,
+        clave=clave,
+    ).exclude(estado='ERROR').defer('pdf').order_by('-creado').first()
+
+    if trabajo is None:
+        trabajo = TrabajoFuec.objects.create(
+            empresa=empresa,
+            servicio=servicio,
+            solicitado_por=user,
+            clave=clave,
+        )
+    return trabajo
+
+
+def tomar_trabajo():
+    """
+    Reserva el trabajo pendiente más viejo y lo pasa a PROCESANDO.
+    Con SKIP LOCKED varios workers pueden tomar trabajos a la vez sin
+    pisarse. Devuelve None si la cola está vacía.
+    """
+    with transaction.atomic():
+        trabajo = TrabajoFuec.objects.select_for_update(
+            skip_locked=True,
+        ).filter(estado='PENDIENTE').defer('pdf').order_by('creado').first()
+
+        if trabajo is None:
+            return None
+
+        trabajo.estado = 'PROCESANDO'
+        trabajo.intentos += 1
+        trabajo.save(update_fields=['estado', 'intentos', 'actualizado'])
+    return trabajo
+
+
+def procesar_trabajo(trabajo):
+    """Genera el PDF de un trabajo reservado y guarda el resultado."""
+    servicio = Servicio.objects.select_related(
+        'conductor', 'vehiculo', 'empresa',
+    ).get(pk=trabajo.servicio_id)
+
+    try:
+        contenido = obtener_pdf_fuec(servicio, servicio.empresa)
+        error = '' if contenido is not None else 'No se pudo generar el PDF del FUEC.'
+    except RenderizadorOcupado:
+        # No es un fallo del trabajo: vuelve a la cola sin gastar intento
+        trabajo.estado = 'PENDIENTE'
+        trabajo.intentos -= 1
+        trabajo.save(update_fields=['estado', 'intentos', 'actualizado'])
+        return trabajo
+    except Exception as e:
+        contenido = None
+        error = str(e)
+
+    if contenido is not None:
+        trabajo.estado = 'LISTO'
+        trabajo.pdf = contenido
+        trabajo.error = ''
+    else:
+        trabajo.estado = 'PENDIENTE' if trabajo.intentos < MAX_INTENTOS else 'ERROR'
+        trabajo.error = error
+
+    trabajo.save(update_fields=['estado', 'pdf', 'error', 'actualizado'])
+    return trabajo
+
+
+def liberar_trabajos_abandonados():
+    """Devuelve a la cola los trabajos PROCESANDO de workers caídos."""
+    limite = timezone.now() - TIEMPO_MAXIMO_PROCESANDO
+    return TrabajoFuec.objects.filter(
+        estado='PROCESANDO',
+        actualizado__lt=limite,
+    ).update(estado='PENDIENTE', actualizado=timezone.now())
+
+
+def purgar_trabajos(dias):
+    """Borra los trabajos (y sus PDF) de hace más de 'dias' días."""
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = TrabajoFuec.objects.filter(creado__lt=limite).delete()
+    return borrados
+
+
+#  EXPORTACIÓN MASIVA (ZIP)
+# Segundos que un PDF del ZIP espera turno en el pool de renderizadores
+# (en total) antes de darlo por fallido, y pausa entre intentos
+ESPERA_MAXIMA_ZIP = 60
+PAUSA_ZIP = 0.5
+
+
+def _renderizar(servicio, empresa, clave):
+    """
+    Corre en un hilo de pdfs_fuec. No toca la base de datos. Si el pool
+    de renderizadores está lleno espera su turno (a mitad de un ZIP no
+    se puede responder 503), hasta ESPERA_MAXIMA_ZIP segundos: después
+    devuelve None y el servicio va a ERRORES.txt.
+    """
+    limite = time.monotonic() + ESPERA_MAXIMA_ZIP
+    while True:
+        try:
+            return obtener_pdf_fuec(servicio, empresa, clave=clave)
+        except RenderizadorOcupado:
+            if time.monotonic() + PAUSA_ZIP >= limite:
+                return None
+            time.sleep(PAUSA_ZIP)
+
+
+def pdfs_fuec(servicios, empresa, simultaneos=None):
+    """
+    Genera (servicio, bytes del PDF o None) para cada servicio, en el
+    orden en que van quedando listos.
+
+    Los que ya están en la caché salen de una vez; los demás se
+    renderizan de a FUEC_ZIP_PROCESOS a la vez, con hilos que usan el
+    pool de renderizadores del worker (inicio/renderizador.py): una
+    exportación no lanza procesos nuevos. Solo hay 2 trabajos por hilo
+    en vuelo, así que la memoria no depende de cuántos servicios se
+    exporten.
+    """
+    simultaneos = simultaneos or settings.FUEC_ZIP_PROCESOS or 1
+    en_vuelo = simultaneos * 2
+    hilos = None
+    pendientes = {}
+
+    def terminados(bloquear):
+        if not pendientes:
+            return
+        listos, _ = wait(pendientes, timeout=None if bloquear else 0, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            servicio = pendientes.pop(futuro)
+            try:
+                yield servicio, futuro.result()
+            except Exception:
+                yield servicio, None
+
+    try:
+        for servicio in servicios:
+            clave = clave_fuec(servicio, empresa)
+            contenido = leer_cache(clave)
+            if contenido is not None:
+                yield servicio, contenido
+                continue
+
+            if hilos is None:
+                hilos = ThreadPoolExecutor(max_workers=simultaneos, thread_name_prefix='zip-fuec')
+            pendientes[hilos.submit(_renderizar, servicio, empresa, clave)] = servicio
+
+            yield from terminados(bloquear=len(pendientes) >= en_vuelo)
+
+        while pendientes:
+            yield from terminados(bloquear=True)
+    finally:
+        if hilos is not None:
+            hilos.shutdown(wait=False, cancel_futures=True)
+
+
+class SalidaZip:
+    """
+    Destino de ZipFile que no se puede recorrer (sin seek/tell): ZipFile
+    escribe cada entrada con "data descriptor" y nosotros entregamos los
+    bytes al cliente apenas se escriben.
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def zip_fuec(servicios, empresa, simultaneos=None):
+    """
+    Generador con los bytes de un ZIP con el FUEC de cada servicio, para
+    un StreamingHttpResponse. El ZIP nunca está completo en memoria:
+    cada PDF se envía en cuanto termina de renderizarse.
+
+    'servicios' debe traer conductor y vehículo (select_related).
+    Si algún PDF falla se agrega ERRORES.txt al final.
+    """
+    salida = SalidaZip()
+    fallidos = []
+
+    # Los PDF ya vienen comprimidos: ZIP_STORED evita gastar CPU en nada
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo:
+        for servicio, contenido in pdfs_fuec(servicios, empresa, simultaneos):
+            if contenido is None:
+                fallidos.append(servicio)
+                continue
+            archivo.writestr(nombre_archivo_fuec(servicio), contenido)
+            yield salida.vaciar()
+
+        if fallidos:
+            lineas = [
+                f"Servicio {s.id} ({s.fecha_servicio}): no se pudo generar el PDF."
+                for s in fallidos
+            ]
+            archivo.writestr('ERRORES.txt', '\n'.join(lineas) + '\n')
+
+    yield salida.vaciar()
@@ -0,0 +1,248 @@
+"""
+FUEC dibujado directamente con ReportLab (sin HTML ni CSS).
+
+El FUEC es un formulario fijo: en vez de pasar la plantilla
+servicios/fuec_pdf.html por xhtml2pdf, se dibujan los mismos bloques con
+el canvas en posiciones calculadas. Se activa con FUEC_BACKEND='reportlab'.
+
+Si cambia la plantilla HTML hay que replicar el cambio aquí (y subir
+fuec.VERSION_FUEC para invalidar la caché).
+"""
+from io import BytesIO
+
+from django.utils.formats import localize
+from reportlab.graphics.barcode.qrencoder import QRCode, QRErrorCorrectLevel
+from reportlab.lib.colors import HexColor, black
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen.canvas import Canvas
+
+
+ANCHO, ALTO = A4
+MARGEN = 1 * cm  # el marco por defecto de xhtml2pdf
+ANCHO_UTIL = ANCHO - 2 * MARGEN
+
+# Mismas medidas que la plantilla (px * 0.75)
+FUENTE = 'Helvetica'
+FUENTE_NEGRITA = 'Helvetica-Bold'
+TAMANO = 8.25            # body: 11px
+TAMANO_PEQUENO = 6.75    # .small: 9px
+TAMANO_H2 = 10.5
+TAMANO_H3 = 9
+INTERLINEA = 1.2
+RELLENO = 6              # padding: 4px + el interlineado de xhtml2pdf
+SEPARACION_TABLAS = 6    # margin-top: 8px
+ALTO_FIRMA = 45          # height: 60px
+LADO_QR = 2 * cm
+# Máscara fija del QR: cualquiera es válida y probar las 8 para elegir la
+# "mejor" (lo que hace QrCodeWidget) es la mitad del costo de la página
+MASCARA_QR = 0
+GRIS = HexColor('#eeeeee')
+
+PIE = (
+    'Este extracto se expide para amparar el servicio descrito, de acuerdo '
+    'con la normatividad vigente de transporte especial en Colombia.'
+)
+
+
+def _texto(valor):
+    """Como lo imprime la plantilla (fechas d/m/Y, números localizados)."""
+    if valor is None or valor == '':
+        return ''
+    if hasattr(valor, 'strftime') and hasattr(valor, 'day'):
+        return valor.strftime('%d/%m/%Y')
+    return str(localize(valor))
+
+
+def _secciones(servicio):
+    """Filas de cada tabla: (etiqueta, valor, etiqueta, valor) o (etiqueta, valor)."""
+    vehiculo = servicio.vehiculo
+    conductor = servicio.conductor
+    return [
+        ('Datos del servicio', [
+            ('Fecha del servicio:', _texto(servicio.fecha_servicio),
+             'Estado:', servicio.get_estado_display()),
+            ('Origen:', servicio.origen, 'Destino:', servicio.destino),
+            ('Hora inicio:', _texto(servicio.hora_inicio),
+             'Hora fin:', _texto(servicio.hora_fin)),
+            ('Cliente / contratante:', servicio.cliente_nombre,
+             'Contacto:', _texto(servicio.cliente_contacto)),
+            ('Valor del servicio:', f'$ {_texto(servicio.valor)}'),
+        ]),
+        ('Datos del vehículo', [
+            ('Placa:', vehiculo.placa,
+             'Marca / Línea:', f'{vehiculo.marca} {vehiculo.linea}'),
+            ('Modelo:', _texto(vehiculo.modelo),
+             'Capacidad:', f'{vehiculo.capacidad_pasajeros} pasajeros'),
+            ('SOAT vence:', _texto(vehiculo.soat_vencimiento),
+             'Tecnomecánica vence:', _texto(vehiculo.tecnomecanica_vencimiento)),
+            ('Póliza contractual vence:', _texto(vehiculo.poliza_contractual_vencimiento),
+             'Póliza extracontractual vence:', _texto(vehiculo.poliza_extracontractual_vencimiento)),
+        ]),
+        ('Datos del conductor', [
+            ('Nombre:', conductor.nombre_completo,
+             'Documento:', conductor.numero_documento),
+            ('Teléfono:', _texto(conductor.telefono),
+             'Correo:', _texto(conductor.correo)),
+            ('Licencia:', f'{conductor.licencia_categoria} - {conductor.licencia_numero}',
+             'Vence licencia:', _texto(conductor.licencia_vencimiento)),
+        ]),
+    ]
+
+
+def _encabezado_tabla(c, y, titulo):
+    alto = TAMANO * INTERLINEA + 2 * RELLENO
+    c.setFillColor(GRIS)
+    c.rect(MARGEN, y - alto, ANCHO_UTIL, alto, stroke=1, fill=1)
+    c.setFillColor(black)
+    c.setFont(FUENTE_NEGRITA, TAMANO)
+    c.drawCentredString(MARGEN + ANCHO_UTIL / 2, y - RELLENO - TAMANO, titulo)
+    return y - alto
+
+
+def _tabla(c, y, titulo, filas):
+    """Dibuja una tabla de 4 columnas (etiqueta en negrita, valor)."""
+    y = _encabezado_tabla(c, y, titulo)
+    columna = ANCHO_UTIL / 4
+
+    for fila in filas:
+        if len(fila) == 2:
+            celdas = [(fila[0], True, columna), (fila[1], False, columna * 3)]
+        else:
+            celdas = [
+                (texto, i % 2 == 0, columna)
+                for i, texto in enumerate(fila)
+            ]
+
+        lineas = [
+            simpleSplit(texto or '', FUENTE_NEGRITA if negrita else FUENTE, TAMANO, ancho - 2 * RELLENO) or ['']
+            for texto, negrita, ancho in celdas
+        ]
+        alto = max(len(ls) for ls in lineas) * TAMANO * INTERLINEA + 2 * RELLENO
+
+        x = MARGEN
+        for (_, negrita, ancho), ls in zip(celdas, lineas):
+            c.rect(x, y - alto, ancho, alto, stroke=1, fill=0)
+            c.setFont(FUENTE_NEGRITA if negrita else FUENTE, TAMANO)
+            linea_y = y - RELLENO - TAMANO
+            for linea in ls:
+                c.drawString(x + RELLENO, linea_y, linea)
+                linea_y -= TAMANO * INTERLINEA
+            x += ancho
+        y -= alto
+    return y
+
+
+def _firmas(c, y, empresa):
+    y = _encabezado_tabla(c, y, 'Firmas')
+    mitad = ANCHO_UTIL / 2
+    textos = [f'Representante legal – {empresa.nombre}', 'Conductor']
+
+    for i, texto in enumerate(textos):
+        x = MARGEN + i * mitad
+        c.rect(x, y - ALTO_FIRMA, mitad, ALTO_FIRMA, stroke=1, fill=0)
+        centro = x + mitad / 2
+        c.setFont(FUENTE, TAMANO)
+        c.drawCentredString(centro, y - ALTO_FIRMA + RELLENO + TAMANO * INTERLINEA + 2, '_' * 31)
+        c.drawCentredString(centro, y - ALTO_FIRMA + RELLENO + 1, texto)
+    return y - ALTO_FIRMA
+
+
+def _qr(c, x, y, valor):
+    """
+    Dibuja el QR de 'valor' (LADO_QR x LADO_QR) con la esquina inferior
+    izquierda en (x, y): un solo trazado con un rectángulo por cada
+    tramo de módulos oscuros de cada fila.
+    """
+    qr = QRCode(None, QRErrorCorrectLevel.M)
+    qr.addData(valor)
+    qr.version = qr.calculate_version()
+    qr.makeImpl(False, MASCARA_QR)
+
+    n = qr.getModuleCount()
+    modulo = LADO_QR / n
+    trazo = c.beginPath()
+    for fila, modulos in enumerate(qr.modules):
+        fila_y = y + LADO_QR - (fila + 1) * modulo
+        inicio = None
+        for columna, oscuro in enumerate(modulos + [False]):
+            if oscuro and inicio is None:
+                inicio = columna
+            elif not oscuro and inicio is not None:
+                trazo.rect(x + inicio * modulo, fila_y, (columna - inicio) * modulo, modulo)
+                inicio = None
+    c.setFillColor(black)
+    c.drawPath(trazo, stroke=0, fill=1)
+
+
+def dibujar_fuec(c, contexto):
+    """
+    Dibuja una página del FUEC en el canvas 'c' (no llama showPage).
+    'contexto' es el mismo de la plantilla: empresa, servicio, generado y
+    opcionalmente fuec_codigo y url_verificacion.
+    """
+    empresa = contexto['empresa']
+    servicio = contexto['servicio']
+    codigo = contexto.get('fuec_codigo') or ''
+
+    c.setLineWidth(0.75)
+    c.setStrokeColor(black)
+    y = ALTO - MARGEN
+
+    # Encabezado
+    y -= TAMANO_H2 + 3
+    c.setFont(FUENTE_NEGRITA, TAMANO_H2)
+    c.drawCentredString(ANCHO / 2, y, 'FORMATO ÚNICO DE EXTRACTO DEL CONTRATO - FUEC')
+    y -= TAMANO_H3 + 6
+    c.setFont(FUENTE_NEGRITA, TAMANO_H3)
+    c.drawCentredString(ANCHO / 2, y, empresa.nombre)
+
+    y -= TAMANO
+    c.setFont(FUENTE, TAMANO_PEQUENO)
+    for linea in (
+        f'NIT: {empresa.nit}',
+        f'Dirección: {empresa.direccion} - Tel: {_texto(empresa.telefono)}',
+        f'Correo: {_texto(empresa.email)}',
+    ):
+        y -= TAMANO_PEQUENO * INTERLINEA
+        c.drawString(MARGEN, y, linea)
+
+    y -= TAMANO * 2
+    c.setFont(FUENTE_NEGRITA, TAMANO)
+    c.drawRightString(ANCHO - MARGEN, y, f'Código: {codigo}')
+    y -= TAMANO
+
+    # QR de verificación pública (ver inicio/verificacion.py)
+    if contexto.get('url_verificacion'):
+        y -= LADO_QR
+        _qr(c, ANCHO - MARGEN - LADO_QR, y, contexto['url_verificacion'])
+        y -= TAMANO_PEQUENO * INTERLINEA
+        c.setFont(FUENTE, TAMANO_PEQUENO)
+        c.drawRightString(ANCHO - MARGEN, y, 'Verifique este FUEC escaneando el código')
+        y -= TAMANO_PEQUENO
+
+    # Servicio, vehículo y conductor
+    for titulo, filas in _secciones(servicio):
+        y = _tabla(c, y - SEPARACION_TABLAS, titulo, filas)
+
+    y = _firmas(c, y - 15, empresa)
+
+    # Pie
+    c.setFont(FUENTE, TAMANO_PEQUENO)
+    y -= 11
+    pie = f"Generado el {_texto(contexto['generado'])} - {PIE}"
+    for linea in simpleSplit(pie, FUENTE, TAMANO_PEQUENO, ANCHO_UTIL):
+        y -= TAMANO_PEQUENO * INTERLINEA
+        c.drawString(MARGEN, y, linea)
+
+
+def render_fuec_reportlab(contexto):
+    """Devuelve los bytes del PDF de un FUEC (una página)."""
+    buffer = BytesIO()
+    c = Canvas(buffer, pagesize=A4)
+    c.setTitle(f"{contexto.get('fuec_codigo') or ''} - FUEC")
+    dibujar_fuec(c, contexto)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
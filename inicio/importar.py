@@ -0,0 +1,236 @@
+"""
+Importación masiva de conductores y vehículos desde un CSV.
+
+Para dar de alta una empresa nueva sin llenar el formulario cientos de
+veces. El archivo trae una fila por conductor o vehículo, con los mismos
+campos del formulario (los encabezados son los nombres de los campos).
+
+- El CSV se lee como stream (no se carga entero) y cada fila se valida
+  con los campos de ConductorForm / VehiculoForm, así que las reglas son
+  las mismas. Se usan los campos del formulario directamente (sin crear
+  un formulario por fila, que copia todos sus campos y vuelve a validar
+  el modelo): es lo que permite validar decenas de miles de filas en
+  pocos segundos.
+- La unicidad (documento del conductor en la empresa, placa del
+  vehículo) se revisa con una consulta por lote de TAMANO_LOTE filas, no
+  una por fila, y cada lote se guarda con un solo bulk_create
+  (update_conflicts): las filas nuevas se crean y las que ya existen se
+  actualizan.
+- Las filas con errores no se guardan; se reporta cada una con su
+  número de línea. Con 'simular' se valida todo sin guardar nada.
+"""
+import codecs
+import csv
+import io
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .forms import ConductorForm, VehiculoForm
+from .models import Conductor, Vehiculo
+
+
+TAMANO_LOTE = 1000
+
+# Errores que se guardan para mostrar (el total se cuenta igual)
+MAX_ERRORES = 1000
+
+IMPORTACIONES = {
+    'conductores': {
+        'titulo': 'conductores',
+        'modelo': Conductor,
+        'form': ConductorForm,
+        'clave': 'numero_documento',
+        'nombre_clave': 'documento',
+    },
+    'vehiculos': {
+        'titulo': 'vehículos',
+        'modelo': Vehiculo,
+        'form': VehiculoForm,
+        'clave': 'placa',
+        'nombre_clave': 'placa',
+    },
+}
+
+# Valores de la columna 'activo' que significan "no" (vacío = sí)
+_NO = {'0', 'no', 'n', 'false', 'falso', 'inactivo'}
+
+
+def campos_importacion(tipo):
+    """Columnas del CSV (los campos del formulario)."""
+    return list(IMPORTACIONES[tipo]['form']._meta.fields)
+
+
+def _codificacion(archivo):
+    """UTF-8 (con o sin BOM) o, si no lo es, Windows-1252 (Excel)."""
+    inicio = archivo.read(64 * 1024)
+    archivo.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(inicio, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+def leer_csv(archivo):
+    """
+    Genera (número de línea, dict) por cada fila no vacía del archivo
+    subido. Acepta ',' o ';' como separador (Excel en español usa ';').
+    """
+    texto = io.TextIOWrapper(archivo, encoding=_codificacion(archivo), newline='')
+    primera = texto.readline()
+    separador = ';' if primera.count(';') > primera.count(',') else ','
+    encabezados = [
+        h.strip().lower()
+        for h in next(csv.reader([primera], delimiter=separador), [])
+    ]
+
+    for numero, valores in enumerate(csv.reader(texto, delimiter=separador), start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, dict(zip(encabezados, (v.strip() for v in valores)))
+
+
+def limpiar_fila(campos, fila):
+    """
+    Valida una fila con los campos de un formulario ({nombre: Field}).
+    Devuelve (datos limpios, errores); errores es '' si la fila es válida.
+    """
+    datos = {}
+    errores = []
+    for nombre, campo in campos.items():
+        valor = fila.get(nombre, '')
+        if nombre == 'activo':
+            # Vacío o sin columna es "activo" (en el formulario sería False)
+            valor = valor.lower() not in _NO
+        try:
+            datos[nombre] = campo.clean(valor)
+        except ValidationError as e:
+            errores.append(f"{nombre}: {' '.join(e.messages)}")
+    return datos, '; '.join(errores)
+
+
+class Importacion:
+    """Estado de una importación: contadores y errores por fila."""
+
+    def __init__(self, tipo, empresa, simular=False):
+        self.config = IMPORTACIONES[tipo]
+        self.tipo = tipo
+        self.empresa = empresa
+        self.simular = simular
+        self.filas = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.total_errores = 0
+        self.errores = []
+        self._campos = self.config['form'].base_fields
+        # clave -> línea donde apareció primero (repetidos en el archivo)
+        self._vistos = {}
+
+    def error(self, numero, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append((numero, mensaje))
+
+    def ejecutar(self, archivo):
+        faltantes = [
+            campo
+            for campo, field in self._campos.items()
+            if field.required
+        ]
+        lote = []
+        for numero, fila in leer_csv(archivo):
+            if self.filas == 0:
+                faltantes = [c for c in faltantes if c not in fila]
+                if faltantes:
+                    self.error(1, f"Faltan columnas: {', '.join(faltantes)}.")
+                    return self
+
+            self.filas += 1
+            objeto = self._validar(numero, fila)
+            if objeto is not None:
+                lote.append((numero, objeto))
+            if len(lote) >= TAMANO_LOTE:
+                self._guardar_lote(lote)
+                lote = []
+
+        if lote:
+            self._guardar_lote(lote)
+        return self
+
+    def _validar(self, numero, fila):
+        datos, errores = limpiar_fila(self._campos, fila)
+        if errores:
+            self.error(numero, errores)
+            return None
+
+        objeto = self.config['modelo'](empresa=self.empresa, **datos)
+
+        clave = getattr(objeto, self.config['clave'])
+        if clave in self._vistos:
+            self.error(
+                numero,
+                f"{self.config['nombre_clave'].capitalize()} {clave} repetido en el archivo "
+                f"(línea {self._vistos[clave]})."
+            )
+            return None
+        self._vistos[clave] = numero
+        return objeto
+
+    def _existentes(self, claves):
+        """{clave: (pk, empresa_id)} de los que ya están en la base de datos."""
+        modelo = self.config['modelo']
+        if modelo is Vehiculo:
+            # La placa es única en todo el sistema, no solo en la empresa
+            filas = Vehiculo.objects.filter(placa__in=claves).values_list('placa', 'pk', 'empresa_id')
+        else:
+            filas = Conductor.objects.filter(
+                empresa=self.empresa,
+                numero_documento__in=claves,
+            ).values_list('numero_documento', 'pk', 'empresa_id')
+        return {clave: (pk, empresa_id) for clave, pk, empresa_id in filas}
+
+    def _guardar_lote(self, lote):
+        clave = self.config['clave']
+        existentes = self._existentes([getattr(o, clave) for _, o in lote])
+
+        objetos = []
+        creados = actualizados = 0
+        for numero, objeto in lote:
+            existente = existentes.get(getattr(objeto, clave))
+            if existente is None:
+                creados += 1
+            elif existente[1] != self.empresa.pk:
+                self.error(
+                    numero,
+                    f"La placa {objeto.placa} ya está registrada por otra empresa."
+                )
+                continue
+            else:
+                objeto.pk = existente[0]
+                actualizados += 1
+            objetos.append(objeto)
+
+        if objetos and not self.simular:
+            try:
+                with transaction.atomic():
+                    # Los que traen pk se actualizan (ON CONFLICT (id)); los
+                    # nuevos se insertan
+                    self.config['modelo'].objects.bulk_create(
+                        objetos,
+                        update_conflicts=True,
+                        unique_fields=['pk'],
+                        update_fields=campos_importacion(self.tipo) + ['actualizado'],
+                    )
+            except IntegrityError as e:
+                # Ej: otra empresa registró la misma placa mientras tanto
+                self.error(lote[0][0], f"No se pudo guardar el lote (líneas {lote[0][0]} a {lote[-1][0]}): {e}")
+                return
+
+        self.creados += creados
+        self.actualizados += actualizados
+
+
+def importar(tipo, empresa, archivo, simular=False):
+    """Importa el CSV 'archivo' (binario) y devuelve la Importacion."""
+    return Importacion(tipo, empresa, simular).ejecutar(archivo)
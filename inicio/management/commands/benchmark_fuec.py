@@ -0,0 +1,82 @@
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inicio.fuec import PLANTILLA_FUEC, contexto_fuec
+from inicio.fuec_reportlab import render_fuec_reportlab
+from inicio.models import Servicio
+from inicio.pdf import _renderizar
+
+
+BACKENDS = {
+    'xhtml2pdf': lambda contexto: _renderizar(PLANTILLA_FUEC, contexto),
+    'reportlab': render_fuec_reportlab,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los backends del FUEC (xhtml2pdf vs reportlab): latencia "
+        "por documento y pico de memoria. Renderiza en este proceso, sin "
+        "caché ni pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n',
+            type=int,
+            default=50,
+            help='PDF por backend (por defecto 50).',
+        )
+        parser.add_argument(
+            '--servicio',
+            type=int,
+            help='Id del servicio a usar (por defecto el primero).',
+        )
+
+    def handle(self, *args, **options):
+        if options['n'] < 1:
+            raise CommandError("-n debe ser al menos 1.")
+
+        servicios = Servicio.objects.select_related('conductor', 'vehiculo', 'empresa')
+        if options['servicio']:
+            servicios = servicios.filter(pk=options['servicio'])
+        servicio = servicios.order_by('pk').first()
+        if servicio is None:
+            raise CommandError("No hay servicios para generar el FUEC.")
+
+        contexto = contexto_fuec(servicio, servicio.empresa)
+        n = options['n']
+
+        self.stdout.write(
+            f"{'backend':<10} {'media ms':>9} {'p95 ms':>8} {'PDF/s':>8} "
+            f"{'pico MB':>8} {'KB':>6}"
+        )
+        for nombre, renderizar in BACKENDS.items():
+            # Calentamiento: imports, fuentes y plantilla fuera de la medición
+            pdf = renderizar(contexto)
+            if pdf is None:
+                # xhtml2pdf devuelve None si la plantilla falla
+                self.stderr.write(f"{nombre:<10} no generó el PDF.")
+                continue
+
+            tiempos = []
+            for _ in range(n):
+                inicio = time.perf_counter()
+                renderizar(contexto)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+
+            tracemalloc.start()
+            renderizar(contexto)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            media = statistics.mean(tiempos)
+            p95 = sorted(tiempos)[math.ceil(n * 95 / 100) - 1]
+            self.stdout.write(
+                f"{nombre:<10} {media:>9.1f} {p95:>8.1f} {1000 / media:>8.1f} "
+                f"{pico / (1024 * 1024):>8.2f} {len(pdf) / 1024:>6.1f}"
+            )
@@ -0,0 +1,164 @@
+import random
+import statistics
+import time as reloj
+from datetime import time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from inicio.models import DOCUMENTOS_VEHICULO, Conductor, Empresa, Servicio, Vehiculo
+from inicio.planificacion import aplicar_plan, planificar
+
+
+CAPACIDADES = [4, 10, 15, 19, 25, 30, 40]
+CATEGORIAS = ['B1', 'C1', 'C2', 'C2']
+
+
+class _Descartar(Exception):
+    """Sale del atomic() para deshacer los datos de prueba."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la planificación del día (planificar y aplicar_plan) con una "
+        "empresa de prueba de N servicios y M vehículos. Los datos se crean "
+        "en una transacción que se deshace al terminar: no queda nada en la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servicios',
+            type=int,
+            default=1000,
+            help='Servicios del día (por defecto 1000).',
+        )
+        parser.add_argument(
+            '--vehiculos',
+            type=int,
+            default=300,
+            help='Vehículos de la empresa (por defecto 300).',
+        )
+        parser.add_argument(
+            '--conductores',
+            type=int,
+            default=400,
+            help='Conductores de la empresa (por defecto 400).',
+        )
+        parser.add_argument(
+            '-n',
+            type=int,
+            default=5,
+            help='Veces que se mide planificar (por defecto 5).',
+        )
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            default=7,
+            help='Semilla de los datos aleatorios (por defecto 7).',
+        )
+
+    def handle(self, *args, **options):
+        if options['n'] < 1:
+            raise CommandError("-n debe ser al menos 1.")
+        for opcion in ('servicios', 'vehiculos', 'conductores'):
+            if options[opcion] < 1:
+                raise CommandError(f"--{opcion} debe ser al menos 1.")
+
+        try:
+            with transaction.atomic():
+                self._medir(options)
+                raise _Descartar
+        except _Descartar:
+            pass
+
+    def _datos(self, options, fecha):
+        """Empresa con conductores, vehículos y servicios aleatorios."""
+        azar = random.Random(options['semilla'])
+        vigente = fecha + timedelta(days=30)
+
+        empresa = Empresa.objects.create(nombre='Benchmark planificación', nit='benchmark')
+        conductores = Conductor.objects.bulk_create([
+            Conductor(
+                empresa=empresa,
+                nombre_completo=f'Conductor {i}',
+                tipo_documento='CC',
+                numero_documento=f'B{i}',
+                licencia_numero=f'B{i}',
+                licencia_categoria=azar.choice(CATEGORIAS),
+                # Algunas licencias vencidas, para que se descarten
+                licencia_vencimiento=vigente if i % 25 else fecha - timedelta(days=1),
+            )
+            for i in range(options['conductores'])
+        ])
+        vehiculos = Vehiculo.objects.bulk_create([
+            Vehiculo(
+                empresa=empresa,
+                placa=f'BENCH{i:04d}',
+                marca='Marca',
+                modelo=2020,
+                capacidad_pasajeros=azar.choice(CAPACIDADES),
+                **{campo: vigente for campo, _ in DOCUMENTOS_VEHICULO},
+            )
+            for i in range(options['vehiculos'])
+        ])
+
+        servicios = []
+        for _ in range(options['servicios']):
+            inicio = azar.randint(0, 22) * 60 + azar.choice([0, 15, 30, 45])
+            fin = (inicio + azar.randint(30, 240)) % (24 * 60)
+            servicios.append(Servicio(
+                empresa=empresa,
+                conductor=azar.choice(conductores),
+                vehiculo=azar.choice(vehiculos),
+                fecha_servicio=fecha,
+                hora_inicio=time(inicio // 60, inicio % 60),
+                hora_fin=time(fin // 60, fin % 60),
+                origen='A',
+                destino='B',
+                cliente_nombre='Cliente',
+                pasajeros=azar.randint(1, 35),
+            ))
+        Servicio.objects.bulk_create(servicios)
+        return empresa
+
+    def _medir(self, options):
+        fecha = timezone.localdate() + timedelta(days=1)
+
+        inicio = reloj.perf_counter()
+        empresa = self._datos(options, fecha)
+        self.stdout.write(
+            f"Datos: {options['servicios']} servicios, {options['vehiculos']} vehículos, "
+            f"{options['conductores']} conductores ({reloj.perf_counter() - inicio:.1f} s)."
+        )
+
+        # Calentamiento: imports y conexión fuera de la medición
+        plan = planificar(empresa, fecha)
+
+        tiempos = []
+        for _ in range(options['n']):
+            inicio = reloj.perf_counter()
+            plan = planificar(empresa, fecha)
+            tiempos.append((reloj.perf_counter() - inicio) * 1000)
+
+        inicio = reloj.perf_counter()
+        aplicados, _ = aplicar_plan(empresa, fecha, plan.firma)
+        aplicar_ms = (reloj.perf_counter() - inicio) * 1000
+
+        self.stdout.write(
+            f"Plan: {len(plan.asignaciones)} planificados, {len(plan.sin_asignar)} sin asignación, "
+            f"{len(plan.cambios)} cambian; vehículos {plan.vehiculos_antes} -> {plan.vehiculos_despues}, "
+            f"tiempo muerto {plan.espera_antes} -> {plan.espera_despues} min."
+        )
+        self.stdout.write(f"{'paso':<12} {'media ms':>9} {'mín ms':>8} {'máx ms':>8}")
+        self.stdout.write(
+            f"{'planificar':<12} {statistics.mean(tiempos):>9.1f} "
+            f"{min(tiempos):>8.1f} {max(tiempos):>8.1f}"
+        )
+        self.stdout.write(
+            f"{'aplicar_plan':<12} {aplicar_ms:>9.1f} {aplicar_ms:>8.1f} {aplicar_ms:>8.1f}"
+        )
+        if aplicados is None:
+            self.stdout.write(self.style.WARNING("aplicar_plan no aplicó: el plan cambió entre medidas."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Servicios actualizados: {aplicados}."))
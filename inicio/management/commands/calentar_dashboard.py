@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inicio.dashboard import obtener_resumen
+from inicio.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Precalcula el resumen del dashboard (KPIs y alertas) de todas "
+        "las empresas. Útil después de un deploy."
+    )
+
+    def handle(self, *args, **options):
+        total = 0
+        for empresa in Empresa.objects.iterator():
+            obtener_resumen(empresa, refrescar=True)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dashboard precalculado para {total} empresas."
+        ))
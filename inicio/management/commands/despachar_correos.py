@@ -0,0 +1,78 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from inicio.correos import (
+    TAMANO_LOTE,
+    despachar_correos,
+    liberar_correos_abandonados,
+    purgar_correos,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de correos: envía los correos de la bandeja de salida por "
+        "lotes, reutilizando una sola conexión y reintentando los fallidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Envía lo que haya en la cola y termina.',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos de espera cuando la cola está vacía (por defecto 1).',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Correos por conexión (por defecto {TAMANO_LOTE}).',
+        )
+        parser.add_argument(
+            '--purgar-dias',
+            type=int,
+            default=30,
+            help='Borra los correos enviados hace más de N días (por defecto 30).',
+        )
+
+    def handle(self, *args, **options):
+        total_enviados = 0
+        total_fallidos = 0
+        ultima_limpieza = 0
+
+        # Una sola conexión de correo para todo el proceso; se cierra
+        # mientras la cola está vacía (el servidor cortaría la inactiva)
+        # y se vuelve a abrir con el siguiente lote
+        conexion = get_connection(fail_silently=False)
+        try:
+            while True:
+                # Limpieza cada minuto
+                if time.monotonic() - ultima_limpieza > 60:
+                    liberar_correos_abandonados()
+                    purgar_correos(options['purgar_dias'])
+                    ultima_limpieza = time.monotonic()
+
+                enviados, fallidos = despachar_correos(limite=options['lote'], conexion=conexion)
+                if not enviados and not fallidos:
+                    if options['una_vez']:
+                        break
+                    conexion.close()
+                    time.sleep(options['intervalo'])
+                    continue
+
+                total_enviados += enviados
+                total_fallidos += fallidos
+                self.stdout.write(f"Lote: {enviados} enviados, {fallidos} fallidos")
+        finally:
+            conexion.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Correos enviados: {total_enviados}, fallidos: {total_fallidos}."
+        ))
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from inicio.avisos import encolar_avisos_vencimiento
+from inicio.correos import despachar_correos
+
+
+class Command(BaseCommand):
+    help = (
+        "Aviso diario de vencimientos: encola un resumen por destinatario "
+        "(administrador de cada empresa y, opcionalmente, cada conductor) y "
+        "lo envía por una sola conexión de correo. Se puede correr varias "
+        "veces el mismo día sin repetir correos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Incluye lo que vence en los próximos N días (por defecto 30).',
+        )
+        parser.add_argument(
+            '--conductores',
+            action='store_true',
+            help='También avisa a cada conductor (con correo) de su licencia.',
+        )
+        parser.add_argument(
+            '--sin-enviar',
+            action='store_true',
+            help='Solo encola los correos (los envía despachar_correos).',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        encolados, omitidos = encolar_avisos_vencimiento(
+            dias_alerta=options['dias'],
+            conductores=options['conductores'],
+        )
+        self.stdout.write(
+            f"Avisos encolados: {encolados} ({time.perf_counter() - inicio:.1f} s)."
+        )
+        if omitidos:
+            self.stdout.write(self.style.WARNING(
+                f"Avisos omitidos: {omitidos} (otra ejecución ya los había encolado)."
+            ))
+
+        if options['sin_enviar'] or settings.CORREO_ASINCRONO:
+            return
+
+        # Se vacía la bandeja de salida reutilizando una sola conexión
+        enviados = fallidos = 0
+        conexion = get_connection(fail_silently=False)
+        try:
+            while True:
+                e, f = despachar_correos(conexion=conexion)
+                if not e and not f:
+                    break
+                enviados += e
+                fallidos += f
+        finally:
+            conexion.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Correos enviados: {enviados}, fallidos: {fallidos} "
+            f"({time.perf_counter() - inicio:.1f} s)."
+        ))
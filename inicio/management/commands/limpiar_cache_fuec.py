@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inicio.fuec import desalojar_cache, limpiar_bloqueos
+
+
+class Command(BaseCommand):
+    help = (
+        "Ajusta la caché de PDF del FUEC a FUEC_CACHE_MAX_MB y borra los "
+        "archivos .lock que ya no se usan. Pensado para un cron (ej: cada hora)."
+    )
+
+    def handle(self, *args, **options):
+        desalojar_cache()
+        borrados = limpiar_bloqueos()
+        self.stdout.write(self.style.SUCCESS(
+            f"Caché del FUEC revisada; {borrados} bloqueos sin uso borrados."
+        ))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inicio.fuec import (
+    liberar_trabajos_abandonados,
+    procesar_trabajo,
+    purgar_trabajos,
+    tomar_trabajo,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de FUEC asíncronos: toma los trabajos pendientes, genera "
+        "el PDF y lo deja listo para descargar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa lo que haya en la cola y termina.',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos de espera cuando la cola está vacía (por defecto 1).',
+        )
+        parser.add_argument(
+            '--purgar-dias',
+            type=int,
+            default=7,
+            help='Borra los trabajos de hace más de N días (por defecto 7).',
+        )
+
+    def handle(self, *args, **options):
+        procesados = 0
+        ultima_limpieza = 0
+
+        while True:
+            # Limpieza cada minuto
+            if time.monotonic() - ultima_limpieza > 60:
+                liberar_trabajos_abandonados()
+                purgar_trabajos(options['purgar_dias'])
+                ultima_limpieza = time.monotonic()
+
+            trabajo = tomar_trabajo()
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            trabajo = procesar_trabajo(trabajo)
+            procesados += 1
+            self.stdout.write(f"FUEC servicio {trabajo.servicio_id}: {trabajo.estado}")
+
+        self.stdout.write(self.style.SUCCESS(f"Trabajos procesados: {procesados}."))
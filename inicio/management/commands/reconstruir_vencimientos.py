@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inicio.models import Empresa
+from inicio.vencimientos import reconstruir_vencimientos
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la tabla de vencimientos de documentos "
+        "(licencias, SOAT, tecnomecánica, pólizas) desde Conductor y Vehiculo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa',
+            type=int,
+            help='ID de la empresa a reconstruir (por defecto: todas).',
+        )
+
+    def handle(self, *args, **options):
+        empresa = None
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(pk=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f"No existe la empresa {options['empresa']}.")
+
+        total = reconstruir_vencimientos(empresa)
+        self.stdout.write(self.style.SUCCESS(
+            f"Vencimientos reconstruidos: {total} documentos."
+        ))
@@ -0,0 +1,144 @@
+"""
+Manifiesto de servicios: un solo PDF con la lista de los servicios
+seleccionados (ej: los de un día, de un vehículo o de un conductor) y a
+continuación la página del FUEC de cada uno.
+
+Se dibuja en una sola pasada sobre un canvas de ReportLab, reutilizando
+el dibujo del FUEC de fuec_reportlab.py: no se renderiza cada FUEC por
+separado ni se unen PDF.
+
+- Siempre se usa el dibujo de ReportLab, aunque FUEC_BACKEND sea
+  'xhtml2pdf': con la plantilla HTML habría que renderizar cada FUEC
+  aparte (unos 200 ms cada uno) y unir los PDF.
+- La respuesta no se envía por páginas: ReportLab escribe el archivo
+  (con la tabla de referencias al final) recién en save(). El PDF
+  completo queda en un archivo temporal y luego se envía por partes.
+"""
+from django.utils.formats import localize
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+from .fuec import contexto_fuec
+from .fuec_reportlab import (
+    ALTO,
+    ANCHO,
+    ANCHO_UTIL,
+    FUENTE,
+    FUENTE_NEGRITA,
+    GRIS,
+    MARGEN,
+    TAMANO,
+    TAMANO_H2,
+    TAMANO_PEQUENO,
+    dibujar_fuec,
+)
+
+
+# (título, ancho relativo) de las columnas de la lista
+COLUMNAS = (
+    ('#', 3),
+    ('Fecha', 8),
+    ('Hora', 5),
+    ('Origen → Destino', 24),
+    ('Cliente', 16),
+    ('Vehículo', 8),
+    ('Conductor', 20),
+    ('Estado', 9),
+)
+
+ALTO_FILA = 14
+
+
+def _recortar(texto, fuente, ancho):
+    """Corta el texto (con '…') para que quepa en 'ancho'."""
+    if stringWidth(texto, fuente, TAMANO) <= ancho:
+        return texto
+    while texto and stringWidth(texto + '…', fuente, TAMANO) > ancho:
+        texto = texto[:-1]
+    return texto + '…'
+
+
+def _celdas(numero, servicio):
+    return (
+        str(numero),
+        servicio.fecha_servicio.strftime('%d/%m/%Y'),
+        str(localize(servicio.hora_inicio)) if servicio.hora_inicio else '',
+        f'{servicio.origen} → {servicio.destino}',
+        servicio.cliente_nombre,
+        servicio.vehiculo.placa,
+        servicio.conductor.nombre_completo,
+        servicio.get_estado_display(),
+    )
+
+
+def _encabezado_lista(c, empresa, titulo, pagina):
+    y = ALTO - MARGEN - TAMANO_H2
+    c.setFont(FUENTE_NEGRITA, TAMANO_H2)
+    c.drawCentredString(ANCHO / 2, y, titulo)
+    y -= TAMANO_H2 + 2
+    c.setFont(FUENTE, TAMANO_PEQUENO)
+    c.drawCentredString(ANCHO / 2, y, f'{empresa.nombre} - NIT {empresa.nit}')
+    c.drawRightString(ANCHO - MARGEN, MARGEN / 2, f'Lista, página {pagina}')
+    return y - 12
+
+
+def _fila(c, y, celdas, anchos, negrita=False, fondo=False):
+    if fondo:
+        c.setFillColor(GRIS)
+        c.rect(MARGEN, y - ALTO_FILA, ANCHO_UTIL, ALTO_FILA, stroke=0, fill=1)
+        c.setFillColorRGB(0, 0, 0)
+    fuente = FUENTE_NEGRITA if negrita else FUENTE
+    c.setFont(fuente, TAMANO)
+    x = MARGEN
+    for texto, ancho in zip(celdas, anchos):
+        c.drawString(x + 2, y - ALTO_FILA + 4, _recortar(texto, fuente, ancho - 4))
+        x += ancho
+    c.line(MARGEN, y - ALTO_FILA, ANCHO - MARGEN, y - ALTO_FILA)
+    return y - ALTO_FILA
+
+
+def _lista(c, servicios, empresa, titulo):
+    """Páginas iniciales con una fila por servicio."""
+    total = sum(a for _, a in COLUMNAS)
+    anchos = [ANCHO_UTIL * a / total for _, a in COLUMNAS]
+    encabezados = [t for t, _ in COLUMNAS]
+
+    pagina = 1
+    y = _encabezado_lista(c, empresa, titulo, pagina)
+    y = _fila(c, y, encabezados, anchos, negrita=True, fondo=True)
+
+    for numero, servicio in enumerate(servicios, start=1):
+        if y - ALTO_FILA < MARGEN:
+            c.showPage()
+            pagina += 1
+            y = _encabezado_lista(c, empresa, titulo, pagina)
+            y = _fila(c, y, encabezados, anchos, negrita=True, fondo=True)
+        y = _fila(c, y, _celdas(numero, servicio), anchos)
+
+    c.setFont(FUENTE_NEGRITA, TAMANO)
+    c.drawString(MARGEN, y - 14, f'Total: {len(servicios)} servicios')
+    c.showPage()
+
+
+def generar_manifiesto(servicios, empresa, destino, titulo):
+    """
+    Escribe en 'destino' (archivo binario) el PDF del manifiesto:
+    la lista de servicios y luego un FUEC por página (los cancelados
+    solo van en la lista).
+
+    'servicios' es una lista ya cargada con conductor y vehículo
+    (select_related): aquí no se hace ninguna consulta.
+    """
+    c = Canvas(destino, pagesize=A4)
+    c.setTitle(titulo)
+
+    _lista(c, servicios, empresa, titulo)
+
+    for servicio in servicios:
+        if servicio.estado == 'CANCELADO':
+            continue
+        dibujar_fuec(c, contexto_fuec(servicio, empresa))
+        c.showPage()
+
+    c.save()
@@ -0,0 +1,38 @@
+from django.utils.functional import SimpleLazyObject
+
+from .empresas import obtener_empresa_actual
+
+
+class EmpresaActualMiddleware:
+    """
+    Resuelve la empresa (tenant) del usuario una sola vez por request
+    y la deja en request.empresa. Se carga de forma perezosa, así que
+    las vistas que no la usan no pagan ninguna consulta.
+
+    Debe ir después de AuthenticationMiddleware.
+
+    Las vistas marcadas con @sin_sesion no tocan request.user: así la
+    sesión no se lee y la respuesta no lleva 'Vary: Cookie' (se puede
+    cachear igual para todos).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.empresa = None
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'sin_sesion', False):
+            return None
+        user = request.user
+        if user.is_authenticated:
+            request.empresa = SimpleLazyObject(lambda: obtener_empresa_actual(user))
+        return None
+
+
+def sin_sesion(view_func):
+    """Vista pública que no usa la sesión ni request.empresa."""
+    view_func.sin_sesion = True
+    return view_func
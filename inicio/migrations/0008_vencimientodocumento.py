@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+DOCUMENTOS = {
+    'Conductor': ['licencia_vencimiento'],
+    'Vehiculo': [
+        'soat_vencimiento',
+        'tecnomecanica_vencimiento',
+        'poliza_contractual_vencimiento',
+        'poliza_extracontractual_vencimiento',
+    ],
+}
+
+
+def poblar_vencimientos(apps, schema_editor):
+    VencimientoDocumento = apps.get_model('inicio', 'VencimientoDocumento')
+
+    filas = []
+    for nombre_modelo, campos in DOCUMENTOS.items():
+        modelo = apps.get_model('inicio', nombre_modelo)
+        for obj in modelo.objects.iterator(chunk_size=1000):
+            if nombre_modelo == 'Conductor':
+                origen, titulo, detalle = 'CONDUCTOR', obj.nombre_completo, obj.numero_documento
+            else:
+                origen, titulo, detalle = 'VEHICULO', obj.placa, f'{obj.marca} {obj.linea}'
+
+            for campo in campos:
+                fecha = getattr(obj, campo)
+                if fecha:
+                    filas.append(VencimientoDocumento(
+                        empresa_id=obj.empresa_id,
+                        origen=origen,
+                        objeto_id=obj.pk,
+                        tipo=campo,
+                        fecha=fecha,
+                        titulo=titulo,
+                        detalle=detalle,
+                    ))
+
+    VencimientoDocumento.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inicio', '0007_alter_conductor_licencia_categoria_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VencimientoDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origen', models.CharField(choices=[('CONDUCTOR', 'Conductor'), ('VEHICULO', 'Vehículo')], max_length=10)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('tipo', models.CharField(choices=[('licencia_vencimiento', 'Licencia de conducción'), ('soat_vencimiento', 'SOAT'), ('tecnomecanica_vencimiento', 'Tecnomecánica'), ('poliza_contractual_vencimiento', 'Póliza contractual'), ('poliza_extracontractual_vencimiento', 'Póliza extracontractual')], max_length=40)),
+                ('fecha', models.DateField()),
+                ('titulo', models.CharField(max_length=150)),
+                ('detalle', models.CharField(blank=True, max_length=150)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vencimientos', to='inicio.empresa')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empresa', 'fecha'], name='vencimiento_empresa_fecha')],
+                'constraints': [models.UniqueConstraint(fields=('origen', 'objeto_id', 'tipo'), name='vencimiento_documento_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_vencimientos, migrations.RunPython.noop),
+    ]
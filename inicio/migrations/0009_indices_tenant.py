@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+from inicio.operaciones import AddIndexConcurrentlySiPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('inicio', '0008_vencimientodocumento'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlySiPostgres(
+            model_name='conductor',
+            index=models.Index(fields=['empresa', 'activo'], name='conductor_empresa_activo'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='conductor',
+            index=models.Index(condition=models.Q(('licencia_vencimiento__isnull', False)), fields=['empresa', 'licencia_vencimiento'], name='conductor_licencia_venc'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='servicio',
+            index=models.Index(fields=['empresa', '-fecha_servicio', '-hora_inicio'], name='servicio_empresa_fecha_hora'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='servicio',
+            index=models.Index(fields=['empresa', 'estado', 'fecha_servicio'], name='servicio_empresa_estado_fecha'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='servicio',
+            index=models.Index(fields=['conductor', 'fecha_servicio'], name='servicio_conductor_fecha'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='servicio',
+            index=models.Index(fields=['vehiculo', 'fecha_servicio'], name='servicio_vehiculo_fecha'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', 'activo'], name='vehiculo_empresa_activo'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('soat_vencimiento__isnull', False)), fields=['empresa', 'soat_vencimiento'], name='vehiculo_soat_venc'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('tecnomecanica_vencimiento__isnull', False)), fields=['empresa', 'tecnomecanica_vencimiento'], name='vehiculo_tecnomecanica_venc'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('poliza_contractual_vencimiento__isnull', False)), fields=['empresa', 'poliza_contractual_vencimiento'], name='vehiculo_poliza_contr_venc'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(condition=models.Q(('poliza_extracontractual_vencimiento__isnull', False)), fields=['empresa', 'poliza_extracontractual_vencimiento'], name='vehiculo_poliza_extra_venc'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+from inicio.operaciones import AddIndexConcurrentlySiPostgres
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('inicio', '0009_indices_tenant'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlySiPostgres(
+            model_name='conductor',
+            index=models.Index(fields=['empresa', 'nombre_completo'], name='conductor_empresa_nombre'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='conductor',
+            index=models.Index(fields=['empresa', 'numero_documento'], name='conductor_empresa_documento'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', 'placa'], name='vehiculo_empresa_placa'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', 'marca'], name='vehiculo_empresa_marca'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', 'modelo'], name='vehiculo_empresa_modelo'),
+        ),
+        AddIndexConcurrentlySiPostgres(
+            model_name='vehiculo',
+            index=models.Index(fields=['empresa', 'capacidad_pasajeros'], name='vehiculo_empresa_capacidad'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+from inicio.operaciones import RunSQLSiPostgres
+
+
+# unaccent() no es IMMUTABLE y no se puede usar en un índice;
+# esta función la envuelve fijando el diccionario.
+FUNCION_UNACCENT = """
+CREATE OR REPLACE FUNCTION inicio_unaccent(text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent', $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+"""
+
+
+def indice_trigramas(nombre, tabla, columnas):
+    """
+    Índice GIN sobre el mismo documento que arma
+    inicio.busqueda.DocumentoBusqueda.
+    """
+    documento = " || ' ' || ".join(columnas)
+    return RunSQLSiPostgres(
+        sql=(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON {tabla} '
+            f'USING gin (inicio_unaccent(lower({documento})) gin_trgm_ops);'
+        ),
+        reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS {nombre};',
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('inicio', '0010_indices_listas'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        RunSQLSiPostgres(
+            sql=FUNCION_UNACCENT,
+            reverse_sql='DROP FUNCTION IF EXISTS inicio_unaccent(text);',
+        ),
+        indice_trigramas(
+            'servicio_busqueda_trgm', 'inicio_servicio',
+            ['origen', 'destino', 'cliente_nombre'],
+        ),
+        indice_trigramas(
+            'conductor_busqueda_trgm', 'inicio_conductor',
+            ['nombre_completo', 'numero_documento'],
+        ),
+        indice_trigramas(
+            'vehiculo_busqueda_trgm', 'inicio_vehiculo',
+            ['placa', 'marca', 'linea'],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inicio', '0012_trabajofuec'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsecutivoFuec',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='consecutivo_fuec', serialize=False, to='inicio.empresa')),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='fuec_numero',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='servicio',
+            constraint=models.UniqueConstraint(condition=models.Q(('fuec_numero__isnull', False)), fields=('empresa', 'fuec_numero'), name='servicio_fuec_numero_unico'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inicio', '0014_correosaliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvisoVencimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('para', models.EmailField(max_length=254)),
+                ('alertas', models.PositiveIntegerField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avisos_vencimiento', to='inicio.empresa')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'empresa', 'para'), name='aviso_vencimiento_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inicio', '0015_avisovencimiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicio',
+            name='pasajeros',
+            field=models.PositiveIntegerField(default=0, help_text='Capacidad mínima del vehículo (0 = cualquiera)'),
+        ),
+    ]
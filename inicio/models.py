@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -58,6 +59,77 @@ class CodigoVerificacion(models.Model):
 
 
 
+#  DOCUMENTOS CON VENCIMIENTO
+# (campo de fecha en el modelo, nombre visible)
+DOCUMENTOS_CONDUCTOR = [
+    ('licencia_vencimiento', 'Licencia de conducción'),
+]
+
+DOCUMENTOS_VEHICULO = [
+    ('soat_vencimiento', 'SOAT'),
+    ('tecnomecanica_vencimiento', 'Tecnomecánica'),
+    ('poliza_contractual_vencimiento', 'Póliza contractual'),
+    ('poliza_extracontractual_vencimiento', 'Póliza extracontractual'),
+]
+
+
+# pks por UPDATE al sincronizar (límite de parámetros de SQLite)
+_LOTE_UPDATE = 1000
+
+
+class VencimientosQuerySet(models.QuerySet):
+    """
+    QuerySet de Conductor / Vehiculo que mantiene sincronizada la tabla
+    VencimientoDocumento (y el dashboard cacheado) también en updates
+    masivos (.update() y .bulk_update(), que no disparan señales).
+    """
+
+    def update(self, **kwargs):
+        from .dashboard import invalidar_resumen
+        from .vencimientos import CAMPOS_SINCRONIZADOS, sincronizar_vencimientos
+
+        if not CAMPOS_SINCRONIZADOS.intersection(kwargs):
+            # Solo hace falta saber qué dashboards invalidar
+            empresa_ids = set(self.order_by().values_list('empresa_id', flat=True).distinct())
+            filas = super().update(**kwargs)
+        else:
+            with transaction.atomic():
+                # Se actualizan exactamente las filas leídas (y bloqueadas):
+                # una que empiece a cumplir el filtro entre la lectura y el
+                # UPDATE no queda actualizada sin sincronizar
+                afectados = list(self.select_for_update().values_list('pk', 'empresa_id'))
+                pks = [pk for pk, _ in afectados]
+                filas = 0
+                for i in range(0, len(pks), _LOTE_UPDATE):
+                    filas += models.QuerySet(self.model, using=self.db).filter(
+                        pk__in=pks[i:i + _LOTE_UPDATE],
+                    ).update(**kwargs)
+                sincronizar_vencimientos(self.model, pks)
+            empresa_ids = {e for _, e in afectados}
+
+        if 'empresa' in kwargs or 'empresa_id' in kwargs:
+            nueva = kwargs.get('empresa_id', kwargs.get('empresa'))
+            empresa_ids.add(getattr(nueva, 'pk', nueva))
+        transaction.on_commit(lambda: invalidar_resumen(*empresa_ids))
+        return filas
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .dashboard import invalidar_resumen
+        from .vencimientos import sincronizar_vencimientos
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        sincronizar_vencimientos(self.model, [o.pk for o in objs if o.pk])
+
+        empresa_ids = {o.empresa_id for o in objs}
+        transaction.on_commit(lambda: invalidar_resumen(*empresa_ids))
+        return objs
+
+    bulk_create.alters_data = True
+
+
+
 #  CONDUCTORES
 class Conductor(models.Model):
     empresa = models.ForeignKey(
@@ -86,6 +158,21 @@ class Conductor(models.Model):
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
 
+    objects = VencimientosQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'activo'], name='conductor_empresa_activo'),
+            # Columnas ordenables de conductores_lista
+            models.Index(fields=['empresa', 'nombre_completo'], name='conductor_empresa_nombre'),
+            models.Index(fields=['empresa', 'numero_documento'], name='conductor_empresa_documento'),
+            models.Index(
+                fields=['empresa', 'licencia_vencimiento'],
+                name='conductor_licencia_venc',
+                condition=models.Q(licencia_vencimiento__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         return self.nombre_completo
 
@@ -116,11 +203,91 @@ class Vehiculo(models.Model):
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
 
+    objects = VencimientosQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'activo'], name='vehiculo_empresa_activo'),
+            # Columnas ordenables de vehiculos_lista
+            models.Index(fields=['empresa', 'placa'], name='vehiculo_empresa_placa'),
+            models.Index(fields=['empresa', 'marca'], name='vehiculo_empresa_marca'),
+            models.Index(fields=['empresa', 'modelo'], name='vehiculo_empresa_modelo'),
+            models.Index(fields=['empresa', 'capacidad_pasajeros'], name='vehiculo_empresa_capacidad'),
+            models.Index(
+                fields=['empresa', 'soat_vencimiento'],
+                name='vehiculo_soat_venc',
+                condition=models.Q(soat_vencimiento__isnull=False),
+            ),
+            models.Index(
+                fields=['empresa', 'tecnomecanica_vencimiento'],
+                name='vehiculo_tecnomecanica_venc',
+                condition=models.Q(tecnomecanica_vencimiento__isnull=False),
+            ),
+            models.Index(
+                fields=['empresa', 'poliza_contractual_vencimiento'],
+                name='vehiculo_poliza_contr_venc',
+                condition=models.Q(poliza_contractual_vencimiento__isnull=False),
+            ),
+            models.Index(
+                fields=['empresa', 'poliza_extracontractual_vencimiento'],
+                name='vehiculo_poliza_extra_venc',
+                condition=models.Q(poliza_extracontractual_vencimiento__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.placa} - {self.marca} {self.linea}"
 
 
 
+#  VENCIMIENTOS (tabla desnormalizada)
+ORIGENES_VENCIMIENTO = [
+    ('CONDUCTOR', 'Conductor'),
+    ('VEHICULO', 'Vehículo'),
+]
+
+
+class VencimientoDocumento(models.Model):
+    """
+    Una fila por documento con fecha de vencimiento (licencia, SOAT, ...).
+    Se mantiene en sync desde Conductor / Vehiculo (ver inicio/signals.py)
+    para responder "qué vence en los próximos N días" con un solo
+    recorrido del índice (empresa, fecha).
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='vencimientos'
+    )
+
+    origen = models.CharField(max_length=10, choices=ORIGENES_VENCIMIENTO)
+    objeto_id = models.PositiveBigIntegerField()
+    tipo = models.CharField(
+        max_length=40,
+        choices=DOCUMENTOS_CONDUCTOR + DOCUMENTOS_VEHICULO
+    )
+    fecha = models.DateField()
+
+    # Datos para mostrar la alerta sin ir a Conductor / Vehiculo
+    titulo = models.CharField(max_length=150)
+    detalle = models.CharField(max_length=150, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origen', 'objeto_id', 'tipo'],
+                name='vencimiento_documento_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['empresa', 'fecha'], name='vencimiento_empresa_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} de {self.titulo} ({self.fecha})"
+
+
+
 #  SERVICIOS / VIAJES
 ESTADOS_SERVICIO = [
     ('PROGRAMADO', 'Programado'),
@@ -168,18 +335,217 @@ class Servicio(models.Model):
 
     valor = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    pasajeros = models.PositiveIntegerField(
+        default=0,
+        help_text="Capacidad mínima del vehículo (0 = cualquiera)"
+    )
+
     estado = models.CharField(
         max_length=20,
         choices=ESTADOS_SERVICIO,
         default='PROGRAMADO'
     )
 
+    # Consecutivo del FUEC dentro de la empresa. Lo asigna
+    # fuec.asignar_numeros_fuec la primera vez que se genera el FUEC y
+    # ya no cambia (las descargas siguientes reutilizan el mismo número).
+    fuec_numero = models.PositiveIntegerField(blank=True, null=True, editable=False)
+
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'fuec_numero'],
+                condition=models.Q(fuec_numero__isnull=False),
+                name='servicio_fuec_numero_unico',
+            ),
+        ]
+        indexes = [
+            # Orden de servicios_lista: -fecha_servicio, -hora_inicio
+            models.Index(
+                fields=['empresa', '-fecha_servicio', '-hora_inicio'],
+                name='servicio_empresa_fecha_hora',
+            ),
+            models.Index(
+                fields=['empresa', 'estado', 'fecha_servicio'],
+                name='servicio_empresa_estado_fecha',
+            ),
+            models.Index(fields=['conductor', 'fecha_servicio'], name='servicio_conductor_fecha'),
+            models.Index(fields=['vehiculo', 'fecha_servicio'], name='servicio_vehiculo_fecha'),
+        ]
+
     def __str__(self):
         return f"{self.fecha_servicio} - {self.origen} → {self.destino} ({self.estado})"
 
+    def save(self, *args, **kwargs):
+        # fuec_numero solo lo escribe fuec.asignar_numeros_fuec (con
+        # bloqueo): un save() de un objeto cargado antes de la asignación
+        # (ej: el formulario de edición) no debe volver a dejarlo en NULL.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'fuec_numero'
+            ]
+        super().save(*args, **kwargs)
+
+
+#  FUEC: NUMERACIÓN CONSECUTIVA
+class ConsecutivoFuec(models.Model):
+    """
+    Último número de FUEC asignado por empresa. Una fila por empresa:
+    al asignar números se bloquea solo esa fila (SELECT ... FOR UPDATE),
+    nunca la tabla de servicios.
+    """
+    empresa = models.OneToOneField(
+        Empresa,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='consecutivo_fuec'
+    )
+    ultimo = models.PositiveIntegerField(default=0)
 
+    def __str__(self):
+        return f"{self.empresa} - {self.ultimo}"
 
 
+
+#  FUEC: TRABAJOS DE GENERACIÓN EN SEGUNDO PLANO
+ESTADOS_TRABAJO_FUEC = [
+    ('PENDIENTE', 'Pendiente'),
+    ('PROCESANDO', 'Procesando'),
+    ('LISTO', 'Listo'),
+    ('ERROR', 'Error'),
+]
+
+
+class TrabajoFuec(models.Model):
+    """
+    Solicitud de generación de un FUEC. La crea la vista (POST) y la
+    procesa el comando 'procesar_fuec'; el PDF queda guardado aquí.
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='trabajos_fuec'
+    )
+    servicio = models.ForeignKey(
+        Servicio,
+        on_delete=models.CASCADE,
+        related_name='trabajos_fuec'
+    )
+    solicitado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='trabajos_fuec',
+        blank=True,
+        null=True
+    )
+
+    # Llave del contenido (ver inicio.fuec.clave_fuec)
+    clave = models.CharField(max_length=64)
+
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS_TRABAJO_FUEC,
+        default='PENDIENTE'
+    )
+    pdf = models.BinaryField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Cola: los pendientes más viejos primero
+            models.Index(
+                fields=['creado'],
+                name='trabajofuec_pendientes',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+            models.Index(fields=['servicio', 'clave'], name='trabajofuec_servicio_clave'),
+        ]
+
+    def __str__(self):
+        return f"FUEC servicio {self.servicio_id} ({self.estado})"
+
+
+
+#  CORREOS: BANDEJA DE SALIDA
+ESTADOS_CORREO = [
+    ('PENDIENTE', 'Pendiente'),
+    ('ENVIANDO', 'Enviando'),
+    ('ENVIADO', 'Enviado'),
+    ('DESCARTADO', 'Descartado'),
+]
+
+
+class CorreoSaliente(models.Model):
+    """
+    Correo por enviar. Se guarda en la misma transacción que lo origina
+    (ej: el usuario y su código de verificación) y lo envía el comando
+    'despachar_correos' (ver inicio/correos.py).
+    """
+    para = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    texto = models.TextField()
+    html = models.TextField(blank=True)
+
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS_CORREO,
+        default='PENDIENTE'
+    )
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # No se intenta antes de esta fecha (espera entre reintentos)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+    enviado = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Cola: los pendientes que ya toca intentar
+            models.Index(
+                fields=['proximo_intento'],
+                name='correo_pendientes',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {self.para} ({self.estado})"
+
+
+
+#  AVISOS DE VENCIMIENTO (correo diario)
+class AvisoVencimiento(models.Model):
+    """
+    Registro de cada resumen de vencimientos encolado: uno por fecha,
+    empresa y destinatario. Hace que el comando diario no repita correos.
+    """
+    fecha = models.DateField()
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='avisos_vencimiento'
+    )
+    para = models.EmailField()
+    alertas = models.PositiveIntegerField()
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'empresa', 'para'],
+                name='aviso_vencimiento_unico',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Aviso {self.fecha} → {self.para}"
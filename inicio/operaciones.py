@@ -0,0 +1,46 @@
+"""
+Operaciones de migración propias.
+
+Producción corre en Postgres, pero las pruebas pueden correr en SQLite:
+estas operaciones usan la variante de Postgres cuando está disponible
+y la operación estándar en cualquier otro motor.
+"""
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex, RunSQL
+
+
+def es_postgres(schema_editor):
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+class AddIndexConcurrentlySiPostgres(AddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY en Postgres (sin bloquear la tabla en
+    producción). En otros motores se comporta como AddIndex normal.
+    La migración que la use debe declarar atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if es_postgres(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if es_postgres(schema_editor):
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RunSQLSiPostgres(RunSQL):
+    """
+    RunSQL que solo se ejecuta en Postgres (funciones, índices GIN, ...).
+    En otros motores no hace nada.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if es_postgres(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if es_postgres(schema_editor):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
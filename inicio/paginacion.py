@@ -0,0 +1,169 @@
+import json
+from datetime import date, time
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+
+
+#  SERVICIOS: paginación por cursor (keyset)
+# Mismo orden que el índice servicio_empresa_fecha_hora, con el id como
+# desempate estable. Las horas vacías van primero (NULLS FIRST, como en
+# un índice DESC de Postgres) también en SQLite.
+ORDEN_SERVICIOS = (
+    F('fecha_servicio').desc(),
+    F('hora_inicio').desc(nulls_first=True),
+    F('id').desc(),
+)
+
+TAMANO_PAGINA_SERVICIOS = 50
+
+
+def cursor_servicio(servicio):
+    """Cursor opaco (texto para la URL) que apunta a un servicio."""
+    hora = servicio.hora_inicio.isoformat() if servicio.hora_inicio else ''
+    return f'{servicio.fecha_servicio.isoformat()}_{hora}_{servicio.pk}'
+
+
+def leer_cursor(cursor):
+    """Devuelve (fecha, hora, id) o None si el cursor no es válido."""
+    try:
+        fecha, hora, pk = cursor.split('_')
+        return (
+            date.fromisoformat(fecha),
+            time.fromisoformat(hora) if hora else None,
+            int(pk),
+        )
+    except (AttributeError, ValueError):
+        return None
+
+
+def _despues_de(fecha, hora, pk):
+    """Condición "viene después del cursor" en ORDEN_SERVICIOS."""
+    if hora is None:
+        misma_fecha = Q(hora_inicio__isnull=False) | Q(hora_inicio__isnull=True, id__lt=pk)
+    else:
+        misma_fecha = Q(hora_inicio__lt=hora) | Q(hora_inicio=hora, id__lt=pk)
+    return Q(fecha_servicio__lt=fecha) | (Q(fecha_servicio=fecha) & misma_fecha)
+
+
+def pagina_servicios(servicios, cursor=None, tamano=TAMANO_PAGINA_SERVICIOS):
+    """
+    Devuelve (lista de servicios, cursor de la página siguiente o None).
+
+    No usa OFFSET: la página se pide con WHERE (fecha, hora, id) < cursor,
+    así que cuesta lo mismo la primera página que la número mil.
+    """
+    posicion = leer_cursor(cursor) if cursor else None
+    if posicion:
+        servicios = servicios.filter(_despues_de(*posicion))
+
+    filas = list(servicios.order_by(*ORDEN_SERVICIOS)[:tamano + 1])
+    siguiente = cursor_servicio(filas[tamano - 1]) if len(filas) > tamano else None
+    return filas[:tamano], siguiente
+
+
+def conteo_aproximado(queryset):
+    """
+    Total aproximado de filas de un queryset.
+    En Postgres se toma la estimación del planner (EXPLAIN, no recorre
+    la tabla); en otros motores se hace el COUNT normal.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+#  LISTAS (conductores, vehículos, ...): paginación por número de página
+TAMANO_PAGINA_LISTAS = 25
+
+# Por lista: columnas que se cargan (.only) y columnas por las que se
+# puede ordenar (?orden=clave o ?orden=-clave). Todas las columnas de
+# orden tienen un índice (empresa, columna).
+LISTA_CONDUCTORES = {
+    'campos': (
+        'nombre_completo', 'tipo_documento', 'numero_documento',
+        'telefono', 'correo', 'licencia_categoria', 'licencia_numero',
+        'licencia_vencimiento', 'activo',
+    ),
+    'orden': {
+        'nombre': 'nombre_completo',
+        'documento': 'numero_documento',
+    },
+    'orden_defecto': 'nombre',
+}
+
+LISTA_VEHICULOS = {
+    'campos': (
+        'placa', 'marca', 'linea', 'modelo', 'capacidad_pasajeros', 'activo',
+    ),
+    'orden': {
+        'placa': 'placa',
+        'marca': 'marca',
+        'modelo': 'modelo',
+        'capacidad': 'capacidad_pasajeros',
+    },
+    'orden_defecto': 'placa',
+}
+
+
+def paginar_lista(request, queryset, config, tamano=TAMANO_PAGINA_LISTAS, por_relevancia=False):
+    """
+    Ordena, proyecta y pagina el queryset de una lista según su config
+    (LISTA_CONDUCTORES, LISTA_VEHICULOS, ...).
+
+    Con por_relevancia=True (hay búsqueda ?q=) y sin ?orden explícito,
+    se ordena por la 'relevancia' que anota inicio.busqueda.buscar.
+
+    Devuelve un dict para el contexto de la plantilla con:
+    - page_obj: la página actual
+    - orden: el orden aplicado (ej: 'nombre' o '-nombre')
+    - urls_orden: querystring para cada columna ordenable
+      (si ya es la columna activa, invierte la dirección)
+    - params_pagina: querystring de los filtros para armar ?page=N
+    """
+    orden = request.GET.get('orden', '').strip()
+    queryset = queryset.only(*config['campos'])
+
+    if por_relevancia and not orden:
+        queryset = queryset.order_by('-relevancia', 'pk')
+    else:
+        orden = orden or config['orden_defecto']
+        clave = orden.lstrip('-')
+        if clave not in config['orden']:
+            orden = clave = config['orden_defecto']
+        direccion = '-' if orden.startswith('-') else ''
+
+        queryset = queryset.order_by(
+            direccion + config['orden'][clave],
+            direccion + 'pk',
+        )
+
+    page_obj = Paginator(queryset, tamano).get_page(request.GET.get('page'))
+
+    params = request.GET.copy()
+    params.pop('page', None)
+
+    urls_orden = {}
+    for columna in config['orden']:
+        params['orden'] = f'-{columna}' if orden == columna else columna
+        urls_orden[columna] = f'?{params.urlencode()}'
+
+    if orden:
+        params['orden'] = orden
+    else:
+        params.pop('orden', None)
+    return {
+        'page_obj': page_obj,
+        'orden': orden,
+        'urls_orden': urls_orden,
+        'params_pagina': params.urlencode(),
+    }
@@ -0,0 +1,95 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import get_template
+
+
+# True dentro de los procesos que renderizan PDF (renderizadores y pool
+# del ZIP): allí se renderiza directamente, sin pasar por el pool.
+EN_PROCESO_PDF = False
+
+
+def _renderizar(template_src, context_dict):
+    # Import local: solo los procesos renderizadores cargan xhtml2pdf
+    from xhtml2pdf import pisa
+
+    template = get_template(template_src)
+    html = template.render(context_dict)
+    result = BytesIO()
+    pdf = pisa.CreatePDF(html, dest=result, encoding='UTF-8')
+    if pdf.err:
+        return None
+    return result.getvalue()
+
+
+def render_to_pdf(template_src, context_dict=None):
+    """
+    Renderiza una plantilla HTML a PDF usando xhtml2pdf.
+    Devuelve los bytes del PDF o None si hubo error.
+
+    Con PDF_PROCESOS > 0 el PDF lo genera el pool de renderizadores
+    (inicio/renderizador.py) y este proceso no carga xhtml2pdf. Si el
+    pool está lleno se lanza RenderizadorOcupado.
+    """
+    if context_dict is None:
+        context_dict = {}
+
+    if settings.PDF_PROCESOS and not EN_PROCESO_PDF:
+        from .renderizador import obtener_pool
+        return obtener_pool().renderizar(template_src, context_dict)
+
+    return _renderizar(template_src, context_dict)
+
+
+def rss_mb():
+    """Memoria residente (RSS) actual de este proceso, en MB."""
+    try:
+        with open('/proc/self/statm') as archivo:
+            paginas = int(archivo.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Sin /proc (macOS, ...): el máximo histórico
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def iniciar_proceso_pdf(plantillas=()):
+    """
+    Initializer de los procesos que renderizan PDF (creados con 'spawn'):
+    carga Django y xhtml2pdf y renderiza una vez cada plantilla (vacía)
+    para dejar parseadas las fuentes y la plantilla antes del primer
+    trabajo. Vive aquí y no en fuec.py porque este módulo no importa
+    modelos.
+    """
+    global EN_PROCESO_PDF
+    import django
+    django.setup()
+    EN_PROCESO_PDF = True
+
+    from xhtml2pdf import pisa  # noqa: F401
+    for plantilla in plantillas:
+        _renderizar(plantilla, {})
+
+
+def bucle_renderizador(conexion, plantillas=()):
+    """
+    Cuerpo de un proceso renderizador: recibe (plantilla, contexto) por
+    la tubería y responde (bytes del PDF o None, RSS en MB). Termina al
+    recibir None o si el proceso web se cierra.
+    """
+    iniciar_proceso_pdf(plantillas)
+
+    while True:
+        try:
+            trabajo = conexion.recv()
+        except EOFError:
+            break
+        if trabajo is None:
+            break
+
+        try:
+            pdf = _renderizar(*trabajo)
+        except Exception:
+            pdf = None
+        conexion.send((pdf, rss_mb()))
@@ -0,0 +1,465 @@
+"""
+Planificación automática del día: propone conductor y vehículo para los
+servicios programados de una fecha, sin cruces de horario.
+
+Se replanifican los servicios PROGRAMADOS del día que aún no tienen FUEC
+(el FUEC ya generado lleva conductor y placa). Los demás servicios, y los
+que el usuario deja fijos, conservan su asignación y ocupan a su
+conductor y vehículo como cualquier reserva (periodos de
+inicio/conflictos.py). Solo se usan conductores y vehículos activos con
+los documentos vigentes en la fecha.
+
+- Vehículos: partición de intervalos. Los servicios se recorren por hora
+  de inicio con un heap de los vehículos en ruta (por la hora en que
+  quedan libres) y otro de los ya libres (el que se liberó más tarde,
+  primero). Cada servicio toma el vehículo libre con capacidad que menos
+  tiempo muerto deja; solo si no hay ninguno entra otro vehículo al día,
+  el de menor capacidad suficiente. Así se usan pocos vehículos y con
+  pocas esperas.
+- Conductores: cada vehículo con sus servicios del día es un turno, y los
+  turnos se emparejan con conductores (emparejamiento bipartito máximo,
+  Hopcroft-Karp) que tengan la categoría de licencia que pide el vehículo
+  y estén libres en todo el turno. Los servicios de turnos sin conductor
+  se reparten uno por uno entre los que estén libres.
+- Los servicios que no se pueden asignar conservan su conductor y
+  vehículo: se vuelve a planificar con ellos como reservas fijas, para
+  que el plan no se cruce con ellos.
+
+El plan no guarda nada: aplicar_plan lo recalcula con los conductores y
+vehículos de la empresa bloqueados y lo guarda solo si es el mismo que
+se mostró (misma firma). Para medirlo con un día grande:
+python manage.py benchmark_planificacion
+"""
+import hashlib
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .conflictos import ESTADOS_SIN_OCUPAR, documentos_vigentes, periodo
+from .dashboard import invalidar_resumen
+from .models import DOCUMENTOS_CONDUCTOR, DOCUMENTOS_VEHICULO, Conductor, Servicio, Vehiculo
+from .verificacion import invalidar_verificacion
+
+
+# Categorías de licencia para servicio público: C1 hasta microbús, C2
+# busetas y buses, C3 articulados. Otras categorías no sirven.
+NIVEL_CATEGORIA = {'C1': 1, 'C2': 2, 'C3': 3}
+
+# Un microbús lleva hasta 19 pasajeros; con más se necesita C2
+CAPACIDAD_MAXIMA_C1 = 19
+
+_UN_DIA = timedelta(days=1)
+
+_CAMPOS = (
+    'id', 'fecha_servicio', 'hora_inicio', 'hora_fin', 'origen', 'destino',
+    'cliente_nombre', 'pasajeros',
+    'conductor_id', 'conductor__nombre_completo', 'vehiculo_id', 'vehiculo__placa',
+)
+
+
+def nivel_categoria(categoria):
+    """1 (C1), 2 (C2), 3 (C3) o 0 si la licencia no es de servicio público."""
+    return NIVEL_CATEGORIA.get((categoria or '').strip().upper(), 0)
+
+
+def nivel_requerido(capacidad):
+    """Nivel de licencia que pide un vehículo según su capacidad."""
+    return 1 if capacidad <= CAPACIDAD_MAXIMA_C1 else 2
+
+
+class _Agenda:
+    """Periodos ocupados de un conductor o vehículo (pueden cruzarse entre sí)."""
+
+    __slots__ = ('inicios', 'fines', 'fin_max')
+
+    def __init__(self):
+        self.inicios = []
+        self.fines = []
+        # fin_max[i]: el mayor fin entre los i + 1 primeros periodos
+        self.fin_max = []
+
+    def copia(self):
+        otra = _Agenda()
+        otra.inicios = self.inicios[:]
+        otra.fines = self.fines[:]
+        otra.fin_max = self.fin_max[:]
+        return otra
+
+    def libre(self, inicio, fin):
+        i = bisect_left(self.inicios, fin)
+        return i == 0 or self.fin_max[i - 1] <= inicio
+
+    def agregar(self, inicio, fin):
+        i = bisect_right(self.inicios, inicio)
+        self.inicios.insert(i, inicio)
+        self.fines.insert(i, fin)
+        maximo = self.fin_max[i - 1] if i else fin
+        maximos = []
+        for f in self.fines[i:]:
+            maximo = max(maximo, f)
+            maximos.append(maximo)
+        self.fin_max[i:] = maximos
+
+
+def _libre(agendas, recurso_id, inicio, fin):
+    agenda = agendas.get(recurso_id)
+    return agenda is None or agenda.libre(inicio, fin)
+
+
+def _ocupar(agendas, recurso_id, inicio, fin):
+    agenda = agendas.get(recurso_id)
+    if agenda is None:
+        agenda = agendas[recurso_id] = _Agenda()
+    agenda.agregar(inicio, fin)
+
+
+def _espera(turnos):
+    """Minutos muertos en total entre servicios seguidos de un mismo vehículo."""
+    total = timedelta()
+    for tareas in turnos.values():
+        ultimo = None
+        for tarea in sorted(tareas, key=lambda t: t['inicio']):
+            if ultimo is not None and tarea['inicio'] > ultimo:
+                total += tarea['inicio'] - ultimo
+            ultimo = tarea['fin'] if ultimo is None else max(ultimo, tarea['fin'])
+    return int(total.total_seconds() // 60)
+
+
+def _asignar_vehiculos(tareas, vehiculos, agendas):
+    """
+    tareas: ordenadas por inicio; vehiculos: [(capacidad, id)] ordenados.
+    Devuelve ({vehiculo_id: [tareas]}, tareas sin vehículo).
+    """
+    capacidad = {vehiculo_id: c for c, vehiculo_id in vehiculos}
+    sin_usar = list(vehiculos)
+    en_ruta = []    # (libre desde, id)
+    libres = []     # (-libre desde, id): el que se liberó más tarde arriba
+    turnos = {}
+    sin_vehiculo = []
+
+    for tarea in tareas:
+        inicio, fin, pasajeros = tarea['inicio'], tarea['fin'], tarea['pasajeros']
+        while en_ruta and en_ruta[0][0] <= inicio:
+            libre_desde, vehiculo_id = heapq.heappop(en_ruta)
+            heapq.heappush(libres, (-libre_desde.timestamp(), vehiculo_id))
+
+        elegido = None
+        descartados = []
+        while libres:
+            item = heapq.heappop(libres)
+            if capacidad[item[1]] >= pasajeros and _libre(agendas, item[1], inicio, fin):
+                elegido = item[1]
+                break
+            descartados.append(item)
+        for item in descartados:
+            heapq.heappush(libres, item)
+
+        if elegido is None:
+            # Otro vehículo para el día: el más pequeño que sirva
+            for i in range(bisect_left(sin_usar, (pasajeros,)), len(sin_usar)):
+                if _libre(agendas, sin_usar[i][1], inicio, fin):
+                    elegido = sin_usar.pop(i)[1]
+                    break
+
+        if elegido is None:
+            sin_vehiculo.append(tarea)
+            continue
+        turnos.setdefault(elegido, []).append(tarea)
+        heapq.heappush(en_ruta, (fin, elegido))
+    return turnos, sin_vehiculo
+
+
+def _emparejar(adyacentes, total_derecha):
+    """
+    Emparejamiento bipartito máximo (Hopcroft-Karp). adyacentes[u]: los
+    v (0..total_derecha-1) posibles para u, preferidos primero. Devuelve
+    la pareja de cada u (o None).
+    """
+    pareja_u = [None] * len(adyacentes)
+    pareja_v = [None] * total_derecha
+    while True:
+        # Capas desde los u libres por caminos alternantes
+        capa = [-1] * len(adyacentes)
+        cola = deque()
+        for u, v in enumerate(pareja_u):
+            if v is None:
+                capa[u] = 0
+                cola.append(u)
+        hay_camino = False
+        while cola:
+            u = cola.popleft()
+            for v in adyacentes[u]:
+                w = pareja_v[v]
+                if w is None:
+                    hay_camino = True
+                elif capa[w] < 0:
+                    capa[w] = capa[u] + 1
+                    cola.append(w)
+        if not hay_camino:
+            return pareja_u
+
+        # Caminos de aumento disjuntos por las capas (DFS iterativo)
+        siguiente = [0] * len(adyacentes)
+        for raiz, v in enumerate(pareja_u):
+            if v is not None:
+                continue
+            camino = [raiz]
+            aristas = []
+            while camino:
+                u = camino[-1]
+                lista = adyacentes[u]
+                avanzo = False
+                while siguiente[u] < len(lista):
+                    v = lista[siguiente[u]]
+                    siguiente[u] += 1
+                    w = pareja_v[v]
+                    if w is None:
+                        aristas.append(v)
+                        for uu, vv in zip(camino, aristas):
+                            pareja_u[uu] = vv
+                            pareja_v[vv] = uu
+                        camino = []
+                        avanzo = True
+                        break
+                    if capa[w] == capa[u] + 1:
+                        camino.append(w)
+                        aristas.append(v)
+                        avanzo = True
+                        break
+                if not avanzo:
+                    capa[u] = -1
+                    camino.pop()
+                    if aristas:
+                        aristas.pop()
+
+
+def _asignar_conductores(turnos, capacidad, conductores, agendas):
+    """
+    turnos: {vehiculo_id: [tareas]}; conductores: [(nivel, id)] ordenados.
+    Devuelve ({id de servicio: conductor_id}, tareas sin conductor).
+    """
+    niveles = [nivel for nivel, _ in conductores]
+    vehiculos = sorted(turnos)
+    adyacentes = []
+    for vehiculo_id in vehiculos:
+        tareas = turnos[vehiculo_id]
+        actuales = {t['conductor_id'] for t in tareas}
+        posibles = [
+            i
+            for i in range(bisect_left(niveles, nivel_requerido(capacidad[vehiculo_id])), len(conductores))
+            if conductores[i][1] not in agendas
+            or all(_libre(agendas, conductores[i][1], t['inicio'], t['fin']) for t in tareas)
+        ]
+        # Primero quien ya maneja ese recorrido (menos cambios), luego la
+        # categoría más baja que sirva
+        posibles.sort(key=lambda i: conductores[i][1] not in actuales)
+        adyacentes.append(posibles)
+
+    parejas = _emparejar(adyacentes, len(conductores))
+
+    asignados = {}
+    pendientes = []
+    for vehiculo_id, i in zip(vehiculos, parejas):
+        if i is None:
+            pendientes.extend(turnos[vehiculo_id])
+            continue
+        conductor_id = conductores[i][1]
+        for tarea in turnos[vehiculo_id]:
+            asignados[tarea['id']] = conductor_id
+            _ocupar(agendas, conductor_id, tarea['inicio'], tarea['fin'])
+
+    # Turnos sin conductor: servicio por servicio, con quien esté libre
+    sin_conductor = []
+    for tarea in sorted(pendientes, key=lambda t: (t['inicio'], t['id'])):
+        requerido = nivel_requerido(capacidad[tarea['vehiculo']])
+        libres = [
+            c for _, c in conductores[bisect_left(niveles, requerido):]
+            if _libre(agendas, c, tarea['inicio'], tarea['fin'])
+        ]
+        if not libres:
+            sin_conductor.append(tarea)
+            continue
+        conductor_id = tarea['conductor_id'] if tarea['conductor_id'] in libres else libres[0]
+        asignados[tarea['id']] = conductor_id
+        _ocupar(agendas, conductor_id, tarea['inicio'], tarea['fin'])
+    return asignados, sin_conductor
+
+
+class Plan:
+    """Propuesta para un día; no guarda nada (ver aplicar_plan)."""
+
+    def __init__(self, fecha):
+        self.fecha = fecha
+        # Un dict por servicio replanificado (filas de _CAMPOS) con
+        # nuevo_conductor_id / nuevo_vehiculo_id y sus nombres
+        self.asignaciones = []
+        # (fila, motivo): conservan su conductor y vehículo
+        self.sin_asignar = []
+        self.vehiculos_antes = 0
+        self.vehiculos_despues = 0
+        self.espera_antes = 0
+        self.espera_despues = 0
+
+    @property
+    def cambios(self):
+        return [a for a in self.asignaciones if a['cambia']]
+
+    @property
+    def firma(self):
+        """Identifica la propuesta: si algo cambia en el día, cambia la firma."""
+        partes = sorted(
+            (a['id'], a['nuevo_conductor_id'], a['nuevo_vehiculo_id'])
+            for a in self.asignaciones
+        )
+        partes += sorted(f['id'] for f, _ in self.sin_asignar)
+        return hashlib.sha256(repr((self.fecha, partes)).encode()).hexdigest()[:20]
+
+
+def planificar(empresa, fecha, fijos=()):
+    """
+    Propone conductor y vehículo para los servicios PROGRAMADOS sin FUEC
+    de 'fecha' (menos los pks de 'fijos'). Devuelve un Plan.
+    """
+    tareas = list(
+        Servicio.objects.filter(
+            empresa=empresa,
+            fecha_servicio=fecha,
+            estado='PROGRAMADO',
+            fuec_numero__isnull=True,
+        ).exclude(pk__in=fijos).values(*_CAMPOS)
+    )
+    ids = {t['id'] for t in tareas}
+    for tarea in tareas:
+        tarea['inicio'], tarea['fin'] = periodo(fecha, tarea['hora_inicio'], tarea['hora_fin'])
+    tareas.sort(key=lambda t: (t['inicio'], t['fin'], t['id']))
+
+    # Lo que queda fijo: los servicios del día anterior al siguiente son
+    # los únicos que pueden cruzarse con los de la fecha
+    conductores_ocupados = {}
+    vehiculos_ocupados = {}
+    reservas = Servicio.objects.filter(
+        empresa=empresa,
+        fecha_servicio__range=(fecha - _UN_DIA, fecha + _UN_DIA),
+    ).exclude(estado__in=ESTADOS_SIN_OCUPAR).exclude(pk__in=ids).values_list(
+        'conductor_id', 'vehiculo_id', 'fecha_servicio', 'hora_inicio', 'hora_fin',
+    )
+    for conductor_id, vehiculo_id, dia, hora_inicio, hora_fin in reservas:
+        inicio, fin = periodo(dia, hora_inicio, hora_fin)
+        _ocupar(conductores_ocupados, conductor_id, inicio, fin)
+        _ocupar(vehiculos_ocupados, vehiculo_id, inicio, fin)
+
+    conductores = Conductor.objects.filter(
+        documentos_vigentes(DOCUMENTOS_CONDUCTOR, fecha),
+        empresa=empresa,
+        activo=True,
+    ).values_list('id', 'nombre_completo', 'licencia_categoria')
+    nombres = {}
+    niveles = []
+    for conductor_id, nombre, categoria in conductores:
+        nombres[conductor_id] = nombre
+        if nivel_categoria(categoria):
+            niveles.append((nivel_categoria(categoria), conductor_id))
+    niveles.sort()
+
+    vehiculos = Vehiculo.objects.filter(
+        documentos_vigentes(DOCUMENTOS_VEHICULO, fecha),
+        empresa=empresa,
+        activo=True,
+    ).values_list('id', 'placa', 'capacidad_pasajeros')
+    placas = {}
+    capacidades = []
+    for vehiculo_id, placa, capacidad in vehiculos:
+        placas[vehiculo_id] = placa
+        capacidades.append((capacidad, vehiculo_id))
+    capacidades.sort()
+    capacidad = {vehiculo_id: c for c, vehiculo_id in capacidades}
+
+    # Los que no se pueden asignar pasan a ser reservas fijas y se
+    # vuelve a planificar el resto (cada vuelta quedan menos servicios)
+    sin_asignar = []
+    while True:
+        agendas_conductores = {k: a.copia() for k, a in conductores_ocupados.items()}
+        agendas_vehiculos = {k: a.copia() for k, a in vehiculos_ocupados.items()}
+        turnos, sin_vehiculo = _asignar_vehiculos(tareas, capacidades, agendas_vehiculos)
+        for vehiculo_id, lista in turnos.items():
+            for tarea in lista:
+                tarea['vehiculo'] = vehiculo_id
+        asignados, sin_conductor = _asignar_conductores(
+            turnos, capacidad, niveles, agendas_conductores,
+        )
+        fallidos = (
+            [(t, 'No hay un vehículo libre, con capacidad y documentos vigentes.') for t in sin_vehiculo]
+            + [(t, 'No hay un conductor libre con licencia vigente de la categoría necesaria.') for t in sin_conductor]
+        )
+        if not fallidos:
+            break
+        sin_asignar += fallidos
+        for tarea, _ in fallidos:
+            _ocupar(conductores_ocupados, tarea['conductor_id'], tarea['inicio'], tarea['fin'])
+            _ocupar(vehiculos_ocupados, tarea['vehiculo_id'], tarea['inicio'], tarea['fin'])
+        quitar = {t['id'] for t, _ in fallidos}
+        tareas = [t for t in tareas if t['id'] not in quitar]
+
+    plan = Plan(fecha)
+    plan.sin_asignar = sorted(sin_asignar, key=lambda x: (x[0]['inicio'], x[0]['id']))
+    for tarea in tareas:
+        conductor_id = asignados[tarea['id']]
+        vehiculo_id = tarea['vehiculo']
+        tarea.update({
+            'nuevo_conductor_id': conductor_id,
+            'nuevo_conductor': nombres[conductor_id],
+            'nuevo_vehiculo_id': vehiculo_id,
+            'nueva_placa': placas[vehiculo_id],
+            'cambia': (conductor_id, vehiculo_id) != (tarea['conductor_id'], tarea['vehiculo_id']),
+        })
+        plan.asignaciones.append(tarea)
+
+    antes = {}
+    for tarea in tareas:
+        antes.setdefault(tarea['vehiculo_id'], []).append(tarea)
+    plan.vehiculos_antes = len(antes)
+    plan.espera_antes = _espera(antes)
+    plan.vehiculos_despues = len(turnos)
+    plan.espera_despues = _espera(turnos)
+    return plan
+
+
+def aplicar_plan(empresa, fecha, firma, fijos=()):
+    """
+    Recalcula el plan con los conductores y vehículos de la empresa
+    bloqueados y, si su firma es 'firma' (lo que vio el usuario), guarda
+    los cambios. Devuelve (servicios cambiados o None si el plan ya no es
+    el mismo, plan).
+    """
+    with transaction.atomic():
+        # En el mismo orden que ServicioForm.clean (conductor, luego
+        # vehículo): una reserva simultánea espera a que termine esta
+        list(Conductor.objects.select_for_update().filter(empresa=empresa).order_by('pk').values_list('pk'))
+        list(Vehiculo.objects.select_for_update().filter(empresa=empresa).order_by('pk').values_list('pk'))
+
+        plan = planificar(empresa, fecha, fijos)
+        if plan.firma != firma:
+            return None, plan
+
+        # bulk_update no pasa por auto_now ni por las señales: el FUEC
+        # cacheado depende de 'actualizado'
+        ahora = timezone.now()
+        cambios = [
+            Servicio(
+                pk=a['id'],
+                conductor_id=a['nuevo_conductor_id'],
+                vehiculo_id=a['nuevo_vehiculo_id'],
+                actualizado=ahora,
+            )
+            for a in plan.cambios
+        ]
+        Servicio.objects.bulk_update(cambios, ['conductor', 'vehiculo', 'actualizado'], batch_size=500)
+
+        ids = [s.pk for s in cambios]
+        transaction.on_commit(lambda: invalidar_resumen(empresa.pk))
+        transaction.on_commit(lambda: invalidar_verificacion(*ids))
+    return len(cambios), plan
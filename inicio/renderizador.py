@@ -0,0 +1,160 @@
+"""
+Pool de procesos renderizadores de PDF.
+
+Los procesos web no cargan xhtml2pdf (reportlab, html5lib, fuentes): le
+pasan la plantilla y el contexto a un renderizador que ya lo tiene
+cargado y precalentado (ver pdf.iniciar_proceso_pdf).
+
+- Cada renderizador se recicla después de PDF_RENDERS_POR_PROCESO PDF o
+  si su memoria (RSS) pasa de PDF_RSS_MAXIMO_MB.
+- Si no hay un renderizador libre en PDF_ESPERA_MAXIMA segundos se lanza
+  RenderizadorOcupado (la vista responde 503 + Retry-After) en vez de
+  acumular peticiones esperando.
+- Un renderizador que no responde en PDF_TIMEOUT segundos se mata y se
+  reemplaza; ese PDF falla (None).
+
+Es opcional (PDF_PROCESOS > 0): cada worker web carga además
+PDF_PROCESOS procesos con xhtml2pdf.
+
+Hay un pool por proceso web. Arranca al iniciar el worker de gunicorn
+(ver gunicorn.conf.py) o, si no, con el primer PDF.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+
+from django.conf import settings
+
+from .pdf import bucle_renderizador
+
+
+# Plantillas que cada renderizador deja parseadas al arrancar
+# (fuec.PLANTILLA_FUEC)
+PLANTILLAS_PRECALENTAR = ('servicios/fuec_pdf.html',)
+
+# Segundos que se le sugieren al cliente (Retry-After) si el pool está lleno
+REINTENTAR_EN = 5
+
+
+class RenderizadorOcupado(Exception):
+    """Todos los renderizadores están ocupados: reintentar más tarde."""
+
+
+class _Renderizador:
+    """Un proceso renderizador y el extremo de su tubería."""
+
+    def __init__(self, contexto):
+        self.conexion, extremo = contexto.Pipe()
+        self.proceso = contexto.Process(
+            target=bucle_renderizador,
+            args=(extremo, PLANTILLAS_PRECALENTAR),
+            daemon=True,
+        )
+        self.proceso.start()
+        extremo.close()
+        self.renders = 0
+        self.rss_mb = 0
+        self.roto = False
+
+    def renderizar(self, plantilla, contexto, timeout):
+        self.conexion.send((plantilla, contexto))
+        if not self.conexion.poll(timeout):
+            # Colgado (plantilla o datos patológicos): se mata aquí, sin
+            # esperar a que gunicorn mate al worker y deje huérfano al
+            # renderizador, y el pool lo reemplaza
+            self.roto = True
+            self.proceso.terminate()
+            return None
+        pdf, self.rss_mb = self.conexion.recv()
+        self.renders += 1
+        return pdf
+
+    def cerrar(self):
+        try:
+            self.conexion.send(None)
+        except OSError:
+            pass
+        self.conexion.close()
+        self.proceso.join(timeout=5)
+        if self.proceso.is_alive():
+            self.proceso.terminate()
+
+
+class PoolRenderizador:
+
+    def __init__(self, procesos, renders_maximos, rss_maximo_mb, espera, timeout):
+        self.procesos = procesos
+        self.renders_maximos = renders_maximos
+        self.rss_maximo_mb = rss_maximo_mb
+        self.espera = espera
+        self.timeout = timeout
+
+        self._contexto = multiprocessing.get_context('spawn')
+        self._libres = queue.Queue()
+        self._lock = threading.Lock()
+        self._arrancado = False
+
+    def arrancar(self):
+        """Lanza los renderizadores (se precalientan en paralelo)."""
+        with self._lock:
+            if self._arrancado:
+                return
+            for _ in range(self.procesos):
+                self._libres.put(_Renderizador(self._contexto))
+            self._arrancado = True
+
+    def _vencido(self, renderizador):
+        return (
+            renderizador.roto
+            or renderizador.renders >= self.renders_maximos
+            or renderizador.rss_mb > self.rss_maximo_mb
+        )
+
+    def _devolver(self, renderizador):
+        if self._vencido(renderizador):
+            # El cierre (join) va en otro hilo para no demorar la respuesta
+            threading.Thread(target=renderizador.cerrar, daemon=True).start()
+            renderizador = _Renderizador(self._contexto)
+        self._libres.put(renderizador)
+
+    def renderizar(self, plantilla, contexto):
+        """
+        Devuelve los bytes del PDF (o None si falló). Lanza
+        RenderizadorOcupado si no hay un renderizador libre a tiempo.
+        """
+        self.arrancar()
+        try:
+            renderizador = self._libres.get(timeout=self.espera)
+        except queue.Empty:
+            raise RenderizadorOcupado()
+
+        try:
+            return renderizador.renderizar(plantilla, contexto, self.timeout)
+        except (EOFError, OSError):
+            # El proceso murió (ej: lo mató el OOM killer): se reemplaza
+            renderizador.roto = True
+            return None
+        finally:
+            self._devolver(renderizador)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Pool de este proceso (se crea de nuevo si el proceso se bifurcó)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = PoolRenderizador(
+                procesos=settings.PDF_PROCESOS,
+                renders_maximos=settings.PDF_RENDERS_POR_PROCESO,
+                rss_maximo_mb=settings.PDF_RSS_MAXIMO_MB,
+                espera=settings.PDF_ESPERA_MAXIMA,
+                timeout=settings.PDF_TIMEOUT,
+            )
+            _pool_pid = os.getpid()
+        return _pool
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dashboard import invalidar_resumen
+from .empresas import invalidar_empresa, invalidar_empresa_usuario
+from .models import Empresa, EmpresaUsuario, Conductor, Vehiculo, Servicio
+from .verificacion import invalidar_verificacion
+from .vencimientos import (
+    CAMPOS_SINCRONIZADOS,
+    eliminar_vencimientos,
+    sincronizar_vencimientos,
+)
+
+
+#  VENCIMIENTOS: mantener VencimientoDocumento al día
+@receiver(post_save, sender=Conductor)
+@receiver(post_save, sender=Vehiculo)
+def actualizar_vencimientos(sender, instance, update_fields=None, **kwargs):
+    """Cada save (vistas, admin, shell) recalcula los documentos del objeto."""
+    if update_fields and not CAMPOS_SINCRONIZADOS.intersection(update_fields):
+        return
+    sincronizar_vencimientos(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Conductor)
+@receiver(post_delete, sender=Vehiculo)
+def borrar_vencimientos(sender, instance, **kwargs):
+    eliminar_vencimientos(sender, [instance.pk])
+
+
+#  DASHBOARD: invalidar el resumen cacheado de la empresa
+@receiver(post_save, sender=Conductor)
+@receiver(post_save, sender=Vehiculo)
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Conductor)
+@receiver(post_delete, sender=Vehiculo)
+@receiver(post_delete, sender=Servicio)
+def invalidar_dashboard(sender, instance, **kwargs):
+    """Se invalida al confirmar la transacción para no cachear datos viejos."""
+    empresa_id = instance.empresa_id
+    transaction.on_commit(lambda: invalidar_resumen(empresa_id))
+
+
+#  VERIFICACIÓN DEL FUEC: el QR no debe mostrar un estado viejo
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+def invalidar_verificacion_servicio(sender, instance, **kwargs):
+    servicio_id = instance.pk
+    transaction.on_commit(lambda: invalidar_verificacion(servicio_id))
+
+
+#  EMPRESA ACTUAL: invalidar la empresa cacheada por usuario
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_empresa_cacheada(sender, instance, **kwargs):
+    empresa_id = instance.pk
+    transaction.on_commit(lambda: invalidar_empresa(empresa_id))
+
+
+@receiver(post_save, sender=EmpresaUsuario)
+@receiver(post_delete, sender=EmpresaUsuario)
+def invalidar_empresa_del_usuario(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidar_empresa_usuario(user_id))
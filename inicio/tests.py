@@ -1,3 +1,842 @@
-from django.test import TestCase
+import io
+import multiprocessing
+import random
+import tempfile
+import threading
+import zipfile
+from datetime import date, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+
+from .avisos import _guardar_avisos
+from .busqueda import buscar
+from .conflictos import (
+    conductores_disponibles,
+    conflictos_empresa,
+    conflictos_servicio,
+    vehiculos_disponibles,
+)
+from .forms import ServicioForm
+from .importar import importar
+from .fuec import (
+    MAX_INTENTOS,
+    asignar_numeros_fuec,
+    clave_fuec,
+    contexto_fuec,
+    liberar_trabajos_abandonados,
+    procesar_trabajo,
+    solicitar_fuec,
+    tomar_trabajo,
+    zip_fuec,
+)
+from .models import (
+    AvisoVencimiento,
+    ConsecutivoFuec,
+    Conductor,
+    CorreoSaliente,
+    Empresa,
+    EmpresaUsuario,
+    Servicio,
+    TrabajoFuec,
+    Vehiculo,
+)
+from .renderizador import RenderizadorOcupado
+from .planificacion import aplicar_plan, planificar
+from .verificacion import estado_fuec, leer_token, token_verificacion
+
+
+class BusquedaTests(TestCase):
+    """?q= en cualquier columna de texto, en Postgres y con el OR de SQLite."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        cls.ana, cls.luis = [
+            Conductor.objects.create(
+                empresa=cls.empresa,
+                nombre_completo=nombre,
+                numero_documento=documento,
+                licencia_numero=documento,
+                licencia_categoria='C2',
+            )
+            for nombre, documento in [('Ana María Pérez', '1010'), ('Luis Gómez', '2020')]
+        ]
+        cls.bus = Vehiculo.objects.create(
+            empresa=cls.empresa, placa='BUS123', marca='Chevrolet', linea='NPR', modelo=2020,
+        )
+
+    def encontrados(self, queryset, q):
+        return set(buscar(queryset, q))
+
+    def test_cualquier_columna_y_mayusculas(self):
+        conductores = Conductor.objects.filter(empresa=self.empresa)
+        self.assertEqual(self.encontrados(conductores, 'maría'), {self.ana})
+        self.assertEqual(self.encontrados(conductores, 'LUIS'), {self.luis})
+        self.assertEqual(self.encontrados(conductores, '2020'), {self.luis})
+        self.assertEqual(self.encontrados(conductores, 'zzzz'), set())
+
+        vehiculos = Vehiculo.objects.filter(empresa=self.empresa)
+        self.assertEqual(self.encontrados(vehiculos, 'chevro'), {self.bus})
+        self.assertEqual(self.encontrados(vehiculos, 'bus123'), {self.bus})
+        self.assertTrue(all(v.relevancia > 0 for v in buscar(vehiculos, 'npr')))
+
+    def test_sin_tildes_en_postgres(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('SQLite usa icontains, que distingue tildes')
+        conductores = Conductor.objects.filter(empresa=self.empresa)
+        self.assertEqual(self.encontrados(conductores, 'perez'), {self.ana})
+        self.assertEqual(self.encontrados(conductores, 'GOMEZ'), {self.luis})
+
+
+@override_settings(FUEC_BACKEND='reportlab', FUEC_CACHE_DIR=tempfile.mkdtemp())
+class TrabajosFuecTests(TestCase):
+    """Cola de FUEC: PENDIENTE -> PROCESANDO -> LISTO / ERROR."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        conductor = Conductor.objects.create(
+            empresa=cls.empresa,
+            nombre_completo='Conductor',
+            numero_documento='1',
+            licencia_numero='1',
+            licencia_categoria='C2',
+        )
+        vehiculo = Vehiculo.objects.create(empresa=cls.empresa, placa='TRB123', marca='Marca', modelo=2020)
+        cls.servicio = Servicio.objects.create(
+            empresa=cls.empresa,
+            conductor=conductor,
+            vehiculo=vehiculo,
+            fecha_servicio=date(2030, 1, 10),
+            origen='A',
+            destino='B',
+            cliente_nombre='Cliente',
+        )
+
+    def test_listo(self):
+        trabajo = solicitar_fuec(self.servicio, self.empresa)
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        # Misma llave: se reutiliza el trabajo
+        self.assertEqual(solicitar_fuec(self.servicio, self.empresa).pk, trabajo.pk)
+
+        tomado = tomar_trabajo()
+        self.assertEqual((tomado.pk, tomado.estado, tomado.intentos), (trabajo.pk, 'PROCESANDO', 1))
+        self.assertIsNone(tomar_trabajo())
+
+        procesar_trabajo(tomado)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'LISTO')
+        self.assertTrue(bytes(trabajo.pdf).startswith(b'%PDF'))
+
+    def test_reintentos_y_error(self):
+        trabajo = solicitar_fuec(self.servicio, self.empresa)
+        with mock.patch('inicio.fuec.obtener_pdf_fuec', side_effect=RuntimeError('falló')):
+            for intento in range(1, MAX_INTENTOS + 1):
+                procesar_trabajo(tomar_trabajo())
+                trabajo.refresh_from_db()
+                self.assertEqual(trabajo.intentos, intento)
+                self.assertEqual(trabajo.error, 'falló')
+                self.assertEqual(trabajo.estado, 'PENDIENTE' if intento < MAX_INTENTOS else 'ERROR')
+        self.assertIsNone(tomar_trabajo())
+        # Un trabajo en ERROR no se reutiliza: se puede volver a pedir
+        self.assertNotEqual(solicitar_fuec(self.servicio, self.empresa).pk, trabajo.pk)
+
+    def test_renderizador_ocupado_no_gasta_intento(self):
+        trabajo = solicitar_fuec(self.servicio, self.empresa)
+        with mock.patch('inicio.fuec.obtener_pdf_fuec', side_effect=RenderizadorOcupado):
+            procesar_trabajo(tomar_trabajo())
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('PENDIENTE', 0))
+
+    @mock.patch('inicio.fuec.ESPERA_MAXIMA_ZIP', 0.2)
+    @mock.patch('inicio.fuec.PAUSA_ZIP', 0.05)
+    def test_zip_no_espera_para_siempre_al_pool(self):
+        with mock.patch('inicio.fuec.obtener_pdf_fuec', side_effect=RenderizadorOcupado) as obtener:
+            contenido = b''.join(zip_fuec([self.servicio], self.empresa))
+
+        self.assertGreater(obtener.call_count, 1)
+        with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+            self.assertEqual(archivo.namelist(), ['ERRORES.txt'])
+            self.assertIn(f'Servicio {self.servicio.pk}', archivo.read('ERRORES.txt').decode())
+
+    def test_liberar_abandonados(self):
+        trabajo = solicitar_fuec(self.servicio, self.empresa)
+        tomar_trabajo()
+        # Recién tomado: sigue siendo de su worker
+        self.assertEqual(liberar_trabajos_abandonados(), 0)
+
+        TrabajoFuec.objects.filter(pk=trabajo.pk).update(actualizado=timezone.now() - timedelta(hours=1))
+        self.assertEqual(liberar_trabajos_abandonados(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'PENDIENTE')
+        self.assertEqual(tomar_trabajo().pk, trabajo.pk)
+
+    def test_fecha_impresa_no_depende_del_dia(self):
+        servicio = Servicio.objects.select_related('conductor', 'vehiculo').get(pk=self.servicio.pk)
+        clave = clave_fuec(servicio, self.empresa)
+        generado = contexto_fuec(servicio, self.empresa)['generado']
+        self.assertEqual(generado, timezone.localdate(servicio.actualizado))
+
+        semana_siguiente = timezone.now() + timedelta(days=7)
+        with mock.patch('django.utils.timezone.now', return_value=semana_siguiente):
+            # Otro día, mismos datos: misma fecha impresa y misma llave (ETag)
+            self.assertEqual(contexto_fuec(servicio, self.empresa)['generado'], generado)
+            self.assertEqual(clave_fuec(servicio, self.empresa), clave)
+
+            # Si el servicio cambia, cambian la fecha impresa y la llave
+            servicio.origen = 'C'
+            servicio.save()
+            self.assertEqual(
+                contexto_fuec(servicio, self.empresa)['generado'],
+                timezone.localdate(semana_siguiente),
+            )
+            self.assertNotEqual(clave_fuec(servicio, self.empresa), clave)
+
+
+class VerificacionFuecTests(TestCase):
+    """Token firmado del QR y página pública /v/<token>/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        conductor = Conductor.objects.create(
+            empresa=cls.empresa,
+            nombre_completo='Conductor',
+            numero_documento='1',
+            licencia_numero='1',
+            licencia_categoria='C2',
+        )
+        vehiculo = Vehiculo.objects.create(empresa=cls.empresa, placa='QRV123', marca='Marca', modelo=2020)
+        cls.servicio = Servicio.objects.create(
+            empresa=cls.empresa,
+            conductor=conductor,
+            vehiculo=vehiculo,
+            fecha_servicio=date(2030, 1, 10),
+            origen='A',
+            destino='B',
+            cliente_nombre='Cliente',
+        )
+
+    def setUp(self):
+        # La caché en memoria sobrevive al rollback de cada test
+        cache.clear()
+
+    def url(self, token):
+        return reverse('fuec_verificar', args=[token])
+
+    def test_firma_y_lectura(self):
+        token = token_verificacion(self.servicio.pk)
+        self.assertEqual(leer_token(token), self.servicio.pk)
+        self.assertEqual(token, token_verificacion(self.servicio.pk))
+
+    def test_token_alterado(self):
+        id_b36, _, firma = token_verificacion(self.servicio.pk).partition('-')
+        otra_letra = 'A' if firma[0] != 'A' else 'B'
+        otro_id = token_verificacion(self.servicio.pk + 1).partition('-')[0]
+
+        for token in (
+            f'{id_b36}-{otra_letra}{firma[1:]}',  # firma cambiada
+            f'{otro_id}-{firma}',                 # id cambiado, firma vieja
+            f'{id_b36}-{firma[:-1]}',             # firma recortada
+            id_b36,                               # sin firma
+            f'-{firma}',                          # sin id
+            '',
+        ):
+            self.assertIsNone(leer_token(token), token)
+
+        respuesta = self.client.get(self.url(f'{otro_id}-{firma}'))
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertContains(respuesta, 'NO VÁLIDO', status_code=404)
+
+    def test_otra_clave_invalida_los_tokens(self):
+        token = token_verificacion(self.servicio.pk)
+        with override_settings(SECRET_KEY='otra-clave'):
+            self.assertIsNone(leer_token(token))
+
+    def test_estados(self):
+        datos = {'estado': 'PROGRAMADO', 'fecha_servicio': date(2030, 1, 10)}
+        self.assertEqual(estado_fuec(datos, hoy=date(2030, 1, 10)), 'VIGENTE')
+        self.assertEqual(estado_fuec(datos, hoy=date(2030, 1, 11)), 'VENCIDO')
+        self.assertEqual(estado_fuec({**datos, 'estado': 'CANCELADO'}, hoy=date(2030, 1, 1)), 'ANULADO')
+
+    def test_pagina_publica(self):
+        url = self.url(token_verificacion(self.servicio.pk))
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, 'estado-VIGENTE')
+        self.assertContains(respuesta, 'QRV123')
+        self.assertNotIn('Cookie', respuesta.get('Vary', ''))
+
+        # Al cancelar se invalida la caché: el QR dice ANULADO de una vez
+        with self.captureOnCommitCallbacks(execute=True):
+            self.servicio.estado = 'CANCELADO'
+            self.servicio.save()
+        self.assertContains(self.client.get(url), 'estado-ANULADO')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.servicio.estado = 'PROGRAMADO'
+            self.servicio.fecha_servicio = date(2020, 1, 10)
+            self.servicio.save()
+        self.assertContains(self.client.get(url), 'estado-VENCIDO')
+
+
+def _asignar_todos(pks, semilla):
+    """Pide el número de cada servicio, uno por uno, en orden aleatorio."""
+    pks = list(pks)
+    random.Random(semilla).shuffle(pks)
+    try:
+        for pk in pks:
+            asignar_numeros_fuec([Servicio.objects.get(pk=pk)])
+    finally:
+        connection.close()
+
+
+def _proceso(pks, semilla):
+    # Proceso hijo (fork): abre su propia conexión a la base de datos
+    _asignar_todos(pks, semilla)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class NumeracionFuecConcurrenteTests(TransactionTestCase):
+    """
+    Muchos hilos y procesos piden a la vez los números de los mismos
+    servicios: cada servicio debe quedar con un único número y los
+    números deben ser 1..N, sin huecos ni repetidos.
+    """
+    SERVICIOS = 60
+    HILOS = 6
+    PROCESOS = 3
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        conductor = Conductor.objects.create(
+            empresa=self.empresa,
+            nombre_completo='Conductor',
+            numero_documento='1',
+            licencia_numero='1',
+            licencia_categoria='C2',
+            licencia_vencimiento=date(2030, 1, 1),
+        )
+        vehiculo = Vehiculo.objects.create(
+            empresa=self.empresa,
+            placa='ABC123',
+            marca='Marca',
+            linea='Linea',
+            modelo=2020,
+            capacidad_pasajeros=10,
+        )
+        Servicio.objects.bulk_create([
+            Servicio(
+                empresa=self.empresa,
+                conductor=conductor,
+                vehiculo=vehiculo,
+                fecha_servicio=date(2030, 1, 1),
+                origen='A',
+                destino='B',
+                cliente_nombre=f'Cliente {i}',
+            )
+            for i in range(self.SERVICIOS)
+        ])
+        self.pks = list(Servicio.objects.values_list('pk', flat=True))
+
+    def test_sin_huecos_ni_repetidos(self):
+        # Los procesos se bifurcan sin conexiones abiertas heredadas
+        connections.close_all()
+        contexto = multiprocessing.get_context('fork')
+        procesos = [
+            contexto.Process(target=_proceso, args=(self.pks, 100 + i))
+            for i in range(self.PROCESOS)
+        ]
+        hilos = [
+            threading.Thread(target=_asignar_todos, args=(self.pks, i))
+            for i in range(self.HILOS)
+        ]
+        for p in procesos:
+            p.start()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        for p in procesos:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        numeros = sorted(
+            Servicio.objects.filter(empresa=self.empresa).values_list('fuec_numero', flat=True)
+        )
+        self.assertEqual(numeros, list(range(1, self.SERVICIOS + 1)))
+        self.assertEqual(ConsecutivoFuec.objects.get(empresa=self.empresa).ultimo, self.SERVICIOS)
+
+    def test_redescarga_conserva_el_numero(self):
+        servicio = Servicio.objects.get(pk=self.pks[0])
+        asignar_numeros_fuec([servicio])
+        numero = servicio.fuec_numero
+
+        otra = Servicio.objects.get(pk=self.pks[0])
+        asignar_numeros_fuec([otra])
+        self.assertEqual(otra.fuec_numero, numero)
+
+        # Un save() completo (ej: el formulario de edición) no lo borra
+        viejo = Servicio.objects.get(pk=servicio.pk)
+        viejo.fuec_numero = None
+        viejo.origen = 'C'
+        viejo.save()
+        servicio.refresh_from_db()
+        self.assertEqual(servicio.fuec_numero, numero)
+
+    def test_cancelados_no_gastan_numero(self):
+        Servicio.objects.filter(pk=self.pks[0]).update(estado='CANCELADO')
+        servicios = list(Servicio.objects.filter(pk__in=self.pks[:3]).order_by('pk'))
+        asignar_numeros_fuec(servicios)
+
+        self.assertEqual([s.fuec_numero for s in servicios], [None, 1, 2])
+        self.assertEqual(ConsecutivoFuec.objects.get(empresa=self.empresa).ultimo, 2)
+
+
+
+def _datos_servicio(conductor, vehiculo, fecha, inicio=None, fin=None, estado='PROGRAMADO'):
+    return {
+        'conductor': conductor.pk,
+        'vehiculo': vehiculo.pk,
+        'fecha_servicio': fecha.isoformat(),
+        'hora_inicio': inicio.strftime('%H:%M') if inicio else '',
+        'hora_fin': fin.strftime('%H:%M') if fin else '',
+        'origen': 'A',
+        'destino': 'B',
+        'cliente_nombre': 'Cliente',
+        'valor': '0',
+        'pasajeros': '0',
+        'estado': estado,
+    }
+
+
+class CrucesHorarioTests(TestCase):
+    """Un conductor o vehículo no puede quedar en dos servicios a la vez."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        cls.conductores = [
+            Conductor.objects.create(
+                empresa=cls.empresa,
+                nombre_completo=f'Conductor {i}',
+                numero_documento=str(i),
+                licencia_numero=str(i),
+                licencia_categoria='C2',
+            )
+            for i in range(2)
+        ]
+        cls.vehiculos = [
+            Vehiculo.objects.create(
+                empresa=cls.empresa,
+                placa=f'ABC12{i}',
+                marca='Marca',
+                modelo=2020,
+            )
+            for i in range(2)
+        ]
+        cls.dia = date(2030, 1, 10)
+
+    def crear(self, conductor, vehiculo, fecha, inicio=None, fin=None, estado='PROGRAMADO'):
+        form = ServicioForm(_datos_servicio(conductor, vehiculo, fecha, inicio, fin, estado))
+        self.assertTrue(form.is_valid(), form.errors)
+        servicio = form.save(commit=False)
+        servicio.empresa = self.empresa
+        servicio.save()
+        return servicio
+
+    def errores(self, conductor, vehiculo, fecha, inicio=None, fin=None, instance=None):
+        form = ServicioForm(_datos_servicio(conductor, vehiculo, fecha, inicio, fin), instance=instance)
+        form.is_valid()
+        return set(form.errors)
+
+    def test_cruce_de_conductor_y_de_vehiculo(self):
+        c0, c1 = self.conductores
+        v0, v1 = self.vehiculos
+        self.crear(c0, v0, self.dia, time(8), time(10))
+
+        self.assertEqual(self.errores(c0, v1, self.dia, time(9), time(11)), {'conductor'})
+        self.assertEqual(self.errores(c1, v0, self.dia, time(9), time(11)), {'vehiculo'})
+        self.assertEqual(self.errores(c0, v0, self.dia, time(7), time(12)), {'conductor', 'vehiculo'})
+        # Uno empieza justo cuando el otro termina
+        self.assertEqual(self.errores(c0, v0, self.dia, time(10), time(11)), set())
+
+    def test_sin_horas_nocturnos_y_cancelados(self):
+        c0, _ = self.conductores
+        v0, _ = self.vehiculos
+        # Sin horas ocupa todo el día
+        self.crear(c0, v0, self.dia)
+        self.assertEqual(self.errores(c0, v0, self.dia, time(15), time(16)), {'conductor', 'vehiculo'})
+
+        # 22:00 a 02:00 termina al día siguiente
+        otro_dia = date(2030, 2, 1)
+        self.crear(c0, v0, otro_dia, time(22), time(2))
+        self.assertTrue(self.errores(c0, v0, date(2030, 2, 2), time(1), time(3)))
+        self.assertFalse(self.errores(c0, v0, date(2030, 2, 2), time(2), time(3)))
+
+        # Un cancelado no ocupa; editar un servicio no choca consigo mismo
+        cancelado = self.crear(c0, v0, date(2030, 3, 1), time(8), time(9), estado='CANCELADO')
+        self.assertFalse(self.errores(c0, v0, date(2030, 3, 1), time(8), time(9)))
+        servicio = self.crear(c0, v0, date(2030, 3, 1), time(8), time(9))
+        self.assertFalse(self.errores(c0, v0, date(2030, 3, 1), time(8), time(10), instance=servicio))
+        self.assertNotEqual(cancelado.pk, servicio.pk)
+
+    def test_conflictos_empresa(self):
+        c0, c1 = self.conductores
+        v0, v1 = self.vehiculos
+        a = Servicio.objects.create(
+            empresa=self.empresa, conductor=c0, vehiculo=v0, fecha_servicio=self.dia,
+            hora_inicio=time(22), hora_fin=time(2), origen='A', destino='B', cliente_nombre='x',
+        )
+        b = Servicio.objects.create(
+            empresa=self.empresa, conductor=c0, vehiculo=v1, fecha_servicio=date(2030, 1, 11),
+            hora_inicio=time(1), hora_fin=time(3), origen='A', destino='B', cliente_nombre='x',
+        )
+        Servicio.objects.create(
+            empresa=self.empresa, conductor=c1, vehiculo=v1, fecha_servicio=date(2030, 1, 11),
+            hora_inicio=time(3), hora_fin=time(4), origen='A', destino='B', cliente_nombre='x',
+        )
+        conflictos, total = conflictos_empresa(self.empresa)
+        self.assertEqual(total, 1)
+        self.assertEqual(
+            (conflictos[0]['recurso'], conflictos[0]['a']['id'], conflictos[0]['b']['id']),
+            ('Conductor', a.pk, b.pk),
+        )
+        # El del día anterior cuenta si se cruza con uno del rango
+        self.assertEqual(conflictos_empresa(self.empresa, desde=date(2030, 1, 11))[1], 1)
+        self.assertEqual(conflictos_empresa(self.empresa, desde=date(2030, 1, 12))[1], 0)
+
+    def test_disponibles(self):
+        c0, c1 = self.conductores
+        v0, v1 = self.vehiculos
+        Conductor.objects.filter(pk=c0.pk).update(licencia_vencimiento=date(2031, 1, 1))
+        Conductor.objects.filter(pk=c1.pk).update(licencia_vencimiento=date(2030, 1, 9))
+        Vehiculo.objects.update(
+            soat_vencimiento=date(2031, 1, 1),
+            tecnomecanica_vencimiento=date(2031, 1, 1),
+            poliza_contractual_vencimiento=date(2031, 1, 1),
+            poliza_extracontractual_vencimiento=date(2031, 1, 1),
+            capacidad_pasajeros=20,
+        )
+        Vehiculo.objects.filter(pk=v1.pk).update(capacidad_pasajeros=40)
+        servicio = self.crear(c0, v0, self.dia, time(22), time(2))
+
+        def libres(fecha, inicio, fin, **kwargs):
+            return (
+                set(conductores_disponibles(self.empresa, fecha, inicio, fin, excluir=kwargs.get('excluir'))),
+                set(vehiculos_disponibles(self.empresa, fecha, inicio, fin, **kwargs)),
+            )
+
+        # c1 tiene la licencia vencida; c0 y v0 siguen ocupados a la 1:00
+        self.assertEqual(libres(date(2030, 1, 11), time(1), time(3)), (set(), {v1}))
+        self.assertEqual(libres(date(2030, 1, 11), time(2), time(3)), ({c0}, {v0, v1}))
+        self.assertEqual(libres(date(2030, 1, 11), time(2), time(3), capacidad=30), ({c0}, {v1}))
+        # Al editar, el propio servicio no ocupa
+        self.assertEqual(libres(self.dia, time(23), time(1), excluir=servicio.pk), ({c0}, {v0, v1}))
+
+
+class PlanificacionTests(TestCase):
+    """El plan del día respeta horarios, capacidad, categoría y documentos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        cls.dia = date(2030, 1, 10)
+        vigente = date(2031, 1, 1)
+        cls.c1, cls.c2, cls.sin_categoria, cls.vencido = [
+            Conductor.objects.create(
+                empresa=cls.empresa,
+                nombre_completo=f'Conductor {i}',
+                numero_documento=str(i),
+                licencia_numero=str(i),
+                licencia_categoria=categoria,
+                licencia_vencimiento=vencimiento,
+            )
+            for i, (categoria, vencimiento) in enumerate([
+                ('C1', vigente), ('C2', vigente), ('B1', vigente), ('C2', date(2030, 1, 9)),
+            ])
+        ]
+        cls.pequeno, cls.grande, cls.sin_soat = [
+            Vehiculo.objects.create(
+                empresa=cls.empresa,
+                placa=f'PLN12{i}',
+                marca='Marca',
+                modelo=2020,
+                capacidad_pasajeros=capacidad,
+                soat_vencimiento=soat,
+                tecnomecanica_vencimiento=vigente,
+                poliza_contractual_vencimiento=vigente,
+                poliza_extracontractual_vencimiento=vigente,
+            )
+            for i, (capacidad, soat) in enumerate([(10, vigente), (30, vigente), (40, date(2030, 1, 9))])
+        ]
+
+    def servicio(self, inicio, fin, pasajeros, **kwargs):
+        datos = {
+            'empresa': self.empresa,
+            'conductor': self.sin_categoria,
+            'vehiculo': self.sin_soat,
+            'fecha_servicio': self.dia,
+            'hora_inicio': inicio,
+            'hora_fin': fin,
+            'origen': 'A',
+            'destino': 'B',
+            'cliente_nombre': 'Cliente',
+            'pasajeros': pasajeros,
+            **kwargs,
+        }
+        return Servicio.objects.create(**datos)
+
+    def test_plan_y_aplicar(self):
+        # Con FUEC: no se mueve y ocupa a c2 y al grande de 12:00 a 13:00
+        self.servicio(time(12), time(13), 20, conductor=self.c2, vehiculo=self.grande, fuec_numero=1)
+        s1 = self.servicio(time(8), time(10), 5)
+        s2 = self.servicio(time(9), time(11), 25)
+        s3 = self.servicio(time(10), time(12), 8)
+        s4 = self.servicio(time(12, 30), time(14), 20)
+
+        plan = planificar(self.empresa, self.dia)
+        propuesta = {
+            a['id']: (a['nuevo_conductor_id'], a['nuevo_vehiculo_id'])
+            for a in plan.asignaciones
+        }
+        # s3 sigue en el pequeño después de s1; s2 necesita el grande y C2
+        self.assertEqual(propuesta, {
+            s1.pk: (self.c1.pk, self.pequeno.pk),
+            s2.pk: (self.c2.pk, self.grande.pk),
+            s3.pk: (self.c1.pk, self.pequeno.pk),
+        })
+        self.assertEqual(plan.vehiculos_despues, 2)
+        # El grande está en el servicio con FUEC: s4 conserva lo que tenía
+        self.assertEqual([f['id'] for f, _ in plan.sin_asignar], [s4.pk])
+
+        self.assertEqual(aplicar_plan(self.empresa, self.dia, 'otra firma')[0], None)
+        self.assertEqual(aplicar_plan(self.empresa, self.dia, plan.firma)[0], 3)
+        s2.refresh_from_db()
+        self.assertEqual((s2.conductor_id, s2.vehiculo_id), (self.c2.pk, self.grande.pk))
+        self.assertEqual(conflictos_empresa(self.empresa)[1], 0)
+        self.assertEqual(planificar(self.empresa, self.dia).cambios, [])
+
+
+class GuardarServicioTests(TransactionTestCase):
+    """guardar() revisa los cruces con bloqueo aunque no haya transacción afuera."""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        self.conductor = Conductor.objects.create(
+            empresa=self.empresa,
+            nombre_completo='Conductor',
+            numero_documento='1',
+            licencia_numero='1',
+            licencia_categoria='C2',
+        )
+        self.vehiculo = Vehiculo.objects.create(empresa=self.empresa, placa='GRD123', marca='M', modelo=2020)
+
+    def test_bloquea_aunque_ya_se_haya_validado(self):
+        datos = _datos_servicio(self.conductor, self.vehiculo, date(2030, 1, 1), time(8), time(10))
+        form = ServicioForm(datos)
+        with mock.patch('inicio.forms.conflictos_servicio', wraps=conflictos_servicio) as revisar:
+            # Validar fuera de una transacción no bloquea...
+            self.assertTrue(form.is_valid())
+            self.assertFalse(revisar.call_args.kwargs['bloquear'])
+            # ...por eso guardar() vuelve a validar, ya con el bloqueo
+            servicio = form.guardar(self.empresa)
+            self.assertTrue(revisar.call_args.kwargs['bloquear'])
+        self.assertEqual(servicio.empresa, self.empresa)
+
+        cruce = ServicioForm(_datos_servicio(self.conductor, self.vehiculo, date(2030, 1, 1), time(9), time(11)))
+        self.assertIsNone(cruce.guardar(self.empresa))
+        self.assertIn('conductor', cruce.errors)
+        self.assertEqual(Servicio.objects.count(), 1)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CrucesHorarioConcurrentesTests(TransactionTestCase):
+    """Dos reservas simultáneas del mismo conductor: solo entra una."""
+    HILOS = 6
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        self.conductor = Conductor.objects.create(
+            empresa=self.empresa,
+            nombre_completo='Conductor',
+            numero_documento='1',
+            licencia_numero='1',
+            licencia_categoria='C2',
+        )
+        self.vehiculos = [
+            Vehiculo.objects.create(empresa=self.empresa, placa=f'XYZ{i:03d}', marca='M', modelo=2020)
+            for i in range(self.HILOS)
+        ]
+
+    def test_una_sola_reserva(self):
+        barrera = threading.Barrier(self.HILOS)
+
+        def reservar(vehiculo):
+            try:
+                datos = _datos_servicio(self.conductor, vehiculo, date(2030, 1, 1), time(8), time(10))
+                barrera.wait()
+                # Sin transacción alrededor: guardar() bloquea por su cuenta
+                ServicioForm(datos).guardar(self.empresa)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=reservar, args=(v,)) for v in self.vehiculos]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        self.assertEqual(Servicio.objects.filter(conductor=self.conductor).count(), 1)
+
+
+
+class ImportacionCsvTests(TestCase):
+    """Importación de conductores y vehículos: crea, actualiza y reporta por línea."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        cls.otra = Empresa.objects.create(nombre='Otra', nit='901', direccion='y')
+        cls.existente = Conductor.objects.create(
+            empresa=cls.empresa,
+            nombre_completo='Nombre viejo',
+            tipo_documento='CC',
+            numero_documento='111',
+            licencia_numero='111',
+            licencia_categoria='C1',
+        )
+        Vehiculo.objects.create(empresa=cls.otra, placa='OTR123', marca='Marca', modelo=2020)
+
+    def csv(self, texto, codificacion='utf-8'):
+        return io.BytesIO(texto.encode(codificacion))
+
+    def conductores(self, simular=False):
+        return importar('conductores', self.empresa, self.csv(
+            'nombre_completo;tipo_documento;numero_documento;licencia_categoria;licencia_numero;activo\n'
+            'Nombre nuevo;CC;111;C2;111;\n'
+            'Conductora;CC;222;B1;222;no\n'
+            '\n'
+            ';CC;333;CATEGORIA;333;\n'
+            'Repetida;CC;222;B1;222;\n'
+        ), simular)
+
+    def test_crea_actualiza_y_reporta(self):
+        resultado = self.conductores()
+
+        self.assertEqual((resultado.filas, resultado.creados, resultado.actualizados), (4, 1, 1))
+        self.assertEqual([numero for numero, _ in resultado.errores], [5, 6])
+        self.assertIn('nombre_completo', resultado.errores[0][1])
+        self.assertIn('licencia_categoria', resultado.errores[0][1])
+        self.assertIn('línea 3', resultado.errores[1][1])
+
+        self.existente.refresh_from_db()
+        self.assertEqual((self.existente.nombre_completo, self.existente.licencia_categoria), ('Nombre nuevo', 'C2'))
+        self.assertTrue(self.existente.activo)
+        nueva = Conductor.objects.get(empresa=self.empresa, numero_documento='222')
+        self.assertEqual(nueva.nombre_completo, 'Conductora')
+        self.assertFalse(nueva.activo)
+        self.assertEqual(Conductor.objects.filter(empresa=self.empresa).count(), 2)
+
+    def test_simular_no_guarda(self):
+        resultado = self.conductores(simular=True)
+
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.total_errores), (1, 1, 2))
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.nombre_completo, 'Nombre viejo')
+        self.assertFalse(Conductor.objects.filter(numero_documento='222').exists())
+
+    def test_vehiculos_excel_y_placa_de_otra_empresa(self):
+        # Excel guarda en Windows-1252 y con ',' si la configuración es en inglés
+        resultado = importar('vehiculos', self.empresa, self.csv(
+            'placa,marca,linea,modelo,capacidad_pasajeros\n'
+            'NUE123,Chevrolet,Línea,2021,19\n'
+            'OTR123,Marca,,2020,4\n',
+            'cp1252',
+        ))
+
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 0))
+        self.assertEqual(resultado.errores, [(3, 'La placa OTR123 ya está registrada por otra empresa.')])
+        self.assertEqual(Vehiculo.objects.get(placa='NUE123').linea, 'Línea')
+        self.assertEqual(Vehiculo.objects.get(placa='OTR123').empresa, self.otra)
+
+    def test_faltan_columnas(self):
+        resultado = importar('vehiculos', self.empresa, self.csv('placa,marca\nNUE123,Chevrolet\n'))
+
+        self.assertEqual(resultado.filas, 0)
+        self.assertEqual(resultado.errores, [(1, 'Faltan columnas: modelo, capacidad_pasajeros.')])
+        self.assertFalse(Vehiculo.objects.filter(placa='NUE123').exists())
+
+
+
+class FechasVehiculosTests(TestCase):
+    """Cambio en bloque de fechas de documentos desde la lista de vehículos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+        cls.user = User.objects.create_user('admin', password='x')
+        EmpresaUsuario.objects.create(empresa=cls.empresa, user=cls.user)
+        cls.vehiculo = Vehiculo.objects.create(empresa=cls.empresa, placa='FEC123', marca='M', modelo=2020)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def cambiar(self, ids):
+        return self.client.post(reverse('vehiculos_fechas'), {
+            'ids': ids,
+            'campo': 'soat_vencimiento',
+            'fecha': '2030-06-30',
+        })
+
+    def test_marcados(self):
+        respuesta = self.cambiar([str(self.vehiculo.pk)])
+        self.assertContains(respuesta, 'Se actualizaron 1 vehículos.')
+        self.vehiculo.refresh_from_db()
+        self.assertEqual(self.vehiculo.soat_vencimiento, date(2030, 6, 30))
+
+    def test_ids_no_validos(self):
+        # '²' pasa str.isdigit() pero int() no lo acepta
+        for ids in (['²'], [str(self.vehiculo.pk), 'x']):
+            respuesta = self.cambiar(ids)
+            self.assertContains(respuesta, 'Los vehículos marcados no son válidos.')
+        self.vehiculo.refresh_from_db()
+        self.assertIsNone(self.vehiculo.soat_vencimiento)
+
+
+
+class AvisosVencimientoTests(TestCase):
+    """Dos ejecuciones del aviso diario que se cruzan no repiten ni pierden correos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa', nit='900', direccion='x')
+
+    def lote(self, *destinatarios):
+        avisos = [
+            AvisoVencimiento(fecha=date(2030, 1, 1), empresa=self.empresa, para=para, alertas=1)
+            for para in destinatarios
+        ]
+        correos = [CorreoSaliente(para=para, asunto='Vencimientos', texto='x') for para in destinatarios]
+        return avisos, correos
+
+    def test_lote_completo(self):
+        self.assertEqual(_guardar_avisos(*self.lote('a@x.co', 'b@x.co')), (2, 0))
+        self.assertEqual(CorreoSaliente.objects.count(), 2)
+
+    def test_solo_se_omiten_los_repetidos(self):
+        # Otra ejecución ya encoló el aviso de a@x.co
+        _guardar_avisos(*self.lote('a@x.co'))
+
+        self.assertEqual(_guardar_avisos(*self.lote('a@x.co', 'b@x.co', 'c@x.co')), (2, 1))
+        self.assertEqual(AvisoVencimiento.objects.count(), 3)
+        self.assertEqual(
+            sorted(CorreoSaliente.objects.values_list('para', flat=True)),
+            ['a@x.co', 'b@x.co', 'c@x.co'],
+        )
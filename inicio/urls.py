@@ -34,6 +34,7 @@ urlpatterns = [
     # Conductores
     path('conductores/', views.conductores_lista, name='conductores_lista'),
     path('conductores/nuevo/', views.conductor_crear, name='conductor_crear'),
+    path('conductores/importar/', views.conductores_importar, name='conductores_importar'),
     path('conductores/<int:pk>/editar/', views.conductor_editar, name='conductor_editar'),
     path('conductores/<int:pk>/', views.conductor_detalle, name='conductor_detalle'),
 
@@ -41,6 +42,8 @@ urlpatterns = [
     # Vehículos
     path('vehiculos/', views.vehiculos_lista, name='vehiculos_lista'),
     path('vehiculos/nuevo/', views.vehiculo_crear, name='vehiculo_crear'),
+    path('vehiculos/importar/', views.vehiculos_importar, name='vehiculos_importar'),
+    path('vehiculos/fechas/', views.vehiculos_fechas, name='vehiculos_fechas'),
     path('vehiculos/<int:pk>/editar/', views.vehiculo_editar, name='vehiculo_editar'),
     path('vehiculos/<int:pk>/', views.vehiculo_detalle, name='vehiculo_detalle'),
 
@@ -48,6 +51,12 @@ urlpatterns = [
     # Servicios / Viajes
     path('servicios/', views.servicios_lista, name='servicios_lista'),
     path('servicios/nuevo/', views.servicio_crear, name='servicio_crear'),
+    path('servicios/fuec/zip/', views.servicios_fuec_zip, name='servicios_fuec_zip'),
+    path('servicios/manifiesto/', views.servicios_manifiesto, name='servicios_manifiesto'),
+    path('servicios/exportar/', views.servicios_exportar, name='servicios_exportar'),
+    path('servicios/conflictos/', views.servicios_conflictos, name='servicios_conflictos'),
+    path('servicios/disponibles/', views.servicios_disponibles, name='servicios_disponibles'),
+    path('servicios/planificar/', views.servicios_planificar, name='servicios_planificar'),
     path('servicios/<int:pk>/editar/', views.servicio_editar, name='servicio_editar'),
     path('servicios/<int:pk>/', views.servicio_detalle, name='servicio_detalle'),
 
@@ -58,6 +67,26 @@ urlpatterns = [
         name='servicio_fuec_pdf'
     ),
 
+    # FUEC en segundo plano (FUEC_ASINCRONO=True)
+    path(
+        'servicios/<int:pk>/fuec/solicitar/',
+        views.servicio_fuec_solicitar,
+        name='servicio_fuec_solicitar'
+    ),
+    path(
+        'servicios/fuec/trabajos/<int:pk>/',
+        views.fuec_trabajo_estado,
+        name='fuec_trabajo_estado'
+    ),
+    path(
+        'servicios/fuec/trabajos/<int:pk>/descargar/',
+        views.fuec_trabajo_descargar,
+        name='fuec_trabajo_descargar'
+    ),
+
+    # Verificación pública del FUEC (QR), sin login
+    path('v/<str:token>/', views.fuec_verificar, name='fuec_verificar'),
+
    
     # Vencimientos / Alertas
     path('vencimientos/', views.vencimientos_lista, name='vencimientos_lista'),
@@ -0,0 +1,208 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import DateField, DurationField, ExpressionWrapper, F, Value
+from django.utils import timezone
+
+from .models import (
+    Conductor,
+    Vehiculo,
+    VencimientoDocumento,
+    DOCUMENTOS_CONDUCTOR,
+    DOCUMENTOS_VEHICULO,
+)
+
+
+NOMBRES_DOCUMENTO = dict(DOCUMENTOS_CONDUCTOR + DOCUMENTOS_VEHICULO)
+
+# Campos de Conductor / Vehiculo que alimentan VencimientoDocumento.
+# Si un update masivo no toca ninguno, no hace falta resincronizar.
+CAMPOS_SINCRONIZADOS = {
+    'empresa', 'empresa_id',
+    'nombre_completo', 'numero_documento',
+    'placa', 'marca', 'linea',
+} | set(NOMBRES_DOCUMENTO)
+
+TAMANO_LOTE = 1000
+
+
+def _origen(modelo):
+    return 'CONDUCTOR' if modelo is Conductor else 'VEHICULO'
+
+
+def documentos_de(obj):
+    """
+    Construye (sin guardar) las filas de VencimientoDocumento de un
+    conductor o vehículo. Solo se incluyen las fechas no vacías.
+    """
+    if isinstance(obj, Conductor):
+        origen = 'CONDUCTOR'
+        documentos = DOCUMENTOS_CONDUCTOR
+        titulo = obj.nombre_completo
+        detalle = obj.numero_documento
+    else:
+        origen = 'VEHICULO'
+        documentos = DOCUMENTOS_VEHICULO
+        titulo = obj.placa
+        detalle = f'{obj.marca} {obj.linea}'
+
+    filas = []
+    for campo, _ in documentos:
+        fecha = getattr(obj, campo)
+        if fecha:
+            filas.append(VencimientoDocumento(
+                empresa_id=obj.empresa_id,
+                origen=origen,
+                objeto_id=obj.pk,
+                tipo=campo,
+                fecha=fecha,
+                titulo=titulo,
+                detalle=detalle,
+            ))
+    return filas
+
+
+def sincronizar_vencimientos(modelo, ids):
+    """
+    Recalcula las filas de VencimientoDocumento de los objetos 'ids'
+    del modelo dado (Conductor o Vehiculo), leyendo su estado actual.
+    """
+    ids = list(ids)
+    origen = _origen(modelo)
+
+    for i in range(0, len(ids), TAMANO_LOTE):
+        lote = ids[i:i + TAMANO_LOTE]
+        with transaction.atomic():
+            VencimientoDocumento.objects.filter(
+                origen=origen,
+                objeto_id__in=lote,
+            ).delete()
+
+            filas = []
+            for obj in modelo.objects.filter(pk__in=lote):
+                filas.extend(documentos_de(obj))
+            VencimientoDocumento.objects.bulk_create(filas)
+
+
+def eliminar_vencimientos(modelo, ids):
+    """Borra las filas de VencimientoDocumento de los objetos 'ids'."""
+    VencimientoDocumento.objects.filter(
+        origen=_origen(modelo),
+        objeto_id__in=list(ids),
+    ).delete()
+
+
+def reconstruir_vencimientos(empresa=None):
+    """
+    Vuelve a generar toda la tabla VencimientoDocumento (o solo la de
+    una empresa). Devuelve el número de filas creadas.
+    """
+    total = 0
+    with transaction.atomic():
+        existentes = VencimientoDocumento.objects.all()
+        if empresa is not None:
+            existentes = existentes.filter(empresa=empresa)
+        existentes.delete()
+
+        for modelo in (Conductor, Vehiculo):
+            objetos = modelo.objects.all()
+            if empresa is not None:
+                objetos = objetos.filter(empresa=empresa)
+
+            filas = []
+            for obj in objetos.iterator(chunk_size=TAMANO_LOTE):
+                filas.extend(documentos_de(obj))
+                if len(filas) >= TAMANO_LOTE:
+                    VencimientoDocumento.objects.bulk_create(filas)
+                    total += len(filas)
+                    filas = []
+
+            VencimientoDocumento.objects.bulk_create(filas)
+            total += len(filas)
+    return total
+
+
+def _dias_restantes(campo, hoy):
+    """Diferencia (fecha - hoy) calculada en la base de datos."""
+    return ExpressionWrapper(
+        F(campo) - Value(hoy, output_field=DateField()),
+        output_field=DurationField(),
+    )
+
+
+def alertas_vencimiento_qs(empresa, dias_alerta=30, hoy=None):
+    """
+    Devuelve un queryset con las alertas de la empresa, ordenado por
+    fecha de vencimiento.
+
+    Cada fila es un dict con: origen, tipo, titulo, detalle, fecha, dias.
+    Sale de VencimientoDocumento con un recorrido del índice
+    (empresa, fecha); el cálculo de días, el orden y el límite se hacen
+    en la base de datos, así que se puede paginar o cortar ([:5]).
+    """
+    hoy = hoy or timezone.localdate()
+    limite = hoy + timedelta(days=dias_alerta)
+
+    return VencimientoDocumento.objects.filter(
+        empresa=empresa,
+        fecha__lte=limite,
+    ).values(
+        'origen', 'tipo', 'titulo', 'detalle', 'fecha',
+        dias=_dias_restantes('fecha', hoy),
+    ).order_by('fecha', 'origen', 'titulo')
+
+
+def alertas_todas_las_empresas_qs(dias_alerta=30, hoy=None):
+    """
+    Las mismas filas de alertas_vencimiento_qs, pero de todas las
+    empresas a la vez (con empresa_id y objeto_id), ordenadas por empresa
+    y luego por fecha. Para recorrerlas en una sola pasada (.iterator()).
+    """
+    hoy = hoy or timezone.localdate()
+    limite = hoy + timedelta(days=dias_alerta)
+
+    return VencimientoDocumento.objects.filter(
+        fecha__lte=limite,
+    ).values(
+        'empresa_id', 'origen', 'objeto_id', 'tipo', 'titulo', 'detalle', 'fecha',
+        dias=_dias_restantes('fecha', hoy),
+    ).order_by('empresa_id', 'fecha', 'origen', 'titulo')
+
+
+def fila_a_alerta(fila):
+    """
+    Convierte una fila de alertas_vencimiento_qs en el dict que usan las
+    plantillas (nombre/identificacion o placa/descripcion).
+    """
+    dias = fila['dias'].days
+    alerta = {
+        'origen': fila['origen'],
+        'tipo': NOMBRES_DOCUMENTO.get(fila['tipo'], fila['tipo']),
+        'fecha': fila['fecha'],
+        'dias_restantes': dias,
+        'dias_texto': abs(dias),
+        'estado_alerta': 'VENCIDO' if dias < 0 else 'POR_VENCER',
+    }
+    if fila['origen'] == 'CONDUCTOR':
+        alerta.update({'nombre': fila['titulo'], 'identificacion': fila['detalle']})
+    else:
+        alerta.update({'placa': fila['titulo'], 'descripcion': fila['detalle']})
+    return alerta
+
+
+def obtener_alertas_vencimiento(empresa, dias_alerta=30, limite=None):
+    """
+    Devuelve una lista de dicts con alertas de:
+    - Licencias de conductores
+    - SOAT / Tecnomecánica / Pólizas de vehículos
+
+    Solo se incluyen los que:
+    - Ya están vencidos, o
+    - Vencen en los próximos 'dias_alerta' días
+
+    Con 'limite' se traen solo las N más próximas (ej: dashboard).
+    """
+    filas = alertas_vencimiento_qs(empresa, dias_alerta)
+    if limite is not None:
+        filas = filas[:limite]
+    return [fila_a_alerta(f) for f in filas]
@@ -0,0 +1,93 @@
+"""
+Verificación pública del FUEC (código QR).
+
+Cada FUEC lleva un token corto y firmado: el id del servicio en base 36
+y una firma HMAC truncada (ej: '2s-Q3v9x0mYk1aBcDe_F'). El agente de
+tránsito escanea el QR y llega a /v/<token>/, una página pública y
+mínima que dice si el FUEC está vigente, anulado o vencido.
+
+- El id del token se resuelve por la llave primaria (índice), trayendo
+  solo unas columnas: no se carga el servicio con conductor y vehículo.
+- El resultado se cachea TTL_VERIFICACION segundos (y se invalida al
+  cambiar el servicio), así que un pico de escaneos no llega a la BD.
+"""
+from base64 import urlsafe_b64encode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import base36_to_int, int_to_base36
+
+from .models import Servicio
+
+
+SAL_TOKEN = 'inicio.verificacion.fuec'
+
+# 12 bytes de HMAC-SHA256 (16 caracteres): suficiente para que no se
+# pueda adivinar y corto para que el QR sea pequeño
+BYTES_FIRMA = 12
+
+TTL_VERIFICACION = 60
+
+
+def _firma(id_b36):
+    digest = salted_hmac(SAL_TOKEN, id_b36, algorithm='sha256').digest()
+    return urlsafe_b64encode(digest[:BYTES_FIRMA]).decode()
+
+
+def token_verificacion(servicio_id):
+    return f'{int_to_base36(servicio_id)}-{_firma(int_to_base36(servicio_id))}'
+
+
+def leer_token(token):
+    """Devuelve el id del servicio o None si el token no es válido."""
+    id_b36, _, firma = token.partition('-')
+    if not id_b36 or not constant_time_compare(firma, _firma(id_b36)):
+        return None
+    try:
+        return base36_to_int(id_b36)
+    except ValueError:
+        return None
+
+
+def url_verificacion(servicio_id):
+    """URL absoluta que va en el QR del FUEC."""
+    ruta = reverse('fuec_verificar', args=[token_verificacion(servicio_id)])
+    return f'{settings.SITIO_URL.rstrip("/")}{ruta}'
+
+
+def clave_verificacion(servicio_id):
+    return f'verificacion:{servicio_id}'
+
+
+def datos_verificacion(servicio_id):
+    """
+    Columnas mínimas del servicio para la página pública (o None si no
+    existe). También se cachean los que no existen.
+    """
+    clave = clave_verificacion(servicio_id)
+    datos = cache.get(clave)
+    if datos is None:
+        fila = Servicio.objects.filter(pk=servicio_id).values(
+            'estado', 'fecha_servicio', 'fuec_numero',
+            'empresa__nombre', 'empresa__nit', 'vehiculo__placa',
+        ).first()
+        datos = fila or {}
+        cache.set(clave, datos, TTL_VERIFICACION)
+    return datos or None
+
+
+def estado_fuec(datos, hoy=None):
+    """VIGENTE, ANULADO (servicio cancelado) o VENCIDO (fecha pasada)."""
+    hoy = hoy or timezone.localdate()
+    if datos['estado'] == 'CANCELADO':
+        return 'ANULADO'
+    if datos['fecha_servicio'] < hoy:
+        return 'VENCIDO'
+    return 'VIGENTE'
+
+
+def invalidar_verificacion(*servicio_ids):
+    cache.delete_many([clave_verificacion(s) for s in servicio_ids])
@@ -4,147 +4,67 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.conf import settings
 
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string, get_template
-from django.utils.html import strip_tags
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-
-from datetime import datetime, date, timedelta
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST, require_safe
+
+from datetime import date, datetime, time
 import random
-from io import BytesIO
-
-from django.db.models import Q  
+import tempfile
 
 
 
 from .models import (
     CodigoVerificacion,
-    Empresa,
     EmpresaUsuario,
     Conductor,
+    DOCUMENTOS_VEHICULO,
     Vehiculo,
     Servicio,
+    TrabajoFuec,
 )
 from .forms import ConductorForm, VehiculoForm, ServicioForm
-
-
-
-
-def obtener_empresa_actual(user):
-    """
-    Devuelve la empresa asociada al usuario.
-    Si el usuario no tiene EmpresaUsuario (ej: superuser admin),
-    devuelve/crea la empresa por defecto 'Rutek Tours'.
-    """
-    empresa_vinculo = getattr(user, 'empresa_vinculo', None)
-    if empresa_vinculo:
-        return empresa_vinculo.empresa
-
-    empresa_rutek, _ = Empresa.objects.get_or_create(
-        nombre='Rutek Tours',
-        defaults={
-            'nit': '901000000-0',
-            'direccion': 'Bogotá, Colombia',
-            'telefono': '3000000000',
-            'email': 'contacto@rutek.tours',
-        }
-    )
-    return empresa_rutek
-
-
-
-
-def obtener_alertas_vencimiento(empresa, dias_alerta=30):
-    """
-    Devuelve una lista de dicts con alertas de:
-    - Licencias de conductores
-    - SOAT / Tecnomecánica / Pólizas de vehículos
-
-    Solo se incluyen los que:
-    - Ya están vencidos, o
-    - Vencen en los próximos 'dias_alerta' días
-    """
-    hoy = date.today()
-    limite = hoy + timedelta(days=dias_alerta)
-    alertas = []
-
-    # --- Conductores: licencia de conducción ---
-    conductores = Conductor.objects.filter(
-        empresa=empresa,
-        licencia_vencimiento__isnull=False,
-        licencia_vencimiento__lte=limite,
-    )
-
-    for c in conductores:
-        dias = (c.licencia_vencimiento - hoy).days
-        estado = 'VENCIDO' if dias < 0 else 'POR_VENCER'
-        dias_texto = abs(dias)  
-
-        alertas.append({
-            'origen': 'CONDUCTOR',
-            'tipo': 'Licencia de conducción',
-            'nombre': c.nombre_completo,
-            'identificacion': c.numero_documento,
-            'fecha': c.licencia_vencimiento,
-            'dias_restantes': dias,   
-            'dias_texto': dias_texto,
-            'estado_alerta': estado,
-        })
-
-    # --- Vehículos: SOAT, Tecnomecánica, Pólizas ---
-    vehiculos = Vehiculo.objects.filter(empresa=empresa)
-    campos_vehiculo = [
-        ('SOAT', 'soat_vencimiento'),
-        ('Tecnomecánica', 'tecnomecanica_vencimiento'),
-        ('Póliza contractual', 'poliza_contractual_vencimiento'),
-        ('Póliza extracontractual', 'poliza_extracontractual_vencimiento'),
-    ]
-
-    for v in vehiculos:
-        for tipo, campo in campos_vehiculo:
-            fecha = getattr(v, campo)
-            if fecha and fecha <= limite:
-                dias = (fecha - hoy).days
-                estado = 'VENCIDO' if dias < 0 else 'POR_VENCER'
-                dias_texto = abs(dias)
-
-                alertas.append({
-                    'origen': 'VEHICULO',
-                    'tipo': tipo,
-                    'placa': v.placa,
-                    'descripcion': f'{v.marca} {v.linea}',
-                    'fecha': fecha,
-                    'dias_restantes': dias,
-                    'dias_texto': dias_texto,
-                    'estado_alerta': estado,
-                })
-
-   
-    alertas.sort(key=lambda a: a['fecha'])
-    return alertas
-
-
-
-
-def render_to_pdf(template_src, context_dict=None):
-    """
-    Renderiza una plantilla HTML a PDF usando xhtml2pdf.
-    Devuelve los bytes del PDF o None si hubo error.
-    Importamos xhtml2pdf aquí para no cargarlo en cada request.
-    """
-    # Import local para evitar consumir memoria en todos los procesos
-    from xhtml2pdf import pisa
-
-    if context_dict is None:
-        context_dict = {}
-    template = get_template(template_src)
-    html = template.render(context_dict)
-    result = BytesIO()
-    pdf = pisa.CreatePDF(html, dest=result, encoding='UTF-8')
-    if pdf.err:
-        return None
-    return result.getvalue()
+from .vencimientos import alertas_vencimiento_qs, fila_a_alerta
+from .busqueda import buscar
+from .conflictos import conductores_disponibles, conflictos_empresa, vehiculos_disponibles
+from .filtros import filtrar_servicios, leer_filtros_servicios
+from .dashboard import obtener_resumen
+from .paginacion import (
+    LISTA_CONDUCTORES,
+    LISTA_VEHICULOS,
+    conteo_aproximado,
+    pagina_servicios,
+    paginar_lista,
+)
+from .empresas import obtener_empresa_actual
+from .correos import encolar_correo
+from .importar import IMPORTACIONES, campos_importacion, importar
+from .planificacion import aplicar_plan, planificar
+from .fechas_vehiculos import CAMPOS_FECHA, actualizar_fechas, leer_fecha, leer_fechas_csv
+from .exportar import MAX_FILAS_XLSX, csv_servicios, filas_servicios, xlsx_servicios
+from .manifiesto import generar_manifiesto
+from .middleware import sin_sesion
+from .renderizador import REINTENTAR_EN, RenderizadorOcupado
+from .verificacion import TTL_VERIFICACION, datos_verificacion, estado_fuec, leer_token
+from .fuec import (
+    asignar_numeros_fuec,
+    clave_fuec,
+    codigo_fuec,
+    con_numero_fuec,
+    nombre_archivo_fuec,
+    obtener_pdf_fuec,
+    solicitar_fuec,
+    ultima_modificacion,
+    zip_fuec,
+)
 
 
 
@@ -162,60 +82,15 @@ def dashboard_view(request):
     Panel principal después de iniciar sesión.
     Muestra info básica del usuario y su empresa.
     """
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
-    # Conductores activos
-    conductores_activos = Conductor.objects.filter(
-        empresa=empresa,
-        activo=True
-    ).count()
-
-    # Vehículos activos
-    vehiculos_activos = Vehiculo.objects.filter(
-        empresa=empresa,
-        activo=True
-    ).count()
-
-    # Servicios programados para HOY (excepto cancelados)
-    hoy = datetime.today().date()
-    servicios_hoy = Servicio.objects.filter(
-        empresa=empresa,
-        fecha_servicio=hoy
-    ).exclude(estado='CANCELADO').count()
-
-    # Alertas de vencimiento 
-    alertas = obtener_alertas_vencimiento(empresa, dias_alerta=30)
-
-   
-    alertas_dashboard = []
-    for a in alertas[:5]:
-        if a['dias_restantes'] < 0:
-            msg_dias = f"vencido hace {abs(a['dias_restantes'])} días"
-        elif a['dias_restantes'] == 0:
-            msg_dias = "vence hoy"
-        else:
-            msg_dias = f"vence en {a['dias_restantes']} días"
-
-        if a['origen'] == 'CONDUCTOR':
-            texto = (
-                f"Licencia de {a['nombre']} (doc. {a['identificacion']}) "
-                f"{msg_dias}."
-            )
-        else:
-            texto = (
-                f"{a['tipo']} del vehículo {a['placa']} "
-                f"{msg_dias}."
-            )
-
-        alertas_dashboard.append(texto)
+    # KPIs y alertas: snapshot por empresa cacheado hasta medianoche
+    resumen = obtener_resumen(empresa)
 
     context = {
         'usuario': request.user,
         'empresa': empresa,
-        'conductores_activos': conductores_activos,
-        'vehiculos_activos': vehiculos_activos,
-        'servicios_hoy': servicios_hoy,
-        'alertas_vencimiento': alertas_dashboard,
+        **resumen,
     }
     return render(request, 'dashboard.html', context)
 
@@ -227,8 +102,9 @@ def vencimientos_lista(request):
     """
     Pantalla con todas las alertas de vencimiento de la empresa.
     Permite variar el rango de días (por defecto 30).
+    Paginada (?page=) para no cargar toda la flota.
     """
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
     dias_param = request.GET.get('dias', '').strip()
     try:
@@ -236,11 +112,14 @@ def vencimientos_lista(request):
     except ValueError:
         dias_alerta = 30
 
-    alertas = obtener_alertas_vencimiento(empresa, dias_alerta)
+    paginator = Paginator(alertas_vencimiento_qs(empresa, dias_alerta), 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    alertas = [fila_a_alerta(f) for f in page_obj.object_list]
 
     context = {
         'empresa': empresa,
         'alertas': alertas,
+        'page_obj': page_obj,
         'dias_alerta': dias_alerta,
     }
     return render(request, 'vencimientos/lista.html', context)
@@ -253,10 +132,11 @@ def conductores_lista(request):
     """
     Lista de conductores de la empresa actual.
     Permite:
-    - Buscar por nombre o número de documento (?q=)
+    - Buscar por nombre o número de documento (?q=), sin importar tildes
     - Filtrar por activos / inactivos (?estado=activos|inactivos)
+    - Ordenar (?orden=nombre|-nombre|documento|...) y paginar (?page=)
     """
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
     q = request.GET.get('q', '').strip()
     estado = request.GET.get('estado', '').strip()
@@ -264,21 +144,21 @@ def conductores_lista(request):
     conductores = Conductor.objects.filter(empresa=empresa)
 
     if q:
-        conductores = conductores.filter(
-            Q(nombre_completo__icontains=q) |
-            Q(numero_documento__icontains=q)
-        )
+        conductores = buscar(conductores, q)
 
     if estado == 'activos':
         conductores = conductores.filter(activo=True)
     elif estado == 'inactivos':
         conductores = conductores.filter(activo=False)
 
+    lista = paginar_lista(request, conductores, LISTA_CONDUCTORES, por_relevancia=bool(q))
+
     context = {
         'empresa': empresa,
-        'conductores': conductores,
+        'conductores': lista['page_obj'].object_list,
         'q': q,
         'estado': estado,
+        **lista,
     }
     return render(request, 'conductores/lista.html', context)
 
@@ -288,7 +168,7 @@ def conductores_lista(request):
 @login_required
 def conductor_crear(request):
     """Crea un nuevo conductor asociado a la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
     if request.method == 'POST':
         form = ConductorForm(request.POST)
@@ -315,7 +195,7 @@ def conductor_crear(request):
 @login_required
 def conductor_editar(request, pk):
     """Edita un conductor existente de la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
     conductor = get_object_or_404(Conductor, pk=pk, empresa=empresa)
 
     if request.method == 'POST':
@@ -341,7 +221,7 @@ def conductor_editar(request, pk):
 @login_required
 def conductor_detalle(request, pk):
     """Muestra el detalle de un conductor de la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
     conductor = get_object_or_404(Conductor, pk=pk, empresa=empresa)
 
     context = {
@@ -353,15 +233,68 @@ def conductor_detalle(request, pk):
 
 
 
+@login_required
+def conductores_importar(request):
+    """Importa conductores desde un CSV (ver inicio/importar.py)."""
+    return _importar_csv(request, 'conductores')
+
+
+
+
+def _importar_csv(request, tipo):
+    """
+    GET: formulario para subir el CSV (?plantilla=1 descarga un CSV vacío
+    con los encabezados). POST: importa el archivo, o solo lo valida si
+    viene marcado 'simular', y muestra el resultado con los errores.
+    """
+    empresa = request.empresa
+    columnas = campos_importacion(tipo)
+
+    if request.GET.get('plantilla'):
+        response = HttpResponse(';'.join(columnas) + '\r\n', content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="plantilla_{tipo}.csv"'
+        return response
+
+    resultado = None
+    simular = False
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        simular = bool(request.POST.get('simular'))
+        if archivo is None:
+            messages.error(request, "Selecciona un archivo CSV.")
+        else:
+            resultado = importar(tipo, empresa, archivo, simular=simular)
+            if not simular and (resultado.creados or resultado.actualizados):
+                messages.success(
+                    request,
+                    f"Importación terminada: {resultado.creados} creados, "
+                    f"{resultado.actualizados} actualizados."
+                )
+
+    context = {
+        'empresa': empresa,
+        'tipo': tipo,
+        'titulo': IMPORTACIONES[tipo]['titulo'],
+        'columnas': columnas,
+        'resultado': resultado,
+        'simular': simular,
+        'url_lista': reverse(f'{tipo}_lista'),
+    }
+    return render(request, 'importar.html', context)
+
+
+
+
 @login_required
 def vehiculos_lista(request):
     """
     Lista de vehículos de la empresa actual.
     Permite:
-    - Buscar por placa / marca / línea (?q=)
+    - Buscar por placa / marca / línea (?q=), sin importar tildes
     - Filtrar por activos / inactivos (?estado=activos|inactivos)
+    - Ordenar (?orden=placa|-placa|marca|...) y paginar (?page=)
     """
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
     q = request.GET.get('q', '').strip()
     estado = request.GET.get('estado', '').strip()
@@ -369,22 +302,22 @@ def vehiculos_lista(request):
     vehiculos = Vehiculo.objects.filter(empresa=empresa)
 
     if q:
-        vehiculos = vehiculos.filter(
-            Q(placa__icontains=q) |
-            Q(marca__icontains=q) |
-            Q(linea__icontains=q)
-        )
+        vehiculos = buscar(vehiculos, q)
 
     if estado == 'activos':
         vehiculos = vehiculos.filter(activo=True)
     elif estado == 'inactivos':
         vehiculos = vehiculos.filter(activo=False)
 
+    lista = paginar_lista(request, vehiculos, LISTA_VEHICULOS, por_relevancia=bool(q))
+
     context = {
         'empresa': empresa,
-        'vehiculos': vehiculos,
+        'vehiculos': lista['page_obj'].object_list,
+        'documentos': DOCUMENTOS_VEHICULO,
         'q': q,
         'estado': estado,
+        **lista,
     }
     return render(request, 'vehiculos/lista.html', context)
 
@@ -394,7 +327,7 @@ def vehiculos_lista(request):
 @login_required
 def vehiculo_crear(request):
     """Crea un nuevo vehículo asociado a la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
     if request.method == 'POST':
         form = VehiculoForm(request.POST)
@@ -421,7 +354,7 @@ def vehiculo_crear(request):
 @login_required
 def vehiculo_editar(request, pk):
     """Edita un vehículo existente de la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
     vehiculo = get_object_or_404(Vehiculo, pk=pk, empresa=empresa)
 
     if request.method == 'POST':
@@ -447,7 +380,7 @@ def vehiculo_editar(request, pk):
 @login_required
 def vehiculo_detalle(request, pk):
     """Muestra el detalle de un vehículo de la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
     vehiculo = get_object_or_404(Vehiculo, pk=pk, empresa=empresa)
 
     context = {
@@ -459,6 +392,64 @@ def vehiculo_detalle(request, pk):
 
 
 
+@login_required
+def vehiculos_importar(request):
+    """Importa vehículos desde un CSV (ver inicio/importar.py)."""
+    return _importar_csv(request, 'vehiculos')
+
+
+
+
+@login_required
+def vehiculos_fechas(request):
+    """
+    Cambia en bloque las fechas de SOAT, tecnomecánica o pólizas:
+    - POST con 'ids' (vehículos marcados en la lista), 'campo' y 'fecha'
+    - POST con 'archivo': CSV placa -> fecha (o una columna por documento)
+    Si hay errores no se cambia nada y se muestran.
+    """
+    empresa = request.empresa
+    campo = request.POST.get('campo', CAMPOS_FECHA[0])
+    if campo not in CAMPOS_FECHA:
+        campo = CAMPOS_FECHA[0]
+
+    errores = []
+    actualizados = None
+    if request.method == 'POST':
+        if 'archivo' in request.FILES:
+            cambios, errores = leer_fechas_csv(request.FILES['archivo'], campo)
+            clave = 'placa'
+        else:
+            try:
+                ids = [int(i) for i in request.POST.getlist('ids')]
+            except ValueError:
+                ids = None
+            fecha = leer_fecha(request.POST.get('fecha', ''))
+            if ids is None:
+                errores.append(('', 'Los vehículos marcados no son válidos.'))
+            elif not ids:
+                errores.append(('', 'No se marcó ningún vehículo.'))
+            if fecha is None:
+                errores.append(('', 'La fecha no es válida.'))
+            cambios = {pk: {campo: fecha} for pk in ids or ()}
+            clave = 'pk'
+
+        if not errores:
+            actualizados, faltantes = actualizar_fechas(empresa, cambios, clave=clave)
+            errores = [('', f'No se encontró el vehículo {f}.') for f in faltantes]
+
+    context = {
+        'empresa': empresa,
+        'documentos': DOCUMENTOS_VEHICULO,
+        'campo': campo,
+        'errores': errores,
+        'actualizados': actualizados if not errores else None,
+    }
+    return render(request, 'vehiculos/fechas.html', context)
+
+
+
+
 @login_required
 def servicios_lista(request):
     """
@@ -468,59 +459,323 @@ def servicios_lista(request):
     - conductor
     - vehículo
     - estado
-    - texto (origen/destino/cliente)
+    - texto (origen/destino/cliente), sin importar tildes
+    Paginada por cursor (?despues=), sin OFFSET.
     """
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
-    servicios = Servicio.objects.filter(empresa=empresa)
+    filtros = leer_filtros_servicios(request.GET)
+    servicios = filtrar_servicios(empresa, filtros)
 
-    # Filtros
-    q = request.GET.get('q', '').strip()
-    estado = request.GET.get('estado', '').strip()
-    desde = request.GET.get('desde', '').strip()
-    hasta = request.GET.get('hasta', '').strip()
-    conductor_id = request.GET.get('conductor', '').strip()
-    vehiculo_id = request.GET.get('vehiculo', '').strip()
+    # El total se estima en la primera página y viaja con el cursor
+    # (?total=): en las siguientes no se vuelve a contar
+    total_aprox = None
+    if 'despues' in request.GET:
+        try:
+            total_aprox = int(request.GET.get('total', ''))
+        except ValueError:
+            pass
+    if total_aprox is None:
+        total_aprox = conteo_aproximado(servicios)
+
+    # Solo las columnas que muestra la tabla, con conductor y vehículo en el mismo JOIN
+    servicios = servicios.select_related('conductor', 'vehiculo').only(
+        'fecha_servicio', 'hora_inicio', 'origen', 'destino', 'cliente_nombre',
+        'valor', 'estado', 'conductor__nombre_completo', 'vehiculo__placa',
+    )
+    pagina, siguiente = pagina_servicios(servicios, request.GET.get('despues'))
 
-    if q:
-        servicios = servicios.filter(
-            Q(origen__icontains=q) |
-            Q(destino__icontains=q) |
-            Q(cliente_nombre__icontains=q)
+    url_siguiente = None
+    if siguiente:
+        params = request.GET.copy()
+        params['despues'] = siguiente
+        params['total'] = total_aprox
+        url_siguiente = f'?{params.urlencode()}'
+
+    params_inicio = request.GET.copy()
+    params_inicio.pop('despues', None)
+    params_inicio.pop('total', None)
+
+    # Para combos de filtro
+    conductores = Conductor.objects.filter(empresa=empresa, activo=True).only('nombre_completo')
+    vehiculos = Vehiculo.objects.filter(empresa=empresa, activo=True).only('placa')
+
+    context = {
+        'empresa': empresa,
+        'servicios': pagina,
+        'total_aprox': total_aprox,
+        'url_siguiente': url_siguiente,
+        'url_inicio': f'?{params_inicio.urlencode()}',
+        'es_primera_pagina': 'despues' not in request.GET,
+        'q': filtros['q'],
+        'estado': filtros['estado'],
+        'desde': filtros['desde'],
+        'hasta': filtros['hasta'],
+        'conductor_id': filtros['conductor'],
+        'vehiculo_id': filtros['vehiculo'],
+        'url_fuec_zip': f"{reverse('servicios_fuec_zip')}?{params_inicio.urlencode()}",
+        'url_manifiesto': f"{reverse('servicios_manifiesto')}?{params_inicio.urlencode()}",
+        'url_exportar': f"{reverse('servicios_exportar')}?{params_inicio.urlencode()}",
+        'conductores': conductores,
+        'vehiculos': vehiculos,
+    }
+    return render(request, 'servicios/lista.html', context)
+
+
+
+
+@login_required
+def servicios_fuec_zip(request):
+    """
+    Descarga en un ZIP el FUEC de todos los servicios que cumplen los
+    filtros de la lista (ej: los de mañana, o los de un conductor en la
+    semana). El ZIP se envía a medida que se generan los PDF.
+    Los servicios cancelados no llevan FUEC.
+    """
+    empresa = request.empresa
+    filtros = leer_filtros_servicios(request.GET)
+
+    servicios = filtrar_servicios(empresa, filtros).exclude(estado='CANCELADO').select_related(
+        'conductor', 'vehiculo',
+    ).order_by('fecha_servicio', 'hora_inicio', 'id')
+
+    maximo = settings.FUEC_ZIP_MAX_SERVICIOS
+    if servicios[maximo:maximo + 1].exists():
+        messages.error(
+            request,
+            f'Hay más de {maximo} servicios con esos filtros. '
+            'Acota el rango de fechas para descargar los FUEC.'
         )
+        return redirect(f"{reverse('servicios_lista')}?{request.GET.urlencode()}")
+
+    desde = filtros['desde'] or 'inicio'
+    hasta = filtros['hasta'] or 'hoy'
+    filename = f"FUEC_{desde}_{hasta}.zip"
 
-    if estado:
-        servicios = servicios.filter(estado=estado)
+    response = StreamingHttpResponse(
+        zip_fuec(con_numero_fuec(servicios.iterator(chunk_size=200)), empresa),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
 
-    if desde:
-        servicios = servicios.filter(fecha_servicio__gte=desde)
 
-    if hasta:
-        servicios = servicios.filter(fecha_servicio__lte=hasta)
 
-    if conductor_id:
-        servicios = servicios.filter(conductor_id=conductor_id)
 
-    if vehiculo_id:
-        servicios = servicios.filter(vehiculo_id=vehiculo_id)
+@login_required
+def servicios_manifiesto(request):
+    """
+    Manifiesto en PDF de los servicios que cumplen los filtros de la
+    lista (ej: un día, un vehículo o un conductor): la lista de
+    servicios y el FUEC de cada uno, en un solo documento.
+    Sin rango de fechas se usa el día de hoy.
+
+    No se envía a medida que se dibuja: ReportLab escribe el PDF al
+    final, así que se arma entero en un archivo temporal y después se
+    envía por partes (ver inicio/manifiesto.py, que además siempre
+    dibuja con ReportLab sin importar FUEC_BACKEND).
+    """
+    empresa = request.empresa
+    filtros = leer_filtros_servicios(request.GET)
+    if not filtros['desde'] and not filtros['hasta']:
+        filtros['desde'] = filtros['hasta'] = timezone.localdate().isoformat()
+
+    # Una sola consulta, con conductor y vehículo en el mismo JOIN
+    servicios = list(
+        filtrar_servicios(empresa, filtros).select_related(
+            'conductor', 'vehiculo',
+        ).order_by('fecha_servicio', 'hora_inicio', 'id')[:settings.MANIFIESTO_MAX_SERVICIOS + 1]
+    )
 
-    # Para combos de filtro
-    conductores = Conductor.objects.filter(empresa=empresa, activo=True)
-    vehiculos = Vehiculo.objects.filter(empresa=empresa, activo=True)
+    url_lista = f"{reverse('servicios_lista')}?{request.GET.urlencode()}"
+    if not servicios:
+        messages.error(request, 'No hay servicios con esos filtros para el manifiesto.')
+        return redirect(url_lista)
+    if len(servicios) > settings.MANIFIESTO_MAX_SERVICIOS:
+        messages.error(
+            request,
+            f'Hay más de {settings.MANIFIESTO_MAX_SERVICIOS} servicios con esos filtros. '
+            'Acota el rango de fechas para generar el manifiesto.'
+        )
+        return redirect(url_lista)
+
+    desde, hasta = filtros['desde'], filtros['hasta']
+    titulo = 'Manifiesto de servicios'
+    if desde == hasta:
+        titulo += f' del {servicios[0].fecha_servicio.strftime("%d/%m/%Y")}'
+    if filtros['vehiculo']:
+        titulo += f' - Vehículo {servicios[0].vehiculo.placa}'
+    if filtros['conductor']:
+        titulo += f' - {servicios[0].conductor.nombre_completo}'
+
+    # El PDF se arma completo en un archivo temporal (en memoria hasta
+    # 8 MB) y recién después se envía por partes
+    archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    asignar_numeros_fuec(servicios)
+    generar_manifiesto(servicios, empresa, archivo, titulo)
+    archivo.seek(0)
+
+    filename = f"Manifiesto_{desde or 'inicio'}_{hasta or 'hoy'}.pdf"
+    response = FileResponse(archivo, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+
+
+@login_required
+def servicios_exportar(request):
+    """
+    Exporta a CSV (?formato=csv) o Excel (?formato=xlsx) los servicios
+    que cumplen los filtros de la lista. Se envía a medida que se leen
+    las filas, así que sirve igual para un día que para un año.
+    """
+    empresa = request.empresa
+    filtros = leer_filtros_servicios(request.GET)
+    formato = request.GET.get('formato', 'csv')
+
+    servicios = filtrar_servicios(empresa, filtros)
+
+    if formato == 'xlsx':
+        if servicios[MAX_FILAS_XLSX:MAX_FILAS_XLSX + 1].exists():
+            messages.error(
+                request,
+                f'Excel admite hasta {MAX_FILAS_XLSX} filas. '
+                'Acota el rango de fechas o exporta en CSV.'
+            )
+            return redirect(f"{reverse('servicios_lista')}?{request.GET.urlencode()}")
+        contenido = xlsx_servicios(filas_servicios(servicios))
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        formato = 'csv'
+        contenido = csv_servicios(filas_servicios(servicios))
+        content_type = 'text/csv; charset=utf-8'
+
+    desde = filtros['desde'] or 'inicio'
+    hasta = filtros['hasta'] or 'hoy'
+    filename = f"Servicios_{desde}_{hasta}.{formato}"
+
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+
+
+@login_required
+def servicios_conflictos(request):
+    """
+    Cruces de horario de la empresa: conductores o vehículos con dos
+    servicios a la vez (?desde=&hasta=; sin parámetros, de hoy en
+    adelante). Ver inicio/conflictos.py.
+    """
+    empresa = request.empresa
+    if 'desde' not in request.GET and 'hasta' not in request.GET:
+        rango = {'desde': timezone.localdate().isoformat(), 'hasta': ''}
+    else:
+        rango = {c: request.GET.get(c, '').strip() for c in ('desde', 'hasta')}
+
+    fechas = {}
+    for campo, valor in rango.items():
+        try:
+            fechas[campo] = date.fromisoformat(valor) if valor else None
+        except ValueError:
+            fechas[campo] = None
+            rango[campo] = ''
+
+    conflictos, total = conflictos_empresa(empresa, fechas['desde'], fechas['hasta'])
 
     context = {
         'empresa': empresa,
-        'servicios': servicios.order_by('-fecha_servicio', '-hora_inicio'),
-        'q': q,
-        'estado': estado,
-        'desde': desde,
-        'hasta': hasta,
-        'conductor_id': conductor_id,
-        'vehiculo_id': vehiculo_id,
-        'conductores': conductores,
-        'vehiculos': vehiculos,
+        'conflictos': conflictos,
+        'total': total,
+        **rango,
     }
-    return render(request, 'servicios/lista.html', context)
+    return render(request, 'servicios/conflictos.html', context)
+
+
+
+
+@login_required
+def servicios_planificar(request):
+    """
+    Planificación automática de un día (?fecha=, por defecto hoy; ver
+    inicio/planificacion.py):
+    - GET: propuesta de conductor y vehículo para cada servicio
+      programado sin FUEC, frente a lo que tiene hoy.
+    - POST: la aplica, si sigue siendo la misma que se mostró.
+    Los servicios marcados como fijos (?fijo=<pk>) no se tocan.
+    """
+    empresa = request.empresa
+    try:
+        fecha = date.fromisoformat(request.GET['fecha']) if request.GET.get('fecha') else timezone.localdate()
+        fijos = [int(pk) for pk in request.GET.getlist('fijo')]
+    except ValueError:
+        messages.error(request, 'Parámetros no válidos.')
+        return redirect('servicios_planificar')
+
+    if request.method == 'POST':
+        cambiados, plan = aplicar_plan(empresa, fecha, request.POST.get('firma', ''), fijos)
+        if cambiados is None:
+            messages.error(
+                request,
+                'La programación del día cambió desde la vista previa. Revisa la nueva propuesta.'
+            )
+        else:
+            messages.success(request, f'Se reasignaron {cambiados} servicios.')
+            return redirect(request.get_full_path())
+    else:
+        plan = planificar(empresa, fecha, fijos)
+
+    context = {
+        'empresa': empresa,
+        'fecha': fecha.isoformat(),
+        'fijos': fijos,
+        'plan': plan,
+    }
+    return render(request, 'servicios/planificar.html', context)
+
+
+
+
+@login_required
+@require_safe
+def servicios_disponibles(request):
+    """
+    Conductores y vehículos libres para una ventana (JSON), para armar
+    la programación del día:
+    ?fecha=2026-03-15&hora_inicio=08:00&hora_fin=10:00&capacidad=20
+    (&excluir=<pk> al editar un servicio). Solo activos, sin servicios
+    que se crucen y con los documentos vigentes en esa fecha.
+    """
+    empresa = request.empresa
+    try:
+        fecha = date.fromisoformat(request.GET.get('fecha', ''))
+        hora_inicio, hora_fin = (
+            time.fromisoformat(request.GET[c]) if request.GET.get(c) else None
+            for c in ('hora_inicio', 'hora_fin')
+        )
+        capacidad = int(request.GET.get('capacidad') or 0)
+        excluir = int(request.GET['excluir']) if request.GET.get('excluir') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros no válidos.'}, status=400)
+
+    conductores = conductores_disponibles(
+        empresa, fecha, hora_inicio, hora_fin, excluir=excluir,
+    ).order_by('nombre_completo').values('id', 'nombre_completo')
+    vehiculos = vehiculos_disponibles(
+        empresa, fecha, hora_inicio, hora_fin, capacidad=capacidad, excluir=excluir,
+    ).order_by('placa').values('id', 'placa', 'marca', 'linea', 'capacidad_pasajeros')
+
+    response = JsonResponse({
+        'conductores': list(conductores),
+        'vehiculos': list(vehiculos),
+    })
+    patch_cache_control(response, private=True, no_store=True)
+    return response
 
 
 
@@ -528,7 +783,7 @@ def servicios_lista(request):
 @login_required
 def servicio_crear(request):
     """Crea un nuevo servicio asociado a la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
 
     if request.method == 'POST':
         form = ServicioForm(request.POST)
@@ -536,10 +791,8 @@ def servicio_crear(request):
         form.fields['conductor'].queryset = Conductor.objects.filter(empresa=empresa, activo=True)
         form.fields['vehiculo'].queryset = Vehiculo.objects.filter(empresa=empresa, activo=True)
 
-        if form.is_valid():
-            servicio = form.save(commit=False)
-            servicio.empresa = empresa
-            servicio.save()
+        # Se valida (cruces de horario) y se guarda en la misma transacción
+        if form.guardar(empresa) is not None:
             messages.success(request, "Servicio creado correctamente.")
             return redirect('servicios_lista')
     else:
@@ -561,7 +814,7 @@ def servicio_crear(request):
 @login_required
 def servicio_editar(request, pk):
     """Edita un servicio existente de la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
     servicio = get_object_or_404(Servicio, pk=pk, empresa=empresa)
 
     if request.method == 'POST':
@@ -569,8 +822,8 @@ def servicio_editar(request, pk):
         form.fields['conductor'].queryset = Conductor.objects.filter(empresa=empresa, activo=True)
         form.fields['vehiculo'].queryset = Vehiculo.objects.filter(empresa=empresa, activo=True)
 
-        if form.is_valid():
-            form.save()
+        # Se valida (cruces de horario) y se guarda en la misma transacción
+        if form.guardar() is not None:
             messages.success(request, "Servicio actualizado correctamente.")
             return redirect('servicios_lista')
     else:
@@ -592,12 +845,14 @@ def servicio_editar(request, pk):
 @login_required
 def servicio_detalle(request, pk):
     """Muestra el detalle de un servicio de la empresa actual."""
-    empresa = obtener_empresa_actual(request.user)
+    empresa = request.empresa
     servicio = get_object_or_404(Servicio, pk=pk, empresa=empresa)
 
     context = {
         'empresa': empresa,
         'servicio': servicio,
+        'fuec_asincrono': settings.FUEC_ASINCRONO,
+        'fuec_codigo': codigo_fuec(servicio.fuec_numero),
     }
     return render(request, 'servicios/detalle.html', context)
 
@@ -609,31 +864,191 @@ def servicio_fuec_pdf(request, pk):
     """
     Genera el FUEC en PDF para un servicio específico
     y lo descarga como archivo.
+    El PDF se cachea por contenido; con ETag / Last-Modified el
+    navegador recibe un 304 si ya tiene la versión actual.
     """
-    empresa = obtener_empresa_actual(request.user)
-    servicio = get_object_or_404(Servicio, pk=pk, empresa=empresa)
+    empresa = request.empresa
+    servicio = get_object_or_404(
+        Servicio.objects.select_related('conductor', 'vehiculo'),
+        pk=pk,
+        empresa=empresa,
+    )
 
-    context = {
-        'empresa': empresa,
-        'servicio': servicio,
-        'hoy': date.today(),
-    }
+    if servicio.estado == 'CANCELADO':
+        messages.error(request, 'Un servicio cancelado no tiene FUEC.')
+        return redirect('servicio_detalle', pk=pk)
 
-    pdf_bytes = render_to_pdf('servicios/fuec_pdf.html', context)
+    # El consecutivo se asigna una sola vez; las descargas siguientes
+    # reutilizan el mismo número (y el mismo PDF cacheado)
+    asignar_numeros_fuec([servicio])
+    clave = clave_fuec(servicio, empresa)
+    etag = f'"{clave}"'
+    last_modified = int(ultima_modificacion(servicio).timestamp())
+
+    no_modificado = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    if no_modificado is not None:
+        return no_modificado
+
+    try:
+        pdf_bytes = obtener_pdf_fuec(servicio, empresa, clave=clave)
+    except RenderizadorOcupado:
+        # Backpressure: mejor un 503 rápido que acumular peticiones
+        response = HttpResponse(
+            'El generador de PDF está ocupado. Intenta de nuevo en unos segundos.',
+            status=503,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(REINTENTAR_EN)
+        return response
 
     if pdf_bytes is None:
         messages.error(request, 'No se pudo generar el PDF del FUEC.')
         return redirect('servicio_detalle', pk=pk)
 
-    filename = f"FUEC_{servicio.id}_{servicio.fecha_servicio}.pdf"
+    filename = nombre_archivo_fuec(servicio)
 
     response = HttpResponse(pdf_bytes, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
     return response
 
 
 
 
+def _quiere_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
+
+
+def _estado_trabajo(trabajo):
+    datos = {
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'url_estado': reverse('fuec_trabajo_estado', args=[trabajo.pk]),
+        'url_descarga': None,
+        'error': trabajo.error,
+    }
+    if trabajo.estado == 'LISTO':
+        datos['url_descarga'] = reverse('fuec_trabajo_descargar', args=[trabajo.pk])
+    return datos
+
+
+@login_required
+@require_POST
+def servicio_fuec_solicitar(request, pk):
+    """
+    Encola la generación del FUEC (modo asíncrono) y responde de una
+    vez con la página de estado. El PDF lo genera el worker:
+    python manage.py procesar_fuec
+    """
+    empresa = request.empresa
+    servicio = get_object_or_404(
+        Servicio.objects.select_related('conductor', 'vehiculo'),
+        pk=pk,
+        empresa=empresa,
+    )
+
+    if servicio.estado == 'CANCELADO':
+        if _quiere_json(request):
+            return JsonResponse({'error': 'Un servicio cancelado no tiene FUEC.'}, status=409)
+        messages.error(request, 'Un servicio cancelado no tiene FUEC.')
+        return redirect('servicio_detalle', pk=pk)
+
+    trabajo = solicitar_fuec(servicio, empresa, request.user)
+
+    if _quiere_json(request):
+        return JsonResponse(_estado_trabajo(trabajo), status=202)
+    return redirect('fuec_trabajo_estado', pk=trabajo.pk)
+
+
+
+
+@login_required
+def fuec_trabajo_estado(request, pk):
+    """
+    Estado de un FUEC encolado. La página se recarga sola hasta que
+    el PDF está listo; con Accept: application/json devuelve el estado.
+    """
+    trabajo = get_object_or_404(
+        TrabajoFuec.objects.defer('pdf'),
+        pk=pk,
+        empresa=request.empresa,
+    )
+    datos = _estado_trabajo(trabajo)
+
+    if _quiere_json(request):
+        return JsonResponse(datos)
+
+    if trabajo.estado == 'LISTO':
+        return redirect(datos['url_descarga'])
+
+    context = {
+        'empresa': request.empresa,
+        'trabajo': trabajo,
+    }
+    return render(request, 'servicios/fuec_trabajo.html', context)
+
+
+
+
+@login_required
+def fuec_trabajo_descargar(request, pk):
+    """Descarga el PDF de un FUEC generado en segundo plano."""
+    trabajo = get_object_or_404(
+        TrabajoFuec.objects.select_related('servicio'),
+        pk=pk,
+        empresa=request.empresa,
+        estado='LISTO',
+    )
+    servicio = trabajo.servicio
+
+    etag = f'"{trabajo.clave}"'
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+
+    filename = nombre_archivo_fuec(servicio)
+
+    response = HttpResponse(bytes(trabajo.pdf), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+
+
+#  VERIFICACIÓN PÚBLICA DEL FUEC (QR)
+@sin_sesion
+@require_safe
+@cache_control(public=True, max_age=TTL_VERIFICACION)
+def fuec_verificar(request, token):
+    """
+    Página pública a la que lleva el QR del FUEC: dice si está vigente,
+    anulado o vencido. No usa la sesión ni CSRF (se renderiza sin
+    request), así que la respuesta se puede cachear unos segundos.
+    """
+    servicio_id = leer_token(token)
+    datos = datos_verificacion(servicio_id) if servicio_id else None
+
+    context = {'datos': datos}
+    if datos:
+        context.update({
+            'estado': estado_fuec(datos),
+            'codigo': codigo_fuec(datos['fuec_numero']),
+        })
+
+    html = render_to_string('servicios/fuec_verificacion.html', context)
+    return HttpResponse(html, status=200 if datos else 404)
+
+
+
+
 def login_view(request):
     """
     Login SIN selector de empresa.
@@ -699,8 +1114,8 @@ def registro_view(request):
     - Crea usuario inactivo
     - Lo asocia a la empresa por defecto: Rutek Tours
     - Genera código de verificación
-    - Envía correo HTML. Si el envío falla, se cancela el registro
-      y se borra el usuario (no se activa automáticamente).
+    - Encola el correo HTML con el código (lo envía el despachador de
+      correos; si falla se reintenta, no se borra el usuario)
     """
     if request.method == 'POST':
         nombre = request.POST.get('nombre', '').strip()
@@ -721,77 +1136,51 @@ def registro_view(request):
             messages.error(request, 'Ya existe una cuenta con este correo.')
             return render(request, 'registro.html')
 
-        # Crear usuario
-        user = User.objects.create_user(
-            username=email,     
-            email=email,
-            password=password,
-            first_name=nombre
-        )
-        user.is_active = False
-        user.save()
-
-      
-        empresa_rutek = obtener_empresa_actual(user)
-
-       
-        if empresa_rutek.administrador is None:
-            empresa_rutek.administrador = user
-            empresa_rutek.save()
-            es_admin = True
-        else:
-            es_admin = False
-
-        EmpresaUsuario.objects.create(
-            empresa=empresa_rutek,
-            user=user,
-            es_admin_empresa=es_admin
-        )
+        # Usuario, empresa, código y correo en una sola transacción: el
+        # correo se envía después (ver inicio/correos.py), así que el
+        # registro no depende de que el proveedor de correo responda.
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=email,
+                email=email,
+                password=password,
+                first_name=nombre
+            )
+            user.is_active = False
+            user.save()
 
-        
-        codigo = generar_codigo()
-        CodigoVerificacion.objects.update_or_create(
-            user=user,
-            defaults={'codigo': codigo, 'usado': False}
-        )
+            empresa_rutek = obtener_empresa_actual(user)
 
-        
-        asunto = "Código de verificación - Rutek"
-        context = {
-            'nombre': nombre,
-            'codigo': codigo,
-            'year': datetime.now().year,
-        }
-
-        html_body = render_to_string('email_verificacion.html', context)
-        text_body = strip_tags(html_body)
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-
-        email_message = EmailMultiAlternatives(
-            subject=asunto,
-            body=text_body,
-            from_email=from_email,
-            to=[email],
-        )
-        email_message.attach_alternative(html_body, "text/html")
+            if empresa_rutek.administrador is None:
+                empresa_rutek.administrador = user
+                empresa_rutek.save()
+                es_admin = True
+            else:
+                es_admin = False
 
-        try:
-            email_message.send()
-        except Exception as e:
-          
-            print(f"Error enviando correo de verificación: {e}")
+            EmpresaUsuario.objects.create(
+                empresa=empresa_rutek,
+                user=user,
+                es_admin_empresa=es_admin
+            )
 
-            
-            user.delete()
+            codigo = generar_codigo()
+            CodigoVerificacion.objects.update_or_create(
+                user=user,
+                defaults={'codigo': codigo, 'usado': False}
+            )
 
-            messages.error(
-                request,
-                'No pudimos enviar el correo de verificación. '
-                'Por favor intenta nuevamente más tarde.'
+            encolar_correo(
+                email,
+                "Código de verificación - Rutek",
+                'email_verificacion.html',
+                {
+                    'nombre': nombre,
+                    'codigo': codigo,
+                    'year': datetime.now().year,
+                },
             )
-            return render(request, 'registro.html')
 
-        
         request.session['pending_user_id'] = user.id
         messages.success(request, 'Te enviamos un código de verificación a tu correo.')
         return redirect('verificacion')
@@ -856,7 +1245,7 @@ def password_reset_request(request):
     """
     Paso 1:
     - El usuario ingresa su correo
-    - Si existe, se genera un código y se envía por email
+    - Si existe, se genera un código y se encola el correo con el código
     - Se guarda el id del usuario en sesión como 'reset_user_id'
     """
     if request.method == 'POST':
@@ -877,41 +1266,23 @@ def password_reset_request(request):
             return redirect('password_reset_request')
 
         
-        codigo = generar_codigo()
-        CodigoVerificacion.objects.update_or_create(
-            user=user,
-            defaults={'codigo': codigo, 'usado': False}
-        )
-
-        asunto = "Recuperación de contraseña - Rutek"
-        context = {
-            'nombre': user.first_name or user.username,
-            'codigo': codigo,
-            'year': datetime.now().year,
-        }
-
-        html_body = render_to_string('email_reset_password.html', context)
-        text_body = strip_tags(html_body)
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
-
-        email_message = EmailMultiAlternatives(
-            subject=asunto,
-            body=text_body,
-            from_email=from_email,
-            to=[email],
-        )
-        email_message.attach_alternative(html_body, "text/html")
+        with transaction.atomic():
+            codigo = generar_codigo()
+            CodigoVerificacion.objects.update_or_create(
+                user=user,
+                defaults={'codigo': codigo, 'usado': False}
+            )
 
-        try:
-            email_message.send()
-        except Exception as e:
-            print(f"Error enviando correo de recuperación: {e}")
-            messages.error(
-                request,
-                'No pudimos enviar el correo de recuperación. '
-                'Intenta nuevamente más tarde.'
+            encolar_correo(
+                email,
+                "Recuperación de contraseña - Rutek",
+                'email_reset_password.html',
+                {
+                    'nombre': user.first_name or user.username,
+                    'codigo': codigo,
+                    'year': datetime.now().year,
+                },
             )
-            return render(request, 'password_reset_request.html')
 
         request.session['reset_user_id'] = user.id
 